@@ -0,0 +1,31 @@
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from app.services.identity import CurrentUser, InvalidToken, get_token_cache, get_user_cache
+
+_bearer = HTTPBearer(auto_error=False)
+
+_UNAUTHORIZED = {"WWW-Authenticate": "Bearer"}
+
+
+async def get_optional_user(
+    credentials: HTTPAuthorizationCredentials | None = Depends(_bearer),
+) -> CurrentUser | None:
+    """The caller's user, None without a bearer token; an invalid token is still a 401."""
+    if credentials is None:
+        return None
+    # async so the cached path (the usual one) never goes through the threadpool.
+    try:
+        email = get_token_cache().email_for(credentials.credentials)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers=_UNAUTHORIZED)
+    user = await get_user_cache().get(email)
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found", headers=_UNAUTHORIZED)
+    return user
+
+
+async def get_current_user(user: CurrentUser | None = Depends(get_optional_user)) -> CurrentUser:
+    if user is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers=_UNAUTHORIZED)
+    return user
@@ -2,8 +2,14 @@ from fastapi import APIRouter
 from app.api.v1.routes.auth import router as auth_router
 from app.api.v1.routes.polish import router as polish_router
 from app.api.v1.routes.feedback import router as feedback_router  # ✅ add
+from app.api.v1.routes.schema_registry import router as schema_router
+from app.api.v1.routes.usage import router as usage_router
+from app.api.v1.routes.admin import router as admin_router
 
 api_router = APIRouter(prefix="/api/v1")
 api_router.include_router(auth_router)
 api_router.include_router(polish_router)
 api_router.include_router(feedback_router)  # ✅ add
+api_router.include_router(schema_router)
+api_router.include_router(usage_router)
+api_router.include_router(admin_router)
@@ -0,0 +1,77 @@
+import hmac
+from datetime import date, datetime, timedelta
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+
+from app.api.v1.routes.usage import usage_report
+from app.core.config import settings
+from app.services.audit_writer import utcnow
+from app.services.latency_sketches import get_latency_sketches
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+GROUP_BY = ("model", "action", "lang")
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    # No token configured: the admin API does not exist.
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+@router.get("/latency", dependencies=[Depends(require_admin)])
+async def latency_percentiles(
+    start: datetime | None = Query(default=None, alias="from"),
+    end: datetime | None = Query(default=None, alias="to"),
+    model: str | None = None,
+    action: str | None = None,
+    lang: str | None = None,
+    group_by: str = "model",
+    q: str = "0.5,0.95,0.99",
+):
+    """
+    Latency percentiles in ms over hourly sketches in [from, to) (naive UTC; hours
+    are whole, so from is rounded down). Defaults to the last 24 hours.
+    """
+    if not settings.LATENCY_SKETCH_ENABLED:
+        raise HTTPException(status_code=503, detail="Latency sketches are disabled.")
+    end = end or utcnow()
+    start = start or end - timedelta(hours=24)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'.")
+    if end - start > timedelta(days=settings.ADMIN_LATENCY_MAX_RANGE_DAYS):
+        raise HTTPException(
+            status_code=400, detail=f"Range too large. Max {settings.ADMIN_LATENCY_MAX_RANGE_DAYS} days."
+        )
+
+    dims = list(dict.fromkeys(g.strip() for g in group_by.split(",") if g.strip()))
+    unknown = [g for g in dims if g not in GROUP_BY]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by: {', '.join(unknown)}. Use {', '.join(GROUP_BY)}.")
+    try:
+        quantiles = [float(v) for v in q.split(",") if v.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="q must be comma-separated numbers between 0 and 1.")
+    if not quantiles or any(not 0 <= v <= 1 for v in quantiles):
+        raise HTTPException(status_code=400, detail="q must be comma-separated numbers between 0 and 1.")
+
+    groups = await get_latency_sketches().query(start, end, quantiles, dims, model, action, lang)
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "relative_accuracy": settings.LATENCY_SKETCH_ALPHA,
+        "groups": groups,
+    }
+
+
+@router.get("/usage", dependencies=[Depends(require_admin)])
+async def user_usage(
+    user_id: int,
+    start: date | None = Query(default=None, alias="from"),
+    end: date | None = Query(default=None, alias="to"),
+    group_by: str = "day",
+):
+    """Support lookup of any user's usage; same response as GET /usage."""
+    return await usage_report(user_id, start, end, group_by)
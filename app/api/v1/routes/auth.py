@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.schemas.auth import SignupRequest, LoginRequest, TokenResponse, RefreshRequest, LogoutRequest
@@ -7,16 +7,17 @@ from app.services import auth_service
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/signup")
-def signup(payload: SignupRequest, db: Session = Depends(get_db)):
-    return auth_service.signup(db, payload)
+async def signup(payload: SignupRequest, db: Session = Depends(get_db)):
+    return await auth_service.signup(db, payload)
 
 @router.get("/verify-email")
 def verify_email(token: str, db: Session = Depends(get_db)):
     return auth_service.verify_email(db, token)
 
 @router.post("/login", response_model=TokenResponse)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
-    return auth_service.login(db, payload)
+async def login(payload: LoginRequest, request: Request, db: Session = Depends(get_db)):
+    client_ip = request.client.host if request.client else "unknown"
+    return await auth_service.login(db, payload, client_ip)
 
 @router.post("/refresh")
 def refresh(payload: RefreshRequest, db: Session = Depends(get_db)):
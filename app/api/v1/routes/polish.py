@@ -1,77 +1,59 @@
-import os
+import json
+import logging
 import time
-import random
+import asyncio
 import uuid
-from typing import Any, Dict
+from contextlib import AsyncExitStack
+from dataclasses import replace
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple, Union
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from openai import OpenAI
-from sqlalchemy import text
-from sqlalchemy.orm import Session
 
-from app.db.deps import get_db  # your DB dependency that returns Session
+from app.api.deps import get_optional_user
+from app.core.config import settings
+from app.core.prompts import PromptTemplate, prompt_for_mode, with_schema
+from app.core.token_estimator import get_token_estimator, heuristic_count
+from app.core.server_timing import ServerTiming, current_timing, start_timing
+from app.core.retry import CircuitOpenError, Deadline, DeadlineExceeded, all_retry_policies, get_retry_policy
+from app.core.llm_providers import LLMProvider, LLMResult, get_provider
+from app.core.metrics import LLM_REQUEST_TOKENS, LLM_TOKENS, UPSTREAM_SECONDS
+from app.services.audit_writer import get_audit_writer
+from app.services.hedging import get_hedger
+from app.services.identity import CurrentUser
+from app.services.latency_sketches import get_latency_sketches
+from app.services.model_routing import RouteDecision, get_model_router, route_request
+from app.services.near_dup import get_near_dup_cache
+from app.services.polish_cache import cache_key, get_polish_cache
+from app.services.quota import QuotaExceeded, get_quota_manager
+from app.services.scheduler import QueueTimeout, get_scheduler
+from app.services.schema_registry import get_schema_registry
+from app.services.singleflight import polish_flights
+
+log = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/polish", tags=["polish"])
 
 MAX_CHARS = 20_000
-MAX_RETRIES = 4
-
-
-def build_system_prompt(mode: Dict[str, Any]) -> str:
-    action = (mode or {}).get("action", "Program")
-    lang_or_db = (mode or {}).get("lang", "Python")
-
-    base_rules = (
-        "IDENTITY RULE:\n"
-        "- If the user mentions company, you MUST reply with:\n"
-        "  Company: SAI Devion\n"
-        "  Parent company: SAI\n\n"
-        "ROLE RULE:\n"
-        "- You are an AI Software Engineer.\n"
-        "- The user may ask in normal question form.\n"
-        "- You must convert the user's question into the requested output type.\n\n"
-        "STRICT OUTPUT RULES:\n"
-        "- Output PLAIN TEXT ONLY.\n"
-        "- NEVER use markdown, backticks, or code fences.\n"
-        "- Do NOT include explanations, steps, or commentary (unless explicitly allowed below).\n"
-        "- If unclear/missing details, make reasonable defaults and still output something valid.\n"
-        "- If impossible to proceed, output a short plain-text error only.\n"
-    )
 
-    if action == "Program":
-        return (
-            base_rules
-            + "\nPROGRAM MODE:\n"
-            + f"- Language: {lang_or_db}\n"
-            + "- The user will ask a question; you MUST answer by generating ONLY executable code.\n"
-            + "- Add exactly ONE single-line comment at the TOP summarizing what the script does.\n"
-            + "- No additional text before/after code.\n"
-        )
 
-    if action == "Query":
-        db = lang_or_db
-
-        if str(db).lower() == "mongodb":
-            return (
-                base_rules
-                + "\nQUERY MODE (MongoDB):\n"
-                + "- The user will ask a question; you MUST answer by outputting ONLY a valid MongoDB query or aggregation JSON.\n"
-                + "- Do NOT output SQL.\n"
-                + "- Assume collection name `collection` if missing.\n"
-                + "- No commentary.\n"
-            )
+def build_system_prompt(mode: Dict[str, Any], schema_context: str | None = None) -> str:
+    return with_schema(prompt_for_mode(mode), schema_context).text
 
-        return (
-            base_rules
-            + "\nQUERY MODE (SQL):\n"
-            + f"- Dialect: {db}\n"
-            + "- The user will ask a question; you MUST answer by outputting ONLY ONE final SQL query for this dialect.\n"
-            + "- Do NOT include explanations.\n"
-            + "- SQL comments using -- are allowed.\n"
-        )
 
-    return "Invalid mode. Only Program or Query is supported."
+async def _prompt_for(mode: Dict[str, Any], user_id: int | None, raw_text: str) -> PromptTemplate:
+    """The mode's template plus, in Query mode, the user's top-k registered tables for this text."""
+    prompt = prompt_for_mode(mode)
+    if not settings.SCHEMA_REGISTRY_ENABLED or user_id is None or prompt.section not in ("sql", "mongodb"):
+        return prompt
+    try:
+        context = await get_schema_registry().context_for(user_id, str(mode.get("lang", "MySQL")), raw_text)
+    except Exception:
+        # A registry outage costs prompt quality, not the request.
+        log.warning("schema lookup failed for user %s", user_id, exc_info=True)
+        return prompt
+    return with_schema(prompt, context)
 
 
 class PolishRequest(BaseModel):
@@ -80,42 +62,297 @@ class PolishRequest(BaseModel):
     user_id: int | None = None
 
 
-def _openai_client() -> OpenAI:
-    api_key = os.getenv("OPENAI_API_KEY", "")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY is not set.")
-    return OpenAI(api_key=api_key)
+class PolishBatchItem(BaseModel):
+    text: str
+    mode: Dict[str, Any] = Field(default_factory=dict)
+
+
+class PolishBatchRequest(BaseModel):
+    items: List[PolishBatchItem] = Field(..., min_length=1)
+    user_id: int | None = None
+
+
+def _policy_for(provider: LLMProvider):
+    return get_retry_policy(f"{provider.name}:{provider.model}")
 
 
-def _call_openai_with_retry(
-    client: OpenAI,
-    model: str,
+def _observe(
+    provider: LLMProvider, action: str, started: float, ok: bool, resp: LLMResult | None = None
+) -> None:
+    elapsed = time.perf_counter() - started
+    if settings.ROUTING_ENABLED:
+        get_model_router().observe(provider.model, elapsed * 1000, ok)
+    if settings.METRICS_ENABLED:
+        UPSTREAM_SECONDS.observe(elapsed, provider.model, action, "ok" if ok else "error")
+        if resp is not None and resp.total_tokens:
+            LLM_TOKENS.inc(provider.model, action, "prompt", amount=resp.prompt_tokens or 0)
+            LLM_TOKENS.inc(provider.model, action, "completion", amount=resp.completion_tokens or 0)
+            LLM_REQUEST_TOKENS.observe(resp.total_tokens, provider.model, action)
+
+
+async def _call_openai_with_retry(
+    provider: LLMProvider,
     instructions: str,
     user_input: str,
-):
-    for attempt in range(MAX_RETRIES + 1):
+    deadline: Deadline,
+    action: str,
+    **params,
+) -> LLMResult:
+    params.setdefault("temperature", 0.2)
+    timing = current_timing()
+    attempts_ms: List[float] = []
+
+    async def attempt() -> LLMResult:
+        attempt_started = time.perf_counter()
         try:
-            return client.responses.create(
-                model=model,
-                instructions=instructions,
-                input=user_input,
-                temperature=0.2,
-            )
-        except Exception as e:
-            msg = str(e).lower()
-            retryable = (
-                ("rate limit" in msg)
-                or ("429" in msg)
-                or ("timeout" in msg)
-                or ("temporarily" in msg)
-            )
-            if attempt >= MAX_RETRIES or not retryable:
-                raise
-            time.sleep((2**attempt) + random.random())
+            return await provider.generate(instructions, user_input, **params)
+        finally:
+            attempts_ms.append((time.perf_counter() - attempt_started) * 1000)
+            if timing is not None:
+                timing.add(timing.next_attempt(), attempts_ms[-1], provider.model)
+
+    started = time.perf_counter()
+    try:
+        resp = await _policy_for(provider).call(attempt, deadline)
+    except CircuitOpenError:
+        raise  # no upstream call was made
+    except Exception:
+        _observe(provider, action, started, ok=False)
+        raise
+    finally:
+        if timing is not None and len(attempts_ms) > 1:
+            # Backoff sleeps between attempts.
+            timing.add("retry_wait", (time.perf_counter() - started) * 1000 - sum(attempts_ms))
+    _observe(provider, action, started, ok=True, resp=resp)
+    return resp
+
+
+def _stream_openai_with_retry(
+    provider: LLMProvider,
+    instructions: str,
+    user_input: str,
+    deadline: Deadline,
+    **params,
+) -> AsyncIterator[Union[str, LLMResult]]:
+    # Retrying is only safe until the first delta has been forwarded to the client.
+    params.setdefault("temperature", 0.2)
+    return _policy_for(provider).stream(
+        lambda: provider.stream(instructions, user_input, **params),
+        deadline,
+    )
+
+
+def _http_error(e: Exception, err_text: str, headers: Dict[str, str] | None = None) -> HTTPException:
+    headers = dict(headers or {})
+    if isinstance(e, CircuitOpenError):
+        headers["Retry-After"] = str(int(e.retry_after))
+        return HTTPException(status_code=503, detail=err_text, headers=headers)
+    if isinstance(e, QueueTimeout):
+        headers["Retry-After"] = "1"
+        return HTTPException(status_code=503, detail=err_text, headers=headers)
+    if isinstance(e, DeadlineExceeded):
+        return HTTPException(status_code=504, detail=err_text, headers=headers or None)
+    return HTTPException(status_code=500, detail=err_text, headers=headers or None)
+
+
+def _timing_headers(request_uid: str, timing: ServerTiming) -> Dict[str, str]:
+    return {"Server-Timing": timing.header(), "X-Request-UID": request_uid}
+
+
+def _user_id(user: CurrentUser | None, claimed: int | None) -> int | None:
+    # A bearer token decides; the body's user_id counts only with the legacy AUTH_TRUST_CLIENT_USER_ID opt-in.
+    if user is not None:
+        return user.id
+    return claimed if settings.AUTH_TRUST_CLIENT_USER_ID else None
+
+
+def _client_key(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+class InputTooLarge(ValueError):
+    pass
+
+
+def _max_output_tokens(action: str) -> int:
+    return settings.TOKEN_MAX_OUTPUT_PROGRAM if action == "Program" else settings.TOKEN_MAX_OUTPUT_QUERY
+
+
+def _admit(
+    raw_text: str, action: str, prompt: PromptTemplate, route: RouteDecision
+) -> Tuple[str, int, RouteDecision]:
+    """
+    Token-based admission; runs before any DB write or upstream call.
+    Oversized input is rejected, trimmed or rerouted per TOKEN_OVERSIZE_POLICY.
+    Returns (text to send, estimated prompt tokens, route with max_output_tokens set).
+    """
+    estimator = get_token_estimator()
+    limit = settings.TOKEN_MAX_INPUT_TOKENS
+    n = estimator.count(raw_text, route.model)
+    if n > limit:
+        policy = settings.TOKEN_OVERSIZE_POLICY
+        if policy == "trim":
+            raw_text = estimator.trim(raw_text, limit, route.model)
+            route = replace(route, reason=f"{route.reason};trimmed"[:120])
+        elif policy == "reroute" and n <= settings.TOKEN_REROUTE_MAX_INPUT_TOKENS:
+            route = replace(route, model=settings.ROUTING_LARGE_MODEL, reason=f"{route.reason};oversize"[:120])
+        else:
+            raise InputTooLarge(f"Text too large: about {n} tokens, max {limit}.")
+    route = replace(route, params={**route.params, "max_output_tokens": _max_output_tokens(action)})
+    return raw_text, estimator.estimate_prompt(prompt.text, raw_text, route.model), route
+
+
+def _calibrate(model: str, est_tokens: int | None, resp: LLMResult) -> None:
+    get_token_estimator().calibrate(model, est_tokens, resp.prompt_tokens)
+
+
+async def _enforce_quota(
+    request: Request, user: CurrentUser | None, user_id: int | None, requests: int, est_tokens: int
+) -> int:
+    """Runs before any DB write or upstream call; returns the caller's subscription tier."""
+    if not settings.QUOTA_ENABLED:
+        # Scheduler tier only: the bearer token's user already carries it, no DB lookup needed.
+        return user.subscription if user is not None else settings.QUOTA_ANON_TIER
+    try:
+        return await get_quota_manager().check(user_id, _client_key(request), requests, est_tokens)
+    except QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+
+def _sched_key(request: Request, user_id: int | None) -> str:
+    return f"user:{user_id}" if user_id is not None else f"ip:{_client_key(request)}"
+
+
+async def _scheduled(tier: int, user_key: str, max_wait_s: float, fn: Callable[[], Awaitable[Any]]) -> Any:
+    # Upstream calls wait for a fair-queue slot; cache hits and collapsed followers never do.
+    if not settings.SCHED_ENABLED:
+        return await fn()
+    async with get_scheduler().slot(tier, user_key, max_wait_s) as waited_ms:
+        timing = current_timing()
+        if timing is not None:
+            timing.add("queue", waited_ms)
+        return await fn()
+
+
+async def _hedged(
+    provider: LLMProvider, action: str, lang: str, fn: Callable[[], Awaitable[LLMResult]]
+) -> Tuple[LLMResult, str | None]:
+    """Return (result, attempt log); the log is None unless a hedge attempt was started."""
+    if not settings.HEDGE_ENABLED:
+        return await fn(), None
+    return await get_hedger().call(f"{provider.model}:{action}:{lang}", fn)
+
+
+async def _charge_tokens(request: Request, user_id: int | None, resp: LLMResult, raw_text: str) -> None:
+    if settings.QUOTA_ENABLED:
+        tokens = resp.total_tokens or heuristic_count(raw_text)
+        await get_quota_manager().charge_tokens(user_id, _client_key(request), tokens)
+
+
+def _audit_row(
+    request_uid: str,
+    user_id: int | None,
+    action: str,
+    lang: str,
+    raw_text: str,
+    route: RouteDecision,
+    prompt: PromptTemplate,
+    est_tokens: int | None = None,
+) -> Dict[str, Any]:
+    return {
+        "request_uid": request_uid,
+        "user_id": user_id,
+        "mode_action": action,
+        "mode_lang": lang,
+        "input_text": raw_text,
+        "model": route.model,
+        "route": route.reason,
+        "prompt_version": prompt.version,
+        "est_prompt_tokens": est_tokens,
+    }
+
+
+async def _insert_placeholder(row: Dict[str, Any]) -> None:
+    # Placeholder row (status=error by default), written behind by the audit writer
+    await get_audit_writer().record_start(row)
+
+
+def _record_latency(row: Dict[str, Any], latency_ms: int) -> None:
+    if settings.LATENCY_SKETCH_ENABLED:
+        get_latency_sketches().record(row["model"], row["mode_action"], row["mode_lang"], latency_ms)
+
+
+async def _finish_success(
+    row: Dict[str, Any],
+    resp: LLMResult,
+    started: float,
+    hedge: str | None = None,
+    timing: ServerTiming | None = None,
+) -> None:
+    latency_ms = int((time.perf_counter() - started) * 1000)
+    _record_latency(row, latency_ms)
+    await get_audit_writer().record_finish(
+        row["request_uid"],
+        {
+            "output_text": resp.text,
+            "hedge": hedge,
+            "server_timing": timing.compact() if timing else None,
+            "status": "success",
+            "openai_request_id": resp.request_id,
+            "latency_ms": latency_ms,
+            "prompt_tokens": resp.prompt_tokens,
+            "completion_tokens": resp.completion_tokens,
+            "total_tokens": resp.total_tokens,
+        },
+    )
+
+
+async def _finish_error(
+    row: Dict[str, Any], e: BaseException, started: float, timing: ServerTiming | None = None
+) -> str:
+    err_text = f"{type(e).__name__}: {e}"
+    latency_ms = int((time.perf_counter() - started) * 1000)
+    _record_latency(row, latency_ms)
+    await get_audit_writer().record_finish(
+        row["request_uid"],
+        {
+            "status": "error",
+            "server_timing": timing.compact() if timing else None,
+            "error_code": type(e).__name__,
+            "error_message": err_text[:1000],
+            "latency_ms": latency_ms,
+        },
+    )
+    return err_text
+
+
+async def _record_cache_hit(row: Dict[str, Any], output_text: str, started: float, hit: int) -> None:
+    # cache_hit: 1 = exact match, 2 = near-duplicate match
+    latency_ms = int((time.perf_counter() - started) * 1000)
+    _record_latency(row, latency_ms)
+    await get_audit_writer().record(
+        {
+            **row,
+            "output_text": output_text,
+            "status": "success",
+            "latency_ms": latency_ms,
+            "cache_hit": hit,
+        }
+    )
 
 
 @router.post("")
-def polish(req: PolishRequest, db: Session = Depends(get_db)):
+async def polish(
+    req: PolishRequest,
+    request: Request,
+    response: Response,
+    user: CurrentUser | None = Depends(get_optional_user),
+):
+    """
+    Response headers: X-Request-UID, and Server-Timing with db_insert, queue,
+    upstream_N (one per attempt), retry_wait, db_update and total. db_insert and
+    db_update time the hand-off to the write-behind queue, not the SQL itself.
+    """
     raw_text = (req.text or "").strip()
     if not raw_text:
         raise HTTPException(status_code=400, detail="Text is required.")
@@ -125,103 +362,380 @@ def polish(req: PolishRequest, db: Session = Depends(get_db)):
             status_code=413, detail=f"Text too large. Max {MAX_CHARS} chars."
         )
 
+    user_id = _user_id(user, req.user_id)
     mode = req.mode or {}
     action = mode.get("action", "Query")
     lang = mode.get("lang", "MySQL")
 
-    system_prompt = build_system_prompt(mode)
-    model = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+    prompt = await _prompt_for(mode, user_id, raw_text)
+    system_prompt = prompt.text
+    try:
+        raw_text, est_tokens, route = _admit(raw_text, action, prompt, route_request(action, lang, len(raw_text)))
+    except InputTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    model = route.model
+
+    tier = await _enforce_quota(request, user, user_id, 1, est_tokens)
+    user_key = _sched_key(request, user_id)
 
     request_uid = str(uuid.uuid4())
     started = time.perf_counter()
-
-    # Insert placeholder row (status=error by default)
-    db.execute(
-        text(
-            """
-            INSERT INTO ai_requests
-            (request_uid, user_id, mode_action, mode_lang, input_text, status, model, created_at)
-            VALUES
-            (:request_uid, :user_id, :mode_action, :mode_lang, :input_text, 'error', :model, NOW())
-            """
-        ),
-        {
-            "request_uid": request_uid,
-            "user_id": req.user_id,
-            "mode_action": action,
-            "mode_lang": lang,
-            "input_text": raw_text,
-            "model": model,
-        },
-    )
-    db.commit()
+    timing = start_timing()
+    deadline = Deadline(settings.POLISH_DEADLINE_S)
+    row = _audit_row(request_uid, user_id, action, lang, raw_text, route, prompt, est_tokens)
+
+    key = cache_key(raw_text, action, lang, model, system_prompt)
+    cache = get_polish_cache() if settings.POLISH_CACHE_ENABLED else None
+    with timing.measure("cache"):
+        cached = await cache.get(key) if cache else None
+    if cached is not None:
+        await _record_cache_hit(row, cached, started, hit=1)
+        response.headers.update(_timing_headers(request_uid, timing))
+        return {"text": cached, "request_uid": request_uid}
+
+    near_dup = None
+    if settings.NEAR_DUP_ENABLED and len(raw_text) <= settings.NEAR_DUP_MAX_CHARS:
+        near_dup = get_near_dup_cache()
+        similar = await near_dup.lookup(raw_text, action, lang, model, system_prompt)
+        if similar is not None:
+            await _record_cache_hit(row, similar, started, hit=2)
+            response.headers.update(_timing_headers(request_uid, timing))
+            return {"text": similar, "request_uid": request_uid}
+
+    with timing.measure("db_insert"):
+        await _insert_placeholder(row)
 
     try:
-        client = _openai_client()
-        resp = _call_openai_with_retry(client, model, system_prompt, raw_text)
-
-        latency_ms = int((time.perf_counter() - started) * 1000)
-
-        out_text = (getattr(resp, "output_text", "") or "").strip()
-        openai_request_id = getattr(resp, "id", None)
-
-        usage = getattr(resp, "usage", None)
-        prompt_tokens = getattr(usage, "input_tokens", None) if usage else None
-        completion_tokens = getattr(usage, "output_tokens", None) if usage else None
-        total_tokens = getattr(usage, "total_tokens", None) if usage else None
-
-        db.execute(
-            text(
-                """
-                UPDATE ai_requests
-                SET output_text=:output_text,
-                    status='success',
-                    error_code=NULL,
-                    error_message=NULL,
-                    openai_request_id=:openai_request_id,
-                    latency_ms=:latency_ms,
-                    prompt_tokens=:prompt_tokens,
-                    completion_tokens=:completion_tokens,
-                    total_tokens=:total_tokens
-                WHERE request_uid=:request_uid
-                """
-            ),
-            {
-                "output_text": out_text,
-                "openai_request_id": openai_request_id,
-                "latency_ms": latency_ms,
-                "prompt_tokens": prompt_tokens,
-                "completion_tokens": completion_tokens,
-                "total_tokens": total_tokens,
-                "request_uid": request_uid,
-            },
-        )
-        db.commit()
+        provider = get_provider(model=model)
+
+        def call() -> Awaitable[Tuple[LLMResult, str | None]]:
+            # A hedge attempt runs inside the primary's scheduler slot; the hedge budget bounds the extra load.
+            return _scheduled(
+                tier,
+                user_key,
+                min(settings.SCHED_MAX_QUEUE_WAIT_S, deadline.remaining()),
+                lambda: _hedged(
+                    provider,
+                    action,
+                    lang,
+                    lambda: _call_openai_with_retry(
+                        provider,
+                        system_prompt,
+                        raw_text,
+                        deadline,
+                        action,
+                        prompt_cache_key=prompt.cache_key,
+                        **route.params,
+                    ),
+                ),
+            )
 
+        if settings.POLISH_SINGLEFLIGHT_ENABLED:
+            # Identical concurrent requests share one upstream call; each keeps its own audit row.
+            wait_started = time.perf_counter()
+            (resp, hedge), shared = await polish_flights.do(key, call)
+            if shared:
+                timing.add("shared", (time.perf_counter() - wait_started) * 1000, "joined an in-flight call")
+        else:
+            resp, hedge = await call()
+            shared = False
+
+        out_text = resp.text
+        # The row keeps the breakdown up to here; db_update and total only reach the header.
+        with timing.measure("db_update"):
+            await _finish_success(row, resp, started, hedge if not shared else None, timing)
+        if not shared:
+            _calibrate(model, est_tokens, resp)
+            await _charge_tokens(request, user_id, resp, raw_text)
+
+        if cache and out_text and not shared:
+            await cache.set(key, out_text)
+        if near_dup and out_text and not shared:
+            await near_dup.add(raw_text, action, lang, model, system_prompt, out_text)
+
+        response.headers.update(_timing_headers(request_uid, timing))
         return {"text": out_text, "request_uid": request_uid}
 
     except Exception as e:
-        latency_ms = int((time.perf_counter() - started) * 1000)
-        err_text = f"{type(e).__name__}: {e}"
-
-        db.execute(
-            text(
-                """
-                UPDATE ai_requests
-                SET status='error',
-                    error_code=:error_code,
-                    error_message=:error_message,
-                    latency_ms=:latency_ms
-                WHERE request_uid=:request_uid
-                """
-            ),
-            {
-                "error_code": type(e).__name__,
-                "error_message": err_text[:1000],
-                "latency_ms": latency_ms,
-                "request_uid": request_uid,
-            },
+        err_text = await _finish_error(row, e, started, timing)
+        raise _http_error(e, err_text, _timing_headers(request_uid, timing))
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/stream")
+async def polish_stream(
+    req: PolishRequest, request: Request, user: CurrentUser | None = Depends(get_optional_user)
+):
+    """
+    Server-Sent Events variant of POST /polish:
+      event: meta   {request_uid}
+      event: delta  {text}          (repeated, in upstream order)
+      event: done   {request_uid, text}
+      event: error  {request_uid, detail}
+    """
+    raw_text = (req.text or "").strip()
+    if not raw_text:
+        raise HTTPException(status_code=400, detail="Text is required.")
+
+    if len(raw_text) > MAX_CHARS:
+        raise HTTPException(
+            status_code=413, detail=f"Text too large. Max {MAX_CHARS} chars."
         )
-        db.commit()
 
-        raise HTTPException(status_code=500, detail=err_text)
+    user_id = _user_id(user, req.user_id)
+    mode = req.mode or {}
+    action = mode.get("action", "Query")
+    lang = mode.get("lang", "MySQL")
+
+    prompt = await _prompt_for(mode, user_id, raw_text)
+    system_prompt = prompt.text
+    try:
+        raw_text, est_tokens, route = _admit(raw_text, action, prompt, route_request(action, lang, len(raw_text)))
+    except InputTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    model = route.model
+
+    tier = await _enforce_quota(request, user, user_id, 1, est_tokens)
+    user_key = _sched_key(request, user_id)
+
+    request_uid = str(uuid.uuid4())
+    row = _audit_row(request_uid, user_id, action, lang, raw_text, route, prompt, est_tokens)
+    key = cache_key(raw_text, action, lang, model, system_prompt)
+    cache = get_polish_cache() if settings.POLISH_CACHE_ENABLED else None
+
+    async def events() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        deadline = Deadline(settings.POLISH_DEADLINE_S)
+        yield _sse("meta", {"request_uid": request_uid})
+
+        cached = await cache.get(key) if cache else None
+        if cached is not None:
+            await _record_cache_hit(row, cached, started, hit=1)
+            yield _sse("delta", {"text": cached})
+            yield _sse("done", {"request_uid": request_uid, "text": cached})
+            return
+
+        await _insert_placeholder(row)
+        try:
+            provider = get_provider(model=model)
+            result = None
+            upstream_started = None
+            async with AsyncExitStack() as stack:
+                if settings.SCHED_ENABLED:
+                    # The slot is held for the whole stream, not just until the first delta.
+                    await stack.enter_async_context(
+                        get_scheduler().slot(
+                            tier, user_key, min(settings.SCHED_MAX_QUEUE_WAIT_S, deadline.remaining())
+                        )
+                    )
+                upstream_started = time.perf_counter()
+                async for item in _stream_openai_with_retry(
+                    provider, system_prompt, raw_text, deadline, prompt_cache_key=prompt.cache_key, **route.params
+                ):
+                    if isinstance(item, LLMResult):
+                        result = item
+                    elif item:
+                        yield _sse("delta", {"text": item})
+            if result is None:
+                raise RuntimeError("Upstream stream ended without a result.")
+            _observe(provider, action, upstream_started, ok=True, resp=result)
+        except BaseException as e:
+            if upstream_started is not None and isinstance(e, Exception) and not isinstance(e, CircuitOpenError):
+                _observe(provider, action, upstream_started, ok=False)
+            # Also finalize the row when the client disconnects mid-stream (CancelledError).
+            err_text = await asyncio.shield(_finish_error(row, e, started))
+            if isinstance(e, Exception):
+                yield _sse("error", {"request_uid": request_uid, "detail": err_text})
+                return
+            raise
+
+        await _finish_success(row, result, started)
+        _calibrate(model, est_tokens, result)
+        await _charge_tokens(request, user_id, result, raw_text)
+        if cache and result.text:
+            await cache.set(key, result.text)
+        yield _sse("done", {"request_uid": request_uid, "text": result.text})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Request-UID": request_uid},
+    )
+
+
+async def _polish_batch_item(
+    item: PolishBatchItem,
+    user_id: int | None,
+    sem: asyncio.Semaphore,
+    deadline: Deadline,
+    tier: int,
+    user_key: str,
+) -> Tuple[Dict[str, Any], int]:
+    """
+    Run one batch item (never raises). Returns its finished ai_requests row and the
+    tokens to charge: like a single request, only an upstream call of its own is charged.
+    """
+    started = time.perf_counter()
+    raw_text = (item.text or "").strip()
+    mode = item.mode or {}
+    action = mode.get("action", "Query")
+    lang = mode.get("lang", "MySQL")
+    if raw_text and len(raw_text) <= MAX_CHARS:
+        prompt = await _prompt_for(mode, user_id, raw_text)
+    else:
+        prompt = prompt_for_mode(mode)
+    route = route_request(action, lang, len(raw_text))
+    est_tokens = None
+    admit_error = None
+    try:
+        if len(raw_text) <= MAX_CHARS:
+            raw_text, est_tokens, route = _admit(raw_text, action, prompt, route)
+    except InputTooLarge as e:
+        admit_error = e
+    model = route.model
+    row: Dict[str, Any] = {
+        **_audit_row(str(uuid.uuid4()), user_id, action, lang, raw_text, route, prompt, est_tokens),
+        "output_text": None,
+        "status": "error",
+        "error_code": None,
+        "error_message": None,
+        "openai_request_id": None,
+        "latency_ms": 0,
+        "prompt_tokens": None,
+        "completion_tokens": None,
+        "total_tokens": None,
+        "cache_hit": 0,
+    }
+    charge = 0
+    try:
+        if not raw_text:
+            raise ValueError("Text is required.")
+        if len(raw_text) > MAX_CHARS:
+            raise ValueError(f"Text too large. Max {MAX_CHARS} chars.")
+        if admit_error is not None:
+            raise admit_error
+
+        system_prompt = prompt.text
+        key = cache_key(raw_text, action, lang, model, system_prompt)
+        cache = get_polish_cache() if settings.POLISH_CACHE_ENABLED else None
+        cached = await cache.get(key) if cache else None
+        if cached is not None:
+            row.update(output_text=cached, status="success", cache_hit=1)
+        else:
+            provider = get_provider(model=model)
+
+            def call() -> Awaitable[LLMResult]:
+                # Batch items may queue for as long as the batch deadline allows.
+                return _scheduled(
+                    tier,
+                    user_key,
+                    deadline.remaining(),
+                    lambda: _call_openai_with_retry(
+                        provider,
+                        system_prompt,
+                        raw_text,
+                        deadline,
+                        action,
+                        prompt_cache_key=prompt.cache_key,
+                        **route.params,
+                    ),
+                )
+
+            async with sem:
+                if settings.POLISH_SINGLEFLIGHT_ENABLED:
+                    resp, shared = await polish_flights.do(key, call)
+                else:
+                    resp, shared = await call(), False
+            row.update(
+                output_text=resp.text,
+                status="success",
+                openai_request_id=resp.request_id,
+                prompt_tokens=resp.prompt_tokens,
+                completion_tokens=resp.completion_tokens,
+                total_tokens=resp.total_tokens,
+            )
+            if not shared:
+                _calibrate(model, est_tokens, resp)
+                charge = resp.total_tokens or heuristic_count(raw_text)
+            if cache and resp.text and not shared:
+                await cache.set(key, resp.text)
+    except Exception as e:
+        row.update(error_code=type(e).__name__, error_message=f"{type(e).__name__}: {e}"[:1000])
+
+    row["latency_ms"] = int((time.perf_counter() - started) * 1000)
+    return row, charge
+
+
+@router.post("/batch")
+async def polish_batch(
+    req: PolishBatchRequest, request: Request, user: CurrentUser | None = Depends(get_optional_user)
+):
+    if len(req.items) > settings.POLISH_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413, detail=f"Too many items. Max {settings.POLISH_BATCH_MAX_ITEMS} per batch."
+        )
+
+    user_id = _user_id(user, req.user_id)
+    est_tokens = sum(heuristic_count((item.text or "").strip()[:MAX_CHARS]) for item in req.items)
+    tier = await _enforce_quota(request, user, user_id, len(req.items), est_tokens)
+    user_key = _sched_key(request, user_id)
+
+    sem = asyncio.Semaphore(settings.POLISH_BATCH_CONCURRENCY)
+    # Batches are not bound to the desktop timeout; scale the deadline with the number of waves.
+    # The scheduler's per-user cap also bounds how many items of one batch run at once.
+    width = settings.POLISH_BATCH_CONCURRENCY
+    if settings.SCHED_ENABLED:
+        width = min(width, settings.SCHED_PER_USER_CAP)
+    waves = -(-len(req.items) // width)
+    deadline = Deadline(settings.POLISH_DEADLINE_S * waves)
+    results = await asyncio.gather(
+        *(_polish_batch_item(item, user_id, sem, deadline, tier, user_key) for item in req.items)
+    )
+    rows = [row for row, _ in results]
+
+    if settings.QUOTA_ENABLED:
+        used = sum(charge for _, charge in results)
+        await get_quota_manager().charge_tokens(user_id, _client_key(request), used)
+
+    # Finished rows go straight to the write-behind queue; it batches them into multi-row INSERTs.
+    writer = get_audit_writer()
+    for row in rows:
+        _record_latency(row, row["latency_ms"])
+        await writer.record(row)
+
+    return {
+        "results": [
+            {
+                "index": i,
+                "request_uid": row["request_uid"],
+                "status": row["status"],
+                "text": row["output_text"],
+                "error": row["error_message"],
+            }
+            for i, row in enumerate(rows)
+        ]
+    }
+
+
+@router.get("/stats")
+def polish_stats():
+    stats: Dict[str, Any] = {"singleflight": {**polish_flights.stats, "in_flight": len(polish_flights)}}
+    stats["upstreams"] = {
+        name: {**policy.stats, "breaker": policy.breaker.state}
+        for name, policy in all_retry_policies().items()
+    }
+    stats["tokens"] = get_token_estimator().snapshot()
+    if settings.ROUTING_ENABLED:
+        stats["routing"] = get_model_router().snapshot()
+    if settings.HEDGE_ENABLED:
+        stats["hedging"] = get_hedger().snapshot()
+    if settings.SCHED_ENABLED:
+        stats["scheduler"] = get_scheduler().snapshot()
+    if settings.POLISH_CACHE_ENABLED:
+        stats["cache"] = dict(get_polish_cache().stats)
+    if settings.NEAR_DUP_ENABLED:
+        stats["near_dup"] = dict(get_near_dup_cache().stats)
+    return stats
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.api.deps import get_current_user
+from app.core.config import settings
+from app.schemas.schema_registry import SchemaRegisterRequest, SchemaTablesResponse
+from app.services.identity import CurrentUser
+from app.services.schema_registry import DIALECTS, SchemaError, canonical_dialect, get_schema_registry
+
+router = APIRouter(prefix="/schemas", tags=["schemas"])
+
+
+def _dialect(value: str) -> str:
+    dialect = canonical_dialect(value)
+    if dialect is None:
+        raise HTTPException(status_code=400, detail=f"Unknown dialect. Use one of: {', '.join(DIALECTS)}.")
+    return dialect
+
+
+@router.post("", response_model=SchemaTablesResponse)
+async def register_schema(payload: SchemaRegisterRequest, user: CurrentUser = Depends(get_current_user)):
+    dialect = _dialect(payload.dialect)
+    if len(payload.ddl) > settings.SCHEMA_MAX_DDL_CHARS:
+        raise HTTPException(status_code=413, detail=f"Schema too large. Max {settings.SCHEMA_MAX_DDL_CHARS} chars.")
+    try:
+        tables = await get_schema_registry().register(user.id, dialect, payload.ddl, payload.replace)
+    except SchemaError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"dialect": dialect, "tables": tables}
+
+
+@router.get("", response_model=SchemaTablesResponse)
+async def list_schema(dialect: str, user: CurrentUser = Depends(get_current_user)):
+    dialect = _dialect(dialect)
+    tables = await get_schema_registry().list_tables(user.id, dialect)
+    return {"dialect": dialect, "tables": tables}
+
+
+@router.delete("")
+async def delete_schema(dialect: str, table: str | None = None, user: CurrentUser = Depends(get_current_user)):
+    deleted = await get_schema_registry().delete(user.id, _dialect(dialect), table)
+    return {"deleted": deleted}
@@ -0,0 +1,40 @@
+from datetime import date, datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.api.deps import get_current_user
+from app.core.config import settings
+from app.services.identity import CurrentUser
+from app.services.usage_rollup import get_usage
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+GROUP_BY = ("day", "action", "lang", "model")
+
+
+async def usage_report(user_id: int, start: date | None, end: date | None, group_by: str):
+    """Counts and token sums from the daily rollups; defaults to the current UTC month."""
+    today = datetime.now(timezone.utc).date()
+    end = end or today
+    start = start or end.replace(day=1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'.")
+    if end - start > timedelta(days=settings.USAGE_MAX_RANGE_DAYS):
+        raise HTTPException(status_code=400, detail=f"Range too large. Max {settings.USAGE_MAX_RANGE_DAYS} days.")
+
+    dims = [g.strip() for g in group_by.split(",") if g.strip()]
+    unknown = [g for g in dims if g not in GROUP_BY]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by: {', '.join(unknown)}. Use {', '.join(GROUP_BY)}.")
+    return await get_usage(user_id, start, end, list(dict.fromkeys(dims)))
+
+
+@router.get("")
+async def usage(
+    start: date | None = Query(default=None, alias="from"),
+    end: date | None = Query(default=None, alias="to"),
+    group_by: str = "day",
+    user: CurrentUser = Depends(get_current_user),
+):
+    """The caller's own usage; support looks other users up through /admin/usage."""
+    return await usage_report(user.id, start, end, group_by)
@@ -10,16 +10,174 @@ class Settings(BaseSettings):
 
     # ---- database ----
     DATABASE_URL: str = "sqlite:///./devion.db"
+    ASYNC_DATABASE_URL: str | None = None  # derived from DATABASE_URL when unset
+    AI_REQUESTS_PARTITIONED: bool = False  # monthly RANGE partitions (MySQL/Postgres only)
+    AI_REQUESTS_PARTITION_MONTHS_AHEAD: int = 3
 
     # ---- OpenAI ----
     OPENAI_API_KEY: str | None = None
     OPENAI_MODEL: str = "gpt-4.1-mini"
+    OPENAI_BASE_URL: str | None = None
+
+    # ---- LLM providers ----
+    LLM_PROVIDER: str = "openai"  # openai | stub
+    LLM_WARM_ON_STARTUP: bool = True
+    LLM_TIMEOUT_S: float = 60.0
+    LLM_MAX_CONNECTIONS: int = 500
+    LLM_MAX_KEEPALIVE: int = 100
+    LLM_KEEPALIVE_EXPIRY_S: float = 60.0
+    LLM_STUB_LATENCY_MS: int = 0
+
+    # ---- Upstream retries / circuit breaker ----
+    POLISH_DEADLINE_S: float = 25.0  # desktop client gives up at 30 s
+    RETRY_MAX_RETRIES: int = 4
+    RETRY_BASE_DELAY_S: float = 0.25
+    RETRY_MAX_DELAY_S: float = 4.0
+    RETRY_BUDGET_RATIO: float = 0.2  # retries allowed per request, per process
+    RETRY_BUDGET_MIN_PER_S: float = 1.0
+    BREAKER_FAILURE_THRESHOLD: int = 5  # consecutive upstream failures
+    BREAKER_COOLDOWN_S: float = 30.0
+
+    # ---- Per-user quotas (tier = User.subscription) ----
+    # Off by default: desktop clients behind one NAT would share a single anonymous Free quota.
+    # Requests are keyed per user only when they carry a bearer token (see get_optional_user).
+    QUOTA_ENABLED: bool = False
+    QUOTA_FREE_REQUESTS_PER_MIN: int = 20
+    QUOTA_FREE_TOKENS_PER_DAY: int = 100_000
+    QUOTA_PRO_REQUESTS_PER_MIN: int = 120
+    QUOTA_PRO_TOKENS_PER_DAY: int = 2_000_000
+    QUOTA_ANON_TIER: int = 0  # requests without user_id, counted per client IP
+    QUOTA_USER_REFRESH_S: int = 300  # re-read tier and 24 h usage from the DB
+    QUOTA_FLUSH_INTERVAL_S: int = 10
+    QUOTA_MAX_TRACKED_KEYS: int = 100_000
+
+    # ---- Token estimation / admission control ----
+    TOKEN_USE_TIKTOKEN: bool = True  # exact counts when tiktoken is installed
+    TOKEN_MAX_INPUT_TOKENS: int = 6000
+    TOKEN_OVERSIZE_POLICY: str = "reroute"  # reject | trim | reroute
+    TOKEN_REROUTE_MAX_INPUT_TOKENS: int = 24_000  # reroute to ROUTING_LARGE_MODEL up to this size
+    TOKEN_MAX_OUTPUT_PROGRAM: int = 4096
+    TOKEN_MAX_OUTPUT_QUERY: int = 1024
+    TOKEN_CALIBRATION_ALPHA: float = 0.05
+
+    # ---- Metrics (GET /metrics) ----
+    METRICS_ENABLED: bool = True
+    METRICS_LOOP_INTERVAL_S: float = 0.5  # event-loop lag probe
+
+    # ---- Model routing (action, lang, input size, live model health) ----
+    ROUTING_ENABLED: bool = True
+    ROUTING_SMALL_MODEL: str = "gpt-4.1-nano"  # short Query asks
+    ROUTING_SMALL_MAX_CHARS: int = 400
+    ROUTING_LARGE_MODEL: str = "gpt-4.1"  # long Program inputs
+    ROUTING_LARGE_MIN_CHARS: int = 8000
+    ROUTING_FALLBACK_MODEL: str = "gpt-4.1-nano"
+    ROUTING_EWMA_ALPHA: float = 0.2
+    ROUTING_MIN_SAMPLES: int = 5
+    ROUTING_MAX_ERROR_RATE: float = 0.5
+    ROUTING_MAX_LATENCY_MS: float = 12_000
+    ROUTING_RECOVERY_S: float = 30.0  # retry a degraded model after this long without samples
+
+    # ---- Latency percentile sketches (GET /admin/latency) ----
+    LATENCY_SKETCH_ENABLED: bool = True
+    LATENCY_SKETCH_ALPHA: float = 0.01  # relative accuracy of every percentile
+    LATENCY_SKETCH_FLUSH_INTERVAL_S: int = 15
+    ADMIN_LATENCY_MAX_RANGE_DAYS: int = 93
+
+    # ---- Daily usage rollups (GET /usage) ----
+    USAGE_ROLLUP_ENABLED: bool = True
+    USAGE_ROLLUP_INTERVAL_S: int = 60
+    USAGE_ROLLUP_SETTLE_S: int = 300  # must exceed POLISH_DEADLINE_S plus the audit writer lag
+    USAGE_ROLLUP_MAX_DAYS_PER_RUN: int = 7  # backfill windows per transaction batch
+    USAGE_MAX_RANGE_DAYS: int = 366
+
+    # ---- Per-user schema registry (Query mode) ----
+    SCHEMA_REGISTRY_ENABLED: bool = True
+    SCHEMA_TOP_K: int = 5  # tables put into the prompt per request
+    SCHEMA_MAX_TABLES_PER_USER: int = 500  # per dialect
+    SCHEMA_MAX_DDL_CHARS: int = 200_000
+    SCHEMA_CACHE_MAX_INDEXES: int = 1000  # (user, dialect) BM25 indexes kept in memory
+
+    # ---- Hedged upstream calls (POST /polish) ----
+    HEDGE_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 0.95  # of recent latency per (model, action, lang)
+    HEDGE_MIN_DELAY_MS: int = 500
+    HEDGE_MIN_SAMPLES: int = 50
+    HEDGE_WINDOW: int = 500
+    HEDGE_BUDGET_RATIO: float = 0.05  # hedges allowed per request, per process
+    HEDGE_BUDGET_MIN_PER_S: float = 0.2
+
+    # ---- Upstream admission scheduler ----
+    SCHED_ENABLED: bool = True
+    SCHED_MAX_CONCURRENCY: int = 64  # upstream calls in flight per worker
+    SCHED_WEIGHT_FREE: float = 1.0
+    SCHED_WEIGHT_PRO: float = 4.0
+    SCHED_PER_USER_CAP: int = 4  # in-flight calls per user
+    SCHED_MAX_QUEUE_WAIT_S: float = 10.0
+
+    # ---- Prompts ----
+    PROMPT_VERSION: str = "v2"  # see app/core/prompts.py
+
+    # ---- Polish response cache ----
+    POLISH_CACHE_ENABLED: bool = True
+    POLISH_CACHE_TTL_S: int = 7 * 24 * 3600
+    POLISH_CACHE_MAX_ENTRIES: int = 10_000
+    POLISH_CACHE_DISK_PATH: str | None = "./polish_cache.sqlite"  # empty => memory only
+    POLISH_CACHE_DISK_MAX_ENTRIES: int = 200_000
+    POLISH_CACHE_PREWARM_ROWS: int = 0  # >0 => load top-N answers from ai_requests at startup
+
+    # ---- Near-duplicate polish cache (MinHash/LSH) ----
+    NEAR_DUP_ENABLED: bool = False
+    NEAR_DUP_THRESHOLD: float = 0.9  # estimated Jaccard similarity
+    NEAR_DUP_NUM_PERM: int = 64
+    NEAR_DUP_BANDS: int = 16
+    NEAR_DUP_SHINGLE_SIZE: int = 4  # characters
+    NEAR_DUP_MAX_ENTRIES: int = 5_000  # per (action, lang)
+    NEAR_DUP_MAX_INDEXES: int = 32  # distinct (action, lang) indexes; further pairs share one
+    NEAR_DUP_MAX_CHARS: int = 800  # longer inputs skip this tier; MinHash cost grows with length
+    NEAR_DUP_REBUILD_ROWS: int = 0  # >0 => rebuild from ai_requests at startup
+
+    # ---- Request coalescing ----
+    POLISH_SINGLEFLIGHT_ENABLED: bool = True
+
+    # ---- Batch polish ----
+    POLISH_BATCH_MAX_ITEMS: int = 500
+    POLISH_BATCH_CONCURRENCY: int = 16  # upstream calls in flight per batch
+
+    # ---- ai_requests write-behind ----
+    AUDIT_QUEUE_MAX: int = 10_000  # producers wait when the queue is full
+    AUDIT_BATCH_SIZE: int = 200
+    AUDIT_FLUSH_INTERVAL_MS: int = 250
+    AUDIT_FLUSH_MAX_RETRIES: int = 5  # a failing batch is retried, then dropped
+    AUDIT_RETRY_BACKOFF_MS: int = 200  # doubles per retry, capped at 5 s
 
     # ---- Auth / JWT ----
     JWT_SECRET: str = "CHANGE_THIS"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 30
     VERIFY_TOKEN_EXPIRE_MINUTES: int = 60
+    REFRESH_CACHE_TTL_S: int = 60  # validity/revocation cache; bounds how late other workers see a logout
+    REFRESH_CACHE_MAX_ENTRIES: int = 100_000
+    REFRESH_PURGE_INTERVAL_S: int = 3600
+    REFRESH_PURGE_BATCH: int = 5000
+    AUTH_TOKEN_CACHE_MAX_ENTRIES: int = 50_000  # decoded access tokens, each kept until its exp
+    AUTH_USER_CACHE_TTL_S: int = 300  # id/subscription per email; also how late a plan change shows
+    AUTH_USER_CACHE_MAX_ENTRIES: int = 50_000
+    # Legacy opt-in: honour a body user_id on /polish without a bearer token. Anyone can claim any id,
+    # so only enable it while old desktop builds that never send a token are still in use.
+    AUTH_TRUST_CLIENT_USER_ID: bool = False
+
+    # ---- Password hashing and login throttling ----
+    PASSWORD_POOL_ENABLED: bool = True
+    PASSWORD_POOL_WORKERS: int = 0  # 0 = one per CPU core
+    PASSWORD_POOL_MAX_QUEUE: int = 256  # waiting hashes beyond this get a 503
+    LOGIN_THROTTLE_ENABLED: bool = True
+    LOGIN_IP_MAX_PER_MIN: int = 60  # login attempts per client IP (per worker)
+    LOGIN_ACCOUNT_MAX_FAILURES: int = 5  # failed logins per account in the window before a lockout
+    LOGIN_ACCOUNT_WINDOW_S: int = 900
+    LOGIN_THROTTLE_MAX_KEYS: int = 100_000
+
+    # ---- Admin endpoints (X-Admin-Token header; disabled while empty) ----
+    ADMIN_TOKEN: str = ""
 
     # ---- App base ----
     APP_BASE_URL: str = "http://127.0.0.1:8000"
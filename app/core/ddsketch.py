@@ -0,0 +1,139 @@
+"""
+DDSketch: a mergeable quantile sketch with relative-error guarantees.
+
+A value x > 0 is counted in bucket ceil(log_gamma(x)), gamma = (1 + a) / (1 - a).
+Any quantile returned is within a relative error a of the exact one. Merging two
+sketches with the same a means adding their bucket counts, so hourly sketches from
+many workers combine into the same result as one sketch fed every value. Latencies
+from 1 ms to 10 min span at most about 660 buckets at a = 1 %; a typical hour of
+upstream latencies populates one to two hundred.
+
+Serialized form (to_bytes): a version byte, the relative accuracy, count/min/max/sum,
+zero count, then sorted (index delta, count) pairs as varints: a few hundred bytes
+for a busy hour.
+"""
+import math
+import struct
+from typing import Dict, Iterable, Tuple
+
+_VERSION = 1
+_HEADER = struct.Struct("<BdQddd")  # version, alpha, count, min, max, sum
+_MIN_VALUE = 1e-9  # values at or below this go to the zero bucket
+
+
+def _write_varint(out: bytearray, n: int) -> None:
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return n, pos
+        shift += 7
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _unzigzag(n: int) -> int:
+    return (n >> 1) ^ -(n & 1)
+
+
+class DDSketch:
+    __slots__ = ("alpha", "_gamma", "_log_gamma", "bins", "zero_count", "count", "min", "max", "sum")
+
+    def __init__(self, alpha: float = 0.01):
+        self.alpha = alpha
+        self._gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self._gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sum = 0.0
+
+    def add(self, value: float, weight: int = 1) -> None:
+        if value <= _MIN_VALUE:
+            self.zero_count += weight
+        else:
+            i = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[i] = self.bins.get(i, 0) + weight
+        self.count += weight
+        self.sum += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches with different relative accuracy.")
+        for i, c in other.bins.items():
+            self.bins[i] = self.bins.get(i, 0) + c
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for i in sorted(self.bins):
+            seen += self.bins[i]
+            if seen > rank:
+                value = 2 * self._gamma ** i / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def quantiles(self, qs: Iterable[float]) -> Dict[float, float | None]:
+        return {q: self.quantile(q) for q in qs}
+
+    def to_bytes(self) -> bytes:
+        out = bytearray(_HEADER.pack(_VERSION, self.alpha, self.count, self.min, self.max, self.sum))
+        _write_varint(out, self.zero_count)
+        _write_varint(out, len(self.bins))
+        prev = 0
+        for i in sorted(self.bins):
+            _write_varint(out, _zigzag(i - prev))
+            _write_varint(out, self.bins[i])
+            prev = i
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DDSketch":
+        version, alpha, count, lo, hi, total = _HEADER.unpack_from(data)
+        if version != _VERSION:
+            raise ValueError(f"Unsupported sketch version: {version}")
+        sketch = cls(alpha)
+        sketch.count, sketch.min, sketch.max, sketch.sum = count, lo, hi, total
+        pos = _HEADER.size
+        sketch.zero_count, pos = _read_varint(data, pos)
+        n, pos = _read_varint(data, pos)
+        prev = 0
+        for _ in range(n):
+            delta, pos = _read_varint(data, pos)
+            c, pos = _read_varint(data, pos)
+            prev += _unzigzag(delta)
+            sketch.bins[prev] = c
+        return sketch
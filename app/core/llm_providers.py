@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Tuple, Type, Union
+
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class LLMResult:
+    text: str
+    request_id: str | None = None
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    total_tokens: int | None = None
+
+
+class LLMProvider(ABC):
+    """One instance per (provider, model); holds a long-lived client."""
+
+    name = ""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    async def warm(self) -> None:
+        """Open connections ahead of the first real call (optional)."""
+
+    async def aclose(self) -> None:
+        """Release pooled connections."""
+
+    @abstractmethod
+    async def generate(self, instructions: str, user_input: str, **params) -> LLMResult:
+        raise NotImplementedError
+
+    async def stream(self, instructions: str, user_input: str, **params) -> AsyncIterator[Union[str, LLMResult]]:
+        """Yield text deltas, then one final LLMResult. Default: a single chunk."""
+        result = await self.generate(instructions, user_input, **params)
+        yield result.text
+        yield result
+
+
+def _usage_fields(usage) -> dict:
+    return {
+        "prompt_tokens": getattr(usage, "input_tokens", None) if usage else None,
+        "completion_tokens": getattr(usage, "output_tokens", None) if usage else None,
+        "total_tokens": getattr(usage, "total_tokens", None) if usage else None,
+    }
+
+
+def _openai_params(params: dict) -> dict:
+    # prompt_cache_key goes in the body so older SDKs without the kwarg still send it.
+    cache_key = params.pop("prompt_cache_key", None)
+    if cache_key:
+        params["extra_body"] = {**params.get("extra_body", {}), "prompt_cache_key": cache_key}
+    return params
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, model: str):
+        super().__init__(model)
+        from app.core.openai_client import make_async_client
+
+        self.client = make_async_client()
+
+    async def warm(self) -> None:
+        # Any cheap authenticated GET completes TCP + TLS and leaves a keep-alive connection.
+        await self.client.models.retrieve(self.model)
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+    async def generate(self, instructions: str, user_input: str, **params) -> LLMResult:
+        resp = await self.client.responses.create(
+            model=self.model,
+            instructions=instructions,
+            input=user_input,
+            temperature=params.pop("temperature", 0.2),
+            **_openai_params(params),
+        )
+        return LLMResult(
+            text=(getattr(resp, "output_text", "") or "").strip(),
+            request_id=getattr(resp, "id", None),
+            **_usage_fields(getattr(resp, "usage", None)),
+        )
+
+    async def stream(self, instructions: str, user_input: str, **params) -> AsyncIterator[Union[str, LLMResult]]:
+        parts = []
+        final = None
+        # The context manager closes the HTTP response even when the consumer stops early.
+        async with self.client.responses.stream(
+            model=self.model,
+            instructions=instructions,
+            input=user_input,
+            temperature=params.pop("temperature", 0.2),
+            **_openai_params(params),
+        ) as events:
+            async for event in events:
+                if event.type == "response.output_text.delta":
+                    parts.append(event.delta)
+                    yield event.delta
+                elif event.type == "response.completed":
+                    final = event.response
+                elif event.type == "response.failed":
+                    error = getattr(event.response, "error", None)
+                    raise RuntimeError(f"Upstream stream failed: {getattr(error, 'message', None) or event.type}")
+                elif event.type == "error":
+                    raise RuntimeError(f"Upstream stream failed: {event.message or event.type}")
+        yield LLMResult(
+            text="".join(parts).strip(),
+            request_id=getattr(final, "id", None),
+            **_usage_fields(getattr(final, "usage", None)),
+        )
+
+
+class StubProvider(LLMProvider):
+    """Deterministic in-process provider for benchmarks and offline dev."""
+
+    name = "stub"
+
+    async def stream(self, instructions: str, user_input: str, **params) -> AsyncIterator[Union[str, LLMResult]]:
+        result = await self.generate(instructions, user_input, **params)
+        for line in result.text.splitlines(keepends=True):
+            yield line
+        yield result
+
+    async def generate(self, instructions: str, user_input: str, **params) -> LLMResult:
+        if settings.LLM_STUB_LATENCY_MS:
+            await asyncio.sleep(settings.LLM_STUB_LATENCY_MS / 1000)
+        digest = hashlib.sha256(f"{instructions}\0{user_input}".encode("utf-8")).hexdigest()
+        text = f"-- stub {digest[:12]}\n{user_input.strip()}"
+        prompt_tokens = (len(instructions) + len(user_input)) // 4
+        completion_tokens = len(text) // 4
+        return LLMResult(
+            text=text,
+            request_id=f"stub_{digest[:24]}",
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        )
+
+
+_PROVIDERS: Dict[str, Type[LLMProvider]] = {
+    OpenAIProvider.name: OpenAIProvider,
+    StubProvider.name: StubProvider,
+}
+_instances: Dict[Tuple[str, str], LLMProvider] = {}
+
+
+def register_provider(cls: Type[LLMProvider]) -> Type[LLMProvider]:
+    _PROVIDERS[cls.name] = cls
+    return cls
+
+
+def get_provider(name: str | None = None, model: str | None = None) -> LLMProvider:
+    name = name or settings.LLM_PROVIDER
+    model = model or settings.OPENAI_MODEL
+    key = (name, model)
+    provider = _instances.get(key)
+    if provider is None:
+        cls = _PROVIDERS.get(name)
+        if cls is None:
+            raise RuntimeError(f"Unknown LLM provider: {name}")
+        provider = _instances[key] = cls(model)
+    return provider
+
+
+def reachable_models() -> List[str]:
+    """Every model a request can be sent to: the default, each routing chain and the oversize reroute target."""
+    models = [settings.OPENAI_MODEL]
+    if settings.ROUTING_ENABLED:
+        from app.services.model_routing import get_model_router
+
+        for route in get_model_router().routes:
+            models.extend(route.models)
+    if settings.TOKEN_OVERSIZE_POLICY == "reroute":
+        models.append(settings.ROUTING_LARGE_MODEL)
+    # Hedge attempts go to the same (provider, model) as the primary, so they are covered.
+    return list(dict.fromkeys(models))
+
+
+async def _warm(provider: LLMProvider) -> None:
+    try:
+        await provider.warm()
+    except Exception:
+        # Warm-up is best effort; the first request will connect instead.
+        log.warning("LLM provider warm-up failed for %s:%s", provider.name, provider.model, exc_info=True)
+
+
+async def warm_providers() -> None:
+    """Open a pooled connection for each (provider, model) that routing can pick."""
+    if not settings.LLM_WARM_ON_STARTUP:
+        return
+    await asyncio.gather(*(_warm(get_provider(model=model)) for model in reachable_models()))
+
+
+async def close_providers() -> None:
+    for provider in list(_instances.values()):
+        try:
+            await provider.aclose()
+        except Exception:
+            log.warning("Failed to close provider %s", provider.name, exc_info=True)
+    _instances.clear()
@@ -0,0 +1,410 @@
+"""
+Prometheus metrics in the text exposition format, without extra dependencies.
+
+Hot-path recording is a dict lookup and a few integer adds: histograms keep
+per-bucket counts and are only made cumulative at scrape time. Counters that
+services already keep in their `stats` dicts (cache, retries, writer, ...) are not
+duplicated; callbacks read them when /metrics is scraped.
+
+Updates are not locked. The sync DB pool records from threadpool threads, so under
+contention an observation can very rarely be lost; that is the price of a lock-free hot path.
+"""
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from app.core.config import settings
+
+Sample = Tuple[Dict[str, str], float]
+Family = Tuple[str, str, str, List[Sample]]  # name, type, help, samples
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 60.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+        self._callbacks: List[Callable[[], Iterable[Family]]] = []
+
+    def register(self, metric: "_Metric") -> None:
+        self._metrics.append(metric)
+
+    def register_callback(self, fn: Callable[[], Iterable[Family]]) -> None:
+        self._callbacks.append(fn)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            metric.render(lines)
+        for fn in self._callbacks:
+            for name, kind, help_text, samples in fn():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    keys = tuple(labels)
+                    lines.append(f"{name}{_labels(keys, tuple(labels[k] for k in keys))} {_num(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        REGISTRY.register(self)
+
+    def _header(self, lines: List[str]) -> None:
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self, lines: List[str]) -> None:
+        self._header(lines)
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_num(value)}")
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def set(self, value: float, *labels: Any) -> None:
+        self._values[labels] = value
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: Any, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def render(self, lines: List[str]) -> None:
+        self._header(lines)
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_num(value)}")
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self, lines: List[str]) -> None:
+        self._header(lines)
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % _num(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+
+
+# ---- hot-path metrics ----
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency until the last body byte.", ("method", "route", "status")
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served.")
+UPSTREAM_SECONDS = Histogram(
+    "llm_upstream_duration_seconds", "Upstream LLM call latency, retries included.", ("model", "action", "outcome")
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the upstream.", ("model", "action", "kind"))
+LLM_REQUEST_TOKENS = Histogram(
+    "llm_request_tokens", "Total tokens per upstream call.", ("model", "action"), buckets=TOKEN_BUCKETS
+)
+DB_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Time to get a connection from the pool.", ("engine",), buckets=FAST_BUCKETS
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a periodic timer.", buckets=FAST_BUCKETS
+)
+SCHED_WAIT_SECONDS = Histogram("scheduler_queue_wait_seconds", "Upstream scheduler queue wait.", ("tier",))
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_duration_seconds", "bcrypt time in the password pool.", ("op",), buckets=FAST_BUCKETS
+)
+PASSWORD_QUEUE_SECONDS = Histogram(
+    "password_queue_wait_seconds", "Wait for a password pool worker.", ("op",), buckets=FAST_BUCKETS + (5.0, 10.0)
+)
+AUDIT_LAG_SECONDS = Histogram(
+    "audit_writer_lag_seconds", "Age of the oldest event in an ai_requests flush.", buckets=FAST_BUCKETS + (5.0, 10.0)
+)
+
+
+# ---- DB pool ----
+_pools: Dict[str, Any] = {}
+
+
+def instrument_pool(pool: Any, label: str) -> None:
+    """Time connection checkout (including the wait for a free slot) on a SQLAlchemy pool."""
+    do_get = pool._do_get
+
+    def timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            DB_CHECKOUT_SECONDS.observe(time.perf_counter() - started, label)
+
+    pool._do_get = timed_do_get
+    _pools[label] = pool
+
+
+def _pool_families() -> Iterable[Family]:
+    checked_out: List[Sample] = []
+    overflow: List[Sample] = []
+    size: List[Sample] = []
+    for label, pool in _pools.items():
+        for samples, attr in ((checked_out, "checkedout"), (overflow, "overflow"), (size, "size")):
+            fn = getattr(pool, attr, None)
+            if fn is not None:
+                samples.append(({"engine": label}, fn()))
+    yield "db_pool_checked_out", "gauge", "Connections currently checked out.", checked_out
+    yield "db_pool_overflow", "gauge", "Connections open beyond pool_size (negative: unused capacity).", overflow
+    yield "db_pool_size", "gauge", "Configured pool size.", size
+
+
+REGISTRY.register_callback(_pool_families)
+
+
+# ---- event loop and threadpool saturation ----
+_loop_task: asyncio.Task | None = None
+
+
+async def _watch_loop(interval_s: float) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval_s)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - started - interval_s))
+
+
+def start_loop_monitor() -> None:
+    global _loop_task
+    if _loop_task is None or _loop_task.done():
+        _loop_task = asyncio.get_running_loop().create_task(
+            _watch_loop(settings.METRICS_LOOP_INTERVAL_S), name="event_loop_monitor"
+        )
+
+
+async def stop_loop_monitor() -> None:
+    global _loop_task
+    if _loop_task is not None:
+        _loop_task.cancel()
+        try:
+            await _loop_task
+        except asyncio.CancelledError:
+            pass
+        _loop_task = None
+
+
+def _threadpool_families() -> Iterable[Family]:
+    # Sync endpoints and dependencies run on anyio's default limiter (40 threads).
+    try:
+        from anyio.to_thread import current_default_thread_limiter
+
+        limiter = current_default_thread_limiter()
+    except Exception:
+        return
+    yield "threadpool_threads_busy", "gauge", "Threadpool tokens in use.", [({}, limiter.borrowed_tokens)]
+    yield "threadpool_threads_total", "gauge", "Threadpool size.", [({}, limiter.total_tokens)]
+    yield "threadpool_tasks_waiting", "gauge", "Callers waiting for a thread.", [
+        ({}, limiter.statistics().tasks_waiting)
+    ]
+
+
+REGISTRY.register_callback(_threadpool_families)
+
+
+# ---- service stats, read at scrape time ----
+def _service_families() -> Iterable[Family]:
+    from app.core.retry import CircuitBreaker, all_retry_policies
+    from app.services.audit_writer import get_audit_writer
+    from app.services.singleflight import polish_flights
+
+    policies = all_retry_policies()
+    for key, help_text in (
+        ("calls", "Upstream calls through the retry policy."),
+        ("retries", "Upstream retries."),
+        ("budget_exhausted", "Retries skipped because the retry budget was spent."),
+        ("deadline_exceeded", "Calls that ran out of deadline."),
+        ("circuit_rejected", "Calls rejected by an open circuit."),
+    ):
+        yield f"llm_{key}_total", "counter", help_text, [
+            ({"upstream": name}, policy.stats[key]) for name, policy in policies.items()
+        ]
+    yield "llm_circuit_open", "gauge", "1 while the upstream circuit breaker is open.", [
+        ({"upstream": name}, 1 if policy.breaker.state == CircuitBreaker.OPEN else 0)
+        for name, policy in policies.items()
+    ]
+
+    writer = get_audit_writer()
+    yield "audit_writer_queue_depth", "gauge", "ai_requests events waiting to be written.", [({}, writer.depth())]
+    yield "audit_writer_events_total", "counter", "ai_requests events by outcome.", [
+        ({"result": "flushed"}, writer.stats["flushed"]),
+        ({"result": "dropped"}, writer.stats["dropped"]),
+    ]
+    yield "audit_writer_flush_retries_total", "counter", "ai_requests flushes retried after a write error.", [
+        ({}, writer.stats["retries"])
+    ]
+
+    yield "singleflight_calls_total", "counter", "Polish upstream calls by single-flight role.", [
+        ({"role": "leader"}, polish_flights.stats["leaders"]),
+        ({"role": "collapsed"}, polish_flights.stats["collapsed"]),
+    ]
+
+    if settings.SCHED_ENABLED:
+        from app.services.scheduler import get_scheduler
+
+        snap = get_scheduler().snapshot()
+        yield "scheduler_running", "gauge", "Upstream calls holding a scheduler slot.", [({}, snap["running"])]
+        yield "scheduler_queue_depth", "gauge", "Callers waiting for a scheduler slot.", [
+            ({"tier": tier}, t["depth"]) for tier, t in snap["tiers"].items()
+        ]
+        yield "scheduler_rejected_total", "counter", "Callers rejected after the max queue wait.", [
+            ({"tier": tier}, t["rejected"]) for tier, t in snap["tiers"].items()
+        ]
+
+    if settings.POLISH_CACHE_ENABLED:
+        from app.services.polish_cache import get_polish_cache
+
+        stats = get_polish_cache().stats
+        yield "polish_cache_lookups_total", "counter", "Exact-match cache lookups by result.", [
+            ({"result": "memory_hit"}, stats["memory_hits"]),
+            ({"result": "disk_hit"}, stats["disk_hits"]),
+            ({"result": "miss"}, stats["misses"]),
+        ]
+    if settings.NEAR_DUP_ENABLED:
+        from app.services.near_dup import get_near_dup_cache
+
+        stats = get_near_dup_cache().stats
+        yield "near_dup_lookups_total", "counter", "Near-duplicate lookups by result.", [
+            ({"result": "hit"}, stats["hits"]),
+            ({"result": "miss"}, stats["misses"]),
+        ]
+    if settings.QUOTA_ENABLED:
+        from app.services.quota import get_quota_manager
+
+        stats = get_quota_manager().stats
+        yield "quota_checks_total", "counter", "Quota checks by result.", [
+            ({"result": "allowed"}, stats["allowed"]),
+            ({"result": "rejected"}, stats["rejected"]),
+        ]
+    if settings.PASSWORD_POOL_ENABLED:
+        from app.core.security import get_password_hasher
+
+        snap = get_password_hasher().snapshot()
+        yield "password_pool_running", "gauge", "Password hashes running in the process pool.", [({}, snap["running"])]
+        yield "password_pool_queue_depth", "gauge", "Password hashes waiting for a pool worker.", [({}, snap["queued"])]
+        yield "password_pool_ops_total", "counter", "Password pool operations by result.", [
+            ({"result": key}, snap[key]) for key in ("hashed", "verified", "rejected", "failed")
+        ]
+    if settings.LOGIN_THROTTLE_ENABLED:
+        from app.services.login_throttle import get_login_throttle
+
+        stats = get_login_throttle().stats
+        yield "login_throttled_total", "counter", "Logins refused before password verification.", [
+            ({"scope": "ip"}, stats["ip_throttled"]),
+            ({"scope": "account"}, stats["account_throttled"]),
+        ]
+    if settings.HEDGE_ENABLED:
+        from app.services.hedging import get_hedger
+
+        stats = get_hedger().stats
+        yield "hedge_calls_total", "counter", "Hedging decisions.", [
+            ({"event": key}, value) for key, value in stats.items()
+        ]
+
+
+REGISTRY.register_callback(_service_families)
+
+
+# ---- ASGI middleware ----
+class MetricsMiddleware:
+    """Pure ASGI (no BaseHTTPMiddleware), so streaming responses are not buffered."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # The route template, not the raw path, keeps label cardinality bounded.
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], path, status[0])
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
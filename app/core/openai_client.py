@@ -1,12 +1,35 @@
-from openai import OpenAI
-from app.core.settings import OPENAI_API_KEY
+import httpx
+from openai import AsyncOpenAI, OpenAI
+from app.core.config import settings
 
 _client = None
 
 def get_client() -> OpenAI:
     global _client
     if _client is None:
-        if not OPENAI_API_KEY:
+        if not settings.OPENAI_API_KEY:
             raise RuntimeError("OPENAI_API_KEY is not set in environment variables.")
-        _client = OpenAI(api_key=OPENAI_API_KEY)
+        _client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
     return _client
+
+def make_async_client() -> AsyncOpenAI:
+    """
+    Long-lived async client with its own keep-alive pool.
+    SDK retries are off: the polish path owns retry/backoff.
+    """
+    if not settings.OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY is not set in environment variables.")
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_S,
+        ),
+        timeout=httpx.Timeout(settings.LLM_TIMEOUT_S, connect=5.0),
+    )
+    return AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        http_client=http_client,
+        max_retries=0,
+    )
@@ -0,0 +1,119 @@
+"""
+Versioned system-prompt templates keyed by (action, lang).
+
+v2 keeps every byte that does not depend on the mode at the front of the prompt and
+puts the variable Language/Dialect line last, so the provider's prompt cache can reuse
+the longest possible prefix across requests. Rendered prompts are memoized.
+"""
+import hashlib
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Any, Dict
+
+from app.core.config import settings
+
+BASE_RULES = (
+    "IDENTITY RULE:\n"
+    "- If the user mentions company, you MUST reply with:\n"
+    "  Company: SAI Devion\n"
+    "  Parent company: SAI\n\n"
+    "ROLE RULE:\n"
+    "- You are an AI Software Engineer.\n"
+    "- The user may ask in normal question form.\n"
+    "- You must convert the user's question into the requested output type.\n\n"
+    "STRICT OUTPUT RULES:\n"
+    "- Output PLAIN TEXT ONLY.\n"
+    "- NEVER use markdown, backticks, or code fences.\n"
+    "- Do NOT include explanations, steps, or commentary (unless explicitly allowed below).\n"
+    "- If unclear/missing details, make reasonable defaults and still output something valid.\n"
+    "- If impossible to proceed, output a short plain-text error only.\n"
+)
+
+# section -> (header, variable line, fixed rules)
+_SECTIONS = {
+    "program": (
+        "PROGRAM MODE:\n",
+        "- Language: {lang}\n",
+        "- The user will ask a question; you MUST answer by generating ONLY executable code.\n"
+        "- Add exactly ONE single-line comment at the TOP summarizing what the script does.\n"
+        "- No additional text before/after code.\n",
+    ),
+    "mongodb": (
+        "QUERY MODE (MongoDB):\n",
+        "",
+        "- The user will ask a question; you MUST answer by outputting ONLY a valid MongoDB query or aggregation JSON.\n"
+        "- Do NOT output SQL.\n"
+        "- Assume collection name `collection` if missing.\n"
+        "- No commentary.\n",
+    ),
+    "sql": (
+        "QUERY MODE (SQL):\n",
+        "- Dialect: {lang}\n",
+        "- The user will ask a question; you MUST answer by outputting ONLY ONE final SQL query for this dialect.\n"
+        "- Do NOT include explanations.\n"
+        "- SQL comments using -- are allowed.\n",
+    ),
+}
+
+INVALID_MODE_PROMPT = "Invalid mode. Only Program or Query is supported."
+
+PROMPT_VERSIONS = ("v1", "v2")
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    version: str
+    section: str
+    text: str
+    prompt_hash: str
+    cache_key: str  # sent upstream as prompt_cache_key; shared by every prompt with this prefix
+
+
+def _section_for(action: str, lang: str) -> str | None:
+    if action == "Program":
+        return "program"
+    if action == "Query":
+        return "mongodb" if str(lang).lower() == "mongodb" else "sql"
+    return None
+
+
+def _render(version: str, section: str, lang: str) -> str:
+    header, var_line, rules = _SECTIONS[section]
+    var_line = var_line.format(lang=lang)
+    if version == "v1":
+        # Original layout: variable line right under the mode header.
+        return BASE_RULES + "\n" + header + var_line + rules
+    return BASE_RULES + "\n" + header + rules + var_line
+
+
+@lru_cache(maxsize=1024)
+def get_prompt(action: str, lang: str, version: str | None = None) -> PromptTemplate:
+    version = version or settings.PROMPT_VERSION
+    if version not in PROMPT_VERSIONS:
+        raise ValueError(f"Unknown prompt version: {version}")
+
+    section = _section_for(action, lang)
+    text = _render(version, section, lang) if section else INVALID_MODE_PROMPT
+    return PromptTemplate(
+        version=version,
+        section=section or "invalid",
+        text=text,
+        prompt_hash=hashlib.sha256(text.encode("utf-8")).hexdigest()[:16],
+        cache_key=f"sai-devion:{version}:{section or 'invalid'}",
+    )
+
+
+def prompt_for_mode(mode: Dict[str, Any]) -> PromptTemplate:
+    mode = mode or {}
+    return get_prompt(str(mode.get("action", "Program")), str(mode.get("lang", "Python")))
+
+
+def with_schema(prompt: PromptTemplate, schema_context: str | None) -> PromptTemplate:
+    """
+    Append a per-request schema section. It goes after the whole template, so the
+    cacheable prefix and cache_key stay the same; only text and prompt_hash change.
+    """
+    if not schema_context:
+        return prompt
+    text = prompt.text + "\n" + schema_context
+    return replace(prompt, text=text, prompt_hash=hashlib.sha256(text.encode("utf-8")).hexdigest()[:16])
@@ -0,0 +1,301 @@
+"""
+Retry engine for upstream LLM calls.
+
+- Deadline: retries never sleep past the time the caller is still waiting.
+- Classification by exception type / HTTP status, not message text.
+- Honors Retry-After (and retry-after-ms) from the upstream response.
+- RetryBudget caps retries per process to a fraction of recent requests.
+- CircuitBreaker fails fast after repeated upstream failures.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Tuple
+
+import httpx
+import openai
+
+from app.core.config import settings
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Upstream {name} is unavailable (circuit open).")
+        self.retry_after = retry_after
+
+
+class Deadline:
+    def __init__(self, timeout_s: float):
+        self.expires_at = time.monotonic() + timeout_s
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def check(self) -> float:
+        left = self.remaining()
+        if left <= 0:
+            raise DeadlineExceeded("Request deadline exceeded.")
+        return left
+
+
+def _status_of(e: BaseException) -> int | None:
+    status = getattr(e, "status_code", None)
+    if status is None:
+        response = getattr(e, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after_of(e: BaseException) -> float | None:
+    retry_after = getattr(e, "retry_after", None)
+    if isinstance(retry_after, (int, float)):
+        return float(retry_after)
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        # HTTP-date form: fall back to our own backoff
+        return None
+    return None
+
+
+def classify(e: BaseException) -> Tuple[bool, float | None]:
+    """Return (retryable, retry_after_s)."""
+    if isinstance(e, (CircuitOpenError, DeadlineExceeded)):
+        return False, None
+    if isinstance(e, (openai.APIConnectionError, httpx.TransportError, asyncio.TimeoutError)):
+        # APITimeoutError is a subclass of APIConnectionError
+        return True, None
+    status = _status_of(e)
+    if status is not None:
+        return status in RETRYABLE_STATUS, _retry_after_of(e)
+    return False, None
+
+
+class RetryBudget:
+    """Allow retries up to min_per_s * window + ratio * requests seen in the window."""
+
+    def __init__(self, ratio: float, min_per_s: float, window_s: float = 10.0):
+        self.ratio = ratio
+        self.min_per_s = min_per_s
+        self.window_s = window_s
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window_s
+        while self._requests and self._requests[0] < cutoff:
+            self._requests.popleft()
+        while self._retries and self._retries[0] < cutoff:
+            self._retries.popleft()
+
+    def record_request(self) -> None:
+        self._requests.append(time.monotonic())
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        self._prune(now)
+        allowed = self.min_per_s * self.window_s + self.ratio * len(self._requests)
+        if len(self._retries) >= allowed:
+            return False
+        self._retries.append(now)
+        return True
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, cooldown_s: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_call(self) -> None:
+        if self.state == self.CLOSED:
+            return
+        waited = time.monotonic() - self._opened_at
+        if self.state == self.OPEN and waited >= self.cooldown_s:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True  # let exactly one request test the upstream
+            return
+        raise CircuitOpenError(self.name, max(self.cooldown_s - waited, 1.0))
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        # Non-upstream failure (e.g. 400) during a probe: let the next request probe instead.
+        self._probe_in_flight = False
+
+
+class RetryPolicy:
+    def __init__(self, breaker: CircuitBreaker, budget: RetryBudget, max_retries: int, base_delay_s: float, max_delay_s: float):
+        self.breaker = breaker
+        self.budget = budget
+        self.max_retries = max_retries
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self.stats: Dict[str, int] = {
+            "calls": 0,
+            "retries": 0,
+            "budget_exhausted": 0,
+            "deadline_exceeded": 0,
+            "circuit_rejected": 0,
+        }
+
+    def _delay(self, attempt: int, retry_after: float | None) -> float:
+        if retry_after is not None:
+            return retry_after
+        # Full jitter, capped
+        return random.uniform(0, min(self.max_delay_s, self.base_delay_s * (2**attempt)))
+
+    def _before_attempt(self, deadline: Deadline) -> float:
+        try:
+            left = deadline.check()
+        except DeadlineExceeded:
+            self.stats["deadline_exceeded"] += 1
+            raise
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.stats["circuit_rejected"] += 1
+            raise
+        return left
+
+    def _record_error(self, e: BaseException) -> Tuple[bool, float | None]:
+        retryable, retry_after = classify(e)
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_probe()
+        return retryable, retry_after
+
+    async def _wait_for_retry(self, attempt: int, retry_after: float | None, deadline: Deadline) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        delay = self._delay(attempt, retry_after)
+        if delay >= deadline.remaining():
+            # Nobody will be waiting for the answer by then.
+            self.stats["deadline_exceeded"] += 1
+            return False
+        if not self.budget.try_spend():
+            self.stats["budget_exhausted"] += 1
+            return False
+        self.stats["retries"] += 1
+        await asyncio.sleep(delay)
+        return True
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], deadline: Deadline) -> Any:
+        self.stats["calls"] += 1
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            left = self._before_attempt(deadline)
+            try:
+                result = await asyncio.wait_for(fn(), timeout=left)
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                retryable, retry_after = self._record_error(e)
+                if retryable and await self._wait_for_retry(attempt, retry_after, deadline):
+                    attempt += 1
+                    continue
+                if isinstance(e, asyncio.TimeoutError) and deadline.remaining() <= 0:
+                    raise DeadlineExceeded("Request deadline exceeded.") from e
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def stream(self, fn: Callable[[], AsyncIterator[Any]], deadline: Deadline) -> AsyncIterator[Any]:
+        """
+        Like call(), for async generators; retries only until the first item is yielded.
+        Each attempt must produce its first item within the deadline; once output has
+        started the stream runs to the end.
+        """
+        self.stats["calls"] += 1
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            self._before_attempt(deadline)
+            started_output = False
+            items = fn().__aiter__()
+            try:
+                while True:
+                    try:
+                        if started_output:
+                            item = await items.__anext__()
+                        else:
+                            item = await asyncio.wait_for(items.__anext__(), timeout=deadline.remaining())
+                    except StopAsyncIteration:
+                        break
+                    started_output = True
+                    yield item
+            except (asyncio.CancelledError, GeneratorExit):
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                retryable, retry_after = self._record_error(e)
+                if not started_output and retryable and await self._wait_for_retry(attempt, retry_after, deadline):
+                    attempt += 1
+                    continue
+                if isinstance(e, asyncio.TimeoutError) and deadline.remaining() <= 0:
+                    raise DeadlineExceeded("Request deadline exceeded.") from e
+                raise
+            finally:
+                aclose = getattr(items, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+            self.breaker.record_success()
+            return
+
+
+_budget: RetryBudget | None = None
+_policies: Dict[str, RetryPolicy] = {}
+
+
+def get_retry_policy(name: str) -> RetryPolicy:
+    """One policy (and breaker) per upstream, e.g. "openai:gpt-4.1-mini"; one shared budget."""
+    global _budget
+    if _budget is None:
+        _budget = RetryBudget(settings.RETRY_BUDGET_RATIO, settings.RETRY_BUDGET_MIN_PER_S)
+    policy = _policies.get(name)
+    if policy is None:
+        policy = _policies[name] = RetryPolicy(
+            CircuitBreaker(name, settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_COOLDOWN_S),
+            _budget,
+            max_retries=settings.RETRY_MAX_RETRIES,
+            base_delay_s=settings.RETRY_BASE_DELAY_S,
+            max_delay_s=settings.RETRY_MAX_DELAY_S,
+        )
+    return policy
+
+
+def all_retry_policies() -> Dict[str, RetryPolicy]:
+    return dict(_policies)
@@ -1,5 +1,16 @@
+import asyncio
 import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict
+
 from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.metrics import PASSWORD_HASH_SECONDS, PASSWORD_QUEUE_SECONDS
 
 # Use bcrypt_sha256 to avoid the 72-byte limit problem
 pwd_context = CryptContext(
@@ -15,3 +26,100 @@ def verify_password(pw: str, hashed: str) -> bool:
 
 def sha256(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ---- bounded process pool for bcrypt ----
+# bcrypt holds a core for ~100-300 ms per call. Running it on the request threadpool lets
+# a login storm take every thread (and the CPU the event loop needs); a process pool
+# sized to the cores keeps it off both, and the queue limit turns overload into a fast 503.
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+def _timed(fn: Callable, *args) -> tuple:
+    # Runs in the worker process: report the bcrypt time separately from the queue wait.
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: ProcessPoolExecutor | None = None
+        self._in_flight = 0
+        self.stats: Dict[str, int] = {"hashed": 0, "verified": 0, "rejected": 0, "failed": 0}
+
+    def start(self) -> None:
+        if self._executor is None:
+            # spawn, not fork: the server process already runs threads and an event loop.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            for _ in range(self.workers):
+                self._executor.submit(os.getpid)  # start the workers now, not on the first login
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def queued(self) -> int:
+        return max(0, self._in_flight - self.workers)
+
+    def running(self) -> int:
+        return min(self._in_flight, self.workers)
+
+    async def _run(self, op: str, fn: Callable, *args) -> Any:
+        if self._in_flight >= self.workers + self.max_queue:
+            self.stats["rejected"] += 1
+            raise PasswordPoolBusy("Too many logins in progress. Please retry.")
+        self.start()
+        self._in_flight += 1
+        submitted = time.perf_counter()
+        try:
+            result, busy_s = await asyncio.get_running_loop().run_in_executor(self._executor, _timed, fn, *args)
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+        if settings.METRICS_ENABLED:
+            PASSWORD_HASH_SECONDS.observe(busy_s, op)
+            PASSWORD_QUEUE_SECONDS.observe(max(0.0, time.perf_counter() - submitted - busy_s), op)
+        self.stats[op] += 1
+        return result
+
+    async def hash(self, pw: str) -> str:
+        return await self._run("hashed", hash_password, pw)
+
+    async def verify(self, pw: str, hashed: str) -> bool:
+        return await self._run("verified", verify_password, pw, hashed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "workers": self.workers, "running": self.running(), "queued": self.queued()}
+
+
+_hasher: PasswordHasher | None = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHasher(
+            settings.PASSWORD_POOL_WORKERS or os.cpu_count() or 1, settings.PASSWORD_POOL_MAX_QUEUE
+        )
+    return _hasher
+
+
+async def hash_password_async(pw: str) -> str:
+    if not settings.PASSWORD_POOL_ENABLED:
+        return await run_in_threadpool(hash_password, pw)
+    return await get_password_hasher().hash(pw)
+
+
+async def verify_password_async(pw: str, hashed: str) -> bool:
+    if not settings.PASSWORD_POOL_ENABLED:
+        return await run_in_threadpool(verify_password, pw, hashed)
+    return await get_password_hasher().verify(pw, hashed)
@@ -0,0 +1,64 @@
+"""
+Per-request timing breakdown for the Server-Timing response header.
+
+The active collector lives in a ContextVar, so layers deep in the call (scheduler,
+retry attempts) can record into it without threading it through every signature.
+Tasks started during the request (single-flight leader, hedge attempts) copy the
+context and therefore record into the same collector.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Tuple
+
+_current: ContextVar["ServerTiming | None"] = ContextVar("server_timing", default=None)
+
+
+class ServerTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.entries: List[Tuple[str, float, str | None]] = []  # (name, ms, description)
+        self.attempts = 0
+
+    def add(self, name: str, ms: float, desc: str | None = None) -> None:
+        self.entries.append((name, ms, desc))
+
+    @contextmanager
+    def measure(self, name: str, desc: str | None = None) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - started) * 1000, desc)
+
+    def next_attempt(self) -> str:
+        self.attempts += 1
+        return f"upstream_{self.attempts}"
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def header(self) -> str:
+        """Server-Timing value, e.g. 'db_insert;dur=0.3, upstream_1;dur=1480.2;desc="gpt-4.1-mini", total;dur=1483.0'."""
+        parts = []
+        for name, ms, desc in self.entries:
+            part = f"{name};dur={ms:.1f}"
+            if desc:
+                part += f';desc="{desc}"'
+            parts.append(part)
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(parts)
+
+    def compact(self) -> str:
+        """Short form stored on the ai_requests row, e.g. 'db_insert=0.3,queue=0.0,upstream_1=1480.2'."""
+        return ",".join(f"{name}={ms:.1f}" for name, ms, _ in self.entries)[:255]
+
+
+def start_timing() -> ServerTiming:
+    timing = ServerTiming()
+    _current.set(timing)
+    return timing
+
+
+def current_timing() -> ServerTiming | None:
+    return _current.get()
@@ -0,0 +1,135 @@
+"""
+Local token estimation for admission control.
+
+Uses tiktoken when it is installed, which is exact for the OpenAI models we call.
+Encodings are loaded once at startup, off the event loop (load_encodings): the first
+load may download BPE files, and a request must never wait on that or fail because
+of it. Until a model's encoding is loaded, or when loading fails (offline host),
+or without tiktoken, a heuristic follows how BPE tokenizers split text: letter runs cost about
+one token per five letters, digits go in groups of three, and every punctuation mark,
+non-ASCII character, newline and indentation run costs one token. An EWMA of
+actual / estimated prompt tokens per model, fed from upstream usage, corrects the
+remaining bias.
+"""
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable
+
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+_PIECES = re.compile(r"[A-Za-z]+|[0-9]{1,3}|\n|[ \t]{2,}|[^\sA-Za-z0-9]")
+_MESSAGE_OVERHEAD = 8  # role/format tokens around instructions + input
+
+
+_encodings: Dict[str, Any] = {}  # model -> tiktoken Encoding, filled by load_encodings()
+_load_failed = False
+
+
+def load_encodings(models: Iterable[str]) -> int:
+    """
+    Load the tiktoken encoding for each model; blocking, so call it in a thread.
+    The first failure (e.g. no network for the BPE download) is logged and ends
+    all further attempts. Returns the number of models with an encoding.
+    """
+    global _load_failed
+    try:
+        import tiktoken
+    except ImportError:
+        log.info("tiktoken not installed; using heuristic token estimates")
+        return 0
+    for model in models:
+        if _load_failed or model in _encodings:
+            continue
+        try:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _load_failed = True
+            log.warning("Could not load tiktoken encodings; using heuristic token estimates", exc_info=True)
+    return len(_encodings)
+
+
+def _encoding(model: str):
+    # Never loads: the request path only uses what load_encodings() has already loaded.
+    return _encodings.get(model)
+
+
+def heuristic_count(text: str) -> int:
+    count = 0
+    for piece in _PIECES.findall(text):
+        if piece[0].isalpha():
+            count += 1 + (len(piece) - 1) // 5
+        else:
+            count += 1
+    return count
+
+
+class TokenEstimator:
+    def __init__(self, use_tokenizer: bool = True):
+        self.use_tokenizer = use_tokenizer
+        self._ratio: Dict[str, float] = {}  # model -> EWMA of actual / estimated prompt tokens
+        self.stats: Dict[str, int] = {"estimates": 0, "calibrations": 0}
+
+    def exact(self, model: str) -> bool:
+        return self.use_tokenizer and _encoding(model) is not None
+
+    def count(self, text: str, model: str) -> int:
+        encoding = _encoding(model) if self.use_tokenizer else None
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        return heuristic_count(text)
+
+    @lru_cache(maxsize=64)
+    def _count_instructions(self, text: str, model: str, exact: bool) -> int:
+        # System prompts come from a handful of templates; count each once (again once the encoding loads).
+        return self.count(text, model)
+
+    def estimate_prompt(self, instructions: str, user_input: str, model: str) -> int:
+        self.stats["estimates"] += 1
+        raw = self._count_instructions(instructions, model, self.exact(model)) + self.count(user_input, model) + _MESSAGE_OVERHEAD
+        return int(math.ceil(raw * self._ratio.get(model, 1.0)))
+
+    def trim(self, text: str, max_tokens: int, model: str) -> str:
+        """Keep the beginning of text, at most max_tokens, cut on a line boundary when possible."""
+        encoding = _encoding(model) if self.use_tokenizer else None
+        if encoding is not None:
+            tokens = encoding.encode(text, disallowed_special=())
+            cut = encoding.decode(tokens[:max_tokens])
+        else:
+            cut = text
+            while cut and heuristic_count(cut) > max_tokens:
+                cut = cut[: int(len(cut) * 0.9)]
+        newline = cut.rfind("\n")
+        return cut[:newline] if newline > len(cut) // 2 else cut
+
+    def calibrate(self, model: str, estimated: int | None, actual: int | None) -> None:
+        if not estimated or not actual:
+            return
+        self.stats["calibrations"] += 1
+        # Compare against the uncorrected estimate so the ratio converges instead of compounding.
+        current = self._ratio.get(model, 1.0)
+        observed = min(2.0, max(0.5, actual / (estimated / current)))
+        self._ratio[model] = current + settings.TOKEN_CALIBRATION_ALPHA * (observed - current)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "ratios": {model: round(r, 3) for model, r in self._ratio.items()},
+            "exact": {model: self.exact(model) for model in self._ratio},
+        }
+
+
+_estimator: TokenEstimator | None = None
+
+
+def get_token_estimator() -> TokenEstimator:
+    global _estimator
+    if _estimator is None:
+        _estimator = TokenEstimator(use_tokenizer=settings.TOKEN_USE_TIKTOKEN)
+    return _estimator
@@ -1,3 +1,4 @@
+import uuid
 from datetime import datetime, timedelta, timezone
 from jose import jwt
 from app.core.config import settings
@@ -11,7 +12,10 @@ def make_access_token(email: str) -> str:
 
 def make_refresh_token(email: str) -> str:
     exp = _now() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    return jwt.encode({"sub": email, "type": "refresh", "exp": exp}, settings.JWT_SECRET, algorithm="HS256")
+    # jti: two logins in the same second must not produce the same token (unique per user in refresh_tokens)
+    return jwt.encode(
+        {"sub": email, "type": "refresh", "exp": exp, "jti": uuid.uuid4().hex}, settings.JWT_SECRET, algorithm="HS256"
+    )
 
 def make_verify_token(email: str) -> str:
     exp = _now() + timedelta(minutes=settings.VERIFY_TOKEN_EXPIRE_MINUTES)
@@ -2,3 +2,9 @@
 from app.models.user import User
 from app.models.refresh_token import RefreshToken
 from app.models.feedback import Feedback
+from app.models.ai_request import AiRequest
+from app.models.user_usage import UserUsage
+from app.models.schema_table import SchemaTable
+from app.models.usage_daily import UsageDaily
+from app.models.rollup_watermark import RollupWatermark
+from app.models.latency_sketch import LatencySketch
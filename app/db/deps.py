@@ -1,6 +1,9 @@
-from typing import Generator
+from typing import TYPE_CHECKING, AsyncGenerator, Generator
 from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, get_async_sessionmaker
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
 
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
@@ -8,3 +11,7 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+async def get_async_db() -> AsyncGenerator["AsyncSession", None]:
+    async with get_async_sessionmaker()() as db:
+        yield db
@@ -0,0 +1,125 @@
+"""
+Optional monthly RANGE partitioning of ai_requests on MySQL and Postgres.
+
+Both engines require every unique key to contain the partition column, so a
+partitioned table uses PRIMARY KEY (id, created_at) and a unique index on
+(request_uid, created_at) instead of request_uid alone. Lookups by request_uid
+still use that index, one probe per partition.
+"""
+import logging
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+
+from app.core.config import settings
+from app.models.ai_request import AiRequest
+
+log = logging.getLogger(__name__)
+
+SUPPORTED_DIALECTS = ("mysql", "postgresql")
+
+
+def _month_start(d: date, offset: int = 0) -> date:
+    m = d.month - 1 + offset
+    return date(d.year + m // 12, m % 12 + 1, 1)
+
+
+def _partition_name(start: date) -> str:
+    return f"p{start:%Y%m}"
+
+
+def _columns_ddl(engine: Engine) -> str:
+    table = AiRequest.__table__
+    return ",\n  ".join(str(CreateColumn(c).compile(dialect=engine.dialect)) for c in table.columns)
+
+
+def _months(today: date, months_ahead: int):
+    for i in range(months_ahead + 1):
+        yield _month_start(today, i), _month_start(today, i + 1)
+
+
+def create_partitioned_ai_requests(engine: Engine, months_ahead: int, today: date | None = None) -> bool:
+    """Create ai_requests as a partitioned table if it does not exist yet. Returns False if unsupported."""
+    dialect = engine.dialect.name
+    if dialect not in SUPPORTED_DIALECTS:
+        log.warning("ai_requests partitioning is not supported on %s; using a plain table", dialect)
+        return False
+
+    today = today or date.today()
+    cols = _columns_ddl(engine)
+    with engine.begin() as conn:
+        if dialect == "postgresql":
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS ai_requests (\n  {cols},\n  PRIMARY KEY (id, created_at)\n)"
+                " PARTITION BY RANGE (created_at)"
+            ))
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ux_ai_requests_uid_created ON ai_requests (request_uid, created_at)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_ai_requests_user_created ON ai_requests (user_id, created_at)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_ai_requests_status_created ON ai_requests (status, created_at)"
+            ))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ai_requests_created ON ai_requests (created_at)"))
+            # Safety net: rows land here only if ensure_partitions fell behind.
+            conn.execute(text("CREATE TABLE IF NOT EXISTS ai_requests_pdefault PARTITION OF ai_requests DEFAULT"))
+        else:
+            parts = ",\n  ".join(
+                f"PARTITION {_partition_name(start)} VALUES LESS THAN ('{end.isoformat()}')"
+                for start, end in _months(today, months_ahead)
+            )
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS ai_requests (\n  {cols},\n"
+                "  PRIMARY KEY (id, created_at),\n"
+                "  UNIQUE KEY ux_ai_requests_uid_created (request_uid, created_at),\n"
+                "  KEY ix_ai_requests_user_created (user_id, created_at),\n"
+                "  KEY ix_ai_requests_status_created (status, created_at),\n"
+                "  KEY ix_ai_requests_created (created_at)\n"
+                f") PARTITION BY RANGE COLUMNS(created_at) (\n  {parts},\n"
+                "  PARTITION pmax VALUES LESS THAN (MAXVALUE)\n)"
+            ))
+    ensure_partitions(engine, months_ahead, today)
+    return True
+
+
+def ensure_partitions(engine: Engine, months_ahead: int, today: date | None = None) -> None:
+    """Add monthly partitions from the current month up to months_ahead. Safe to run repeatedly."""
+    dialect = engine.dialect.name
+    today = today or date.today()
+    with engine.begin() as conn:
+        if dialect == "postgresql":
+            for start, end in _months(today, months_ahead):
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS ai_requests_{_partition_name(start)} PARTITION OF ai_requests"
+                    f" FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                ))
+        elif dialect == "mysql":
+            existing = {
+                row[0]
+                for row in conn.execute(text(
+                    "SELECT PARTITION_NAME FROM information_schema.PARTITIONS"
+                    " WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'ai_requests'"
+                    " AND PARTITION_NAME IS NOT NULL"
+                ))
+            }
+            if "pmax" not in existing:
+                return
+            for start, end in _months(today, months_ahead):
+                name = _partition_name(start)
+                if name in existing:
+                    continue
+                conn.execute(text(
+                    f"ALTER TABLE ai_requests REORGANIZE PARTITION pmax INTO ("
+                    f"PARTITION {name} VALUES LESS THAN ('{end.isoformat()}'),"
+                    " PARTITION pmax VALUES LESS THAN (MAXVALUE))"
+                ))
+
+
+def setup_ai_requests_partitioning(engine: Engine) -> None:
+    if not settings.AI_REQUESTS_PARTITIONED:
+        return
+    create_partitioned_ai_requests(engine, settings.AI_REQUESTS_PARTITION_MONTHS_AHEAD)
@@ -0,0 +1,175 @@
+"""
+Additive schema upgrades for databases created before a column existed.
+
+create_all only creates missing tables, so a column added to an existing model
+never reaches a deployed database on its own. At startup every column listed in
+ADDED_COLUMNS that the live table lacks is added, with DDL compiled from the
+model, i.e. exactly what create_all emits on a fresh database. Nothing is dropped
+or rewritten.
+
+The same upgrade by hand (MySQL / Postgres):
+  ALTER TABLE ai_requests ADD COLUMN cache_hit SMALLINT NOT NULL DEFAULT 0;
+  ALTER TABLE ai_requests ADD COLUMN prompt_version VARCHAR(20) NULL;
+  ALTER TABLE ai_requests ADD COLUMN route VARCHAR(120) NULL;
+  ALTER TABLE ai_requests ADD COLUMN hedge VARCHAR(120) NULL;
+  ALTER TABLE ai_requests ADD COLUMN server_timing VARCHAR(255) NULL;
+  ALTER TABLE ai_requests ADD COLUMN est_prompt_tokens INT NULL;
+
+ai_requests itself predates its model (it was created by raw SQL), so its indexes
+are created here too. If request_uid has duplicates the unique index cannot be
+built; a plain index on request_uid is created instead, which still serves the
+audit UPDATE, and a warning names the problem. Audit rows are never deleted. By hand:
+  CREATE UNIQUE INDEX ux_ai_requests_request_uid ON ai_requests (request_uid);
+  CREATE INDEX ix_ai_requests_user_created ON ai_requests (user_id, created_at);
+  CREATE INDEX ix_ai_requests_status_created ON ai_requests (status, created_at);
+  CREATE INDEX ix_ai_requests_created ON ai_requests (created_at);
+
+refresh_tokens also gets its expiry and a unique (user_id, token_hash) index, which
+needs duplicates gone first. Until the unique index exists, startup backfills
+expires_at as created_at + REFRESH_TOKEN_EXPIRE_DAYS, keeps one row per
+(user_id, token_hash) (revoked if any copy was), then creates both indexes. By hand
+(Postgres; on MySQL use DATETIME and DATE_ADD(created_at, INTERVAL 30 DAY)):
+  ALTER TABLE refresh_tokens ADD COLUMN expires_at TIMESTAMP WITH TIME ZONE NULL;
+  UPDATE refresh_tokens SET expires_at = created_at + INTERVAL '30 days' WHERE expires_at IS NULL;
+  UPDATE refresh_tokens SET revoked = TRUE WHERE (user_id, token_hash) IN
+    (SELECT user_id, token_hash FROM refresh_tokens WHERE revoked GROUP BY user_id, token_hash);
+  DELETE FROM refresh_tokens WHERE id NOT IN
+    (SELECT id FROM (SELECT MIN(id) AS id FROM refresh_tokens GROUP BY user_id, token_hash) AS keep);
+  CREATE UNIQUE INDEX ux_refresh_tokens_user_hash ON refresh_tokens (user_id, token_hash);
+  CREATE INDEX ix_refresh_tokens_expires ON refresh_tokens (expires_at);
+"""
+import logging
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy import delete, func, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn
+
+from app.core.config import settings
+from app.db.base import Base
+
+log = logging.getLogger(__name__)
+
+# (table, column), in the order the columns were introduced.
+ADDED_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("ai_requests", "cache_hit"),
+    ("ai_requests", "prompt_version"),
+    ("ai_requests", "route"),
+    ("ai_requests", "hedge"),
+    ("ai_requests", "server_timing"),
+    ("ai_requests", "est_prompt_tokens"),
+    ("refresh_tokens", "expires_at"),
+)
+
+# created_at + :days, per dialect; elsewhere the purge treats NULL as created_at-based.
+_PLUS_DAYS = {
+    "postgresql": "created_at + make_interval(days => :days)",
+    "mysql": "DATE_ADD(created_at, INTERVAL :days DAY)",
+    "sqlite": "datetime(created_at, '+' || :days || ' days')",
+}
+
+
+def add_missing_columns(engine: Engine) -> List[str]:
+    """ALTER TABLE ... ADD COLUMN for each listed column the live table lacks. Returns "table.column" names."""
+    insp = inspect(engine)
+    live: Dict[str, Set[str] | None] = {}
+    added = []
+    with engine.begin() as conn:
+        for table_name, column_name in ADDED_COLUMNS:
+            if table_name not in live:
+                live[table_name] = (
+                    {c["name"] for c in insp.get_columns(table_name)} if insp.has_table(table_name) else None
+                )
+            columns = live[table_name]
+            if columns is None or column_name in columns:
+                continue
+            column = Base.metadata.tables[table_name].c[column_name]
+            ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {ddl}"))
+            columns.add(column_name)
+            added.append(f"{table_name}.{column_name}")
+            log.warning("Added missing column %s.%s", table_name, column_name)
+    return added
+
+
+def _has_duplicate_uids(conn: Connection) -> bool:
+    t = Base.metadata.tables["ai_requests"]
+    dup = conn.execute(
+        select(t.c.request_uid).group_by(t.c.request_uid).having(func.count() > 1).limit(1)
+    ).first()
+    return dup is not None
+
+
+def upgrade_ai_requests(engine: Engine) -> None:
+    """Create the model's ai_requests indexes that the live table lacks."""
+    if settings.AI_REQUESTS_PARTITIONED:
+        return  # the partitioned DDL (app/db/partitions.py) creates its own indexes
+    insp = inspect(engine)
+    if not insp.has_table("ai_requests"):
+        return
+    existing = {ix["name"] for ix in insp.get_indexes("ai_requests")}
+    t = Base.metadata.tables["ai_requests"]
+    with engine.begin() as conn:
+        for ix in t.indexes:
+            if ix.name in existing:
+                continue
+            if ix.unique and _has_duplicate_uids(conn):
+                log.warning(
+                    "ai_requests.request_uid has duplicates; not creating %s. Remove them and restart to add it.",
+                    ix.name,
+                )
+                if "ix_ai_requests_request_uid" not in existing:
+                    conn.execute(text("CREATE INDEX ix_ai_requests_request_uid ON ai_requests (request_uid)"))
+                    log.warning("Created index ix_ai_requests_request_uid")
+                continue
+            ix.create(conn)
+            log.warning("Created index %s", ix.name)
+
+
+def _dedupe_refresh_tokens(conn: Connection) -> int:
+    """Keep the lowest id per (user_id, token_hash), revoked if any copy was. Returns rows deleted."""
+    t = Base.metadata.tables["refresh_tokens"]
+    groups = conn.execute(
+        select(t.c.user_id, t.c.token_hash).group_by(t.c.user_id, t.c.token_hash).having(func.count() > 1)
+    ).all()
+    deleted = 0
+    for user_id, token_hash in groups:
+        same = (t.c.user_id == user_id, t.c.token_hash == token_hash)
+        rows = conn.execute(select(t.c.id, t.c.revoked).where(*same).order_by(t.c.id)).all()
+        keep = rows[0].id
+        if any(r.revoked for r in rows):
+            conn.execute(update(t).where(t.c.id == keep).values(revoked=True))
+        deleted += conn.execute(delete(t).where(*same, t.c.id != keep)).rowcount
+    return deleted
+
+
+def upgrade_refresh_tokens(engine: Engine) -> None:
+    """Backfill expires_at, drop duplicate tokens and create the indexes, unless already done."""
+    insp = inspect(engine)
+    if not insp.has_table("refresh_tokens"):
+        return
+    existing = {ix["name"] for ix in insp.get_indexes("refresh_tokens")}
+    t = Base.metadata.tables["refresh_tokens"]
+    if all(ix.name in existing for ix in t.indexes):
+        return
+    with engine.begin() as conn:
+        if "ux_refresh_tokens_user_hash" not in existing:
+            plus_days = _PLUS_DAYS.get(engine.dialect.name)
+            if plus_days is not None:
+                conn.execute(
+                    text(f"UPDATE refresh_tokens SET expires_at = {plus_days} WHERE expires_at IS NULL"),
+                    {"days": settings.REFRESH_TOKEN_EXPIRE_DAYS},
+                )
+            deleted = _dedupe_refresh_tokens(conn)
+            if deleted:
+                log.warning("Deleted %d duplicate refresh_tokens rows", deleted)
+        for ix in t.indexes:
+            if ix.name not in existing:
+                ix.create(conn)
+                log.warning("Created index %s", ix.name)
+
+
+def upgrade_schema(engine: Engine) -> None:
+    add_missing_columns(engine)
+    upgrade_ai_requests(engine)
+    upgrade_refresh_tokens(engine)
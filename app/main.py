@@ -1,32 +1,108 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.db.session import engine
 from app.db.base import Base
 from app.api.v1.router import api_router
 from dotenv import load_dotenv
+from app.core.config import settings
+from app.core.llm_providers import reachable_models, warm_providers, close_providers
+from app.core.token_estimator import load_encodings
+from app.core.security import get_password_hasher
+from app.core.metrics import MetricsMiddleware, render_metrics, start_loop_monitor, stop_loop_monitor
+from app.db.session import get_async_sessionmaker
+from app.services.polish_cache import get_polish_cache, prewarm_from_db
+from app.services.near_dup import rebuild_from_db
+from app.services.audit_writer import get_audit_writer
+from app.services.quota import get_quota_manager
+from app.services.usage_rollup import get_usage_rollup
+from app.services.latency_sketches import get_latency_sketches
+from app.services.refresh_token_purge import get_refresh_token_purger
 from app.models.feedback import Feedback  # noqa: F401
 
 # Import models so SQLAlchemy registers them
 from app.models.user import User  # noqa: F401
 from app.models.refresh_token import RefreshToken  # noqa: F401
+from app.models.ai_request import AiRequest  # noqa: F401
+from app.models.user_usage import UserUsage  # noqa: F401
+from app.models.schema_table import SchemaTable  # noqa: F401
+from app.models.usage_daily import UsageDaily  # noqa: F401
+from app.models.rollup_watermark import RollupWatermark  # noqa: F401
+from app.models.latency_sketch import LatencySketch  # noqa: F401
+from app.db.partitions import setup_ai_requests_partitioning
+from app.db.upgrades import upgrade_schema
 from fastapi import FastAPI
-from app.api.v1.routes.polish import router as polish_router
+from app.api.v1.routes.polish import router as polish_router, build_system_prompt
 # import app.db.base_imports  # ✅ must happen before create_all
 from app.db.session import engine
 from app.db.base import Base
 import app.db.base_imports  # ✅ must happen before create_all
 
+# Partitioned ai_requests has its own DDL; create_all then skips the existing table.
+setup_ai_requests_partitioning(engine)
 Base.metadata.create_all(bind=engine)
+# create_all skips existing tables; add the columns they are missing.
+upgrade_schema(engine)
 
 load_dotenv()
 
 app = FastAPI()
 app.include_router(polish_router, prefix="/api/v1")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pooled upstream connection before the first user request.
+    await warm_providers()
+    if settings.TOKEN_USE_TIKTOKEN:
+        # May download BPE files: in a thread and not awaited, so neither startup nor a request
+        # waits on it; estimates use the heuristic until it finishes.
+        app.state.tiktoken_load = asyncio.create_task(asyncio.to_thread(load_encodings, reachable_models()))
+    if settings.METRICS_ENABLED:
+        start_loop_monitor()
+    get_audit_writer().start()
+    if settings.PASSWORD_POOL_ENABLED:
+        get_password_hasher().start()
+    if settings.QUOTA_ENABLED:
+        get_quota_manager().start()
+    if settings.USAGE_ROLLUP_ENABLED:
+        get_usage_rollup().start()
+    if settings.LATENCY_SKETCH_ENABLED:
+        get_latency_sketches().start()
+    get_refresh_token_purger().start()
+    if settings.POLISH_CACHE_ENABLED and settings.POLISH_CACHE_PREWARM_ROWS > 0:
+        async with get_async_sessionmaker()() as db:
+            loaded = await prewarm_from_db(db, build_system_prompt, settings.POLISH_CACHE_PREWARM_ROWS)
+        logging.info("Prewarmed polish cache with %d entries", loaded)
+    if settings.NEAR_DUP_ENABLED and settings.NEAR_DUP_REBUILD_ROWS > 0:
+        async with get_async_sessionmaker()() as db:
+            loaded = await rebuild_from_db(db, build_system_prompt, settings.NEAR_DUP_REBUILD_ROWS)
+        logging.info("Rebuilt near-duplicate index from %d rows", loaded)
+    yield
+    # Flush queued ai_requests rows before the engine goes away.
+    await get_audit_writer().stop()
+    if settings.QUOTA_ENABLED:
+        await get_quota_manager().stop()
+    if settings.USAGE_ROLLUP_ENABLED:
+        await get_usage_rollup().stop()
+    if settings.LATENCY_SKETCH_ENABLED:
+        await get_latency_sketches().stop()
+    await get_refresh_token_purger().stop()
+    await close_providers()
+    if settings.PASSWORD_POOL_ENABLED:
+        get_password_hasher().stop()
+    if settings.POLISH_CACHE_ENABLED:
+        get_polish_cache().close()
+    if settings.METRICS_ENABLED:
+        await stop_loop_monitor()
+
 def create_app() -> FastAPI:
     # app = FastAPI(title="SAI Devion Backend", version="1.0.0")
 
-    app = FastAPI(title="SAI Devion Backend", version="1.0.0", debug=True)  # <-- add debug=True
+    app = FastAPI(title="SAI Devion Backend", version="1.0.0", debug=True, lifespan=lifespan)  # <-- add debug=True
 
 
     app.add_middleware(
@@ -36,6 +112,8 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
 
     Base.metadata.create_all(bind=engine)
     app.include_router(api_router)
@@ -44,6 +122,13 @@ def create_app() -> FastAPI:
     def root():
         return {"status": "ok"}
 
+    if settings.METRICS_ENABLED:
+
+        @app.get("/metrics", include_in_schema=False)
+        async def metrics():
+            # async: the threadpool gauges must be read on the event loop.
+            return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
     return app
 
 app = create_app()
@@ -0,0 +1,42 @@
+from sqlalchemy import Column, BigInteger, Integer, SmallInteger, String, Text, DateTime, Index
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class AiRequest(Base):
+    __tablename__ = "ai_requests"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    request_uid = Column(String(36), nullable=False)
+
+    user_id = Column(BigInteger, nullable=True)
+    mode_action = Column(String(20), nullable=True)   # Program | Query
+    mode_lang = Column(String(40), nullable=True)     # language or SQL dialect
+    model = Column(String(60), nullable=True)
+    prompt_version = Column(String(20), nullable=True)
+    route = Column(String(120), nullable=True)        # routing decision, e.g. "short_query;skip=gpt-4.1-nano:latency"
+
+    input_text = Column(Text, nullable=False)
+    output_text = Column(Text, nullable=True)
+
+    status = Column(String(16), nullable=False, server_default="error")  # success | error
+    error_code = Column(String(100), nullable=True)
+    error_message = Column(Text, nullable=True)
+    openai_request_id = Column(String(100), nullable=True)
+
+    latency_ms = Column(Integer, nullable=True)
+    server_timing = Column(String(255), nullable=True)  # e.g. "db_insert=0.3,queue=0.0,upstream_1=1480.2"
+    est_prompt_tokens = Column(Integer, nullable=True)  # local estimate, compared with prompt_tokens
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    total_tokens = Column(Integer, nullable=True)
+    cache_hit = Column(SmallInteger, nullable=False, server_default="0")  # 0 miss, 1 exact, 2 near-duplicate
+    hedge = Column(String(120), nullable=True)  # attempt log when hedged, e.g. "primary:cancelled:2011ms,hedge:won:640ms"
+
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ux_ai_requests_request_uid", "request_uid", unique=True),
+        Index("ix_ai_requests_user_created", "user_id", "created_at"),
+        Index("ix_ai_requests_status_created", "status", "created_at"),
+        Index("ix_ai_requests_created", "created_at"),  # usage rollup windows
+    )
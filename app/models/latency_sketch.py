@@ -0,0 +1,22 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, LargeBinary, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class LatencySketch(Base):
+    """Hourly DDSketch of request latency_ms per model, action and lang, merged from every worker."""
+    __tablename__ = "latency_sketches"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    hour_start = Column(DateTime, nullable=False)   # UTC, truncated to the hour
+
+    model = Column(String(60), nullable=False, default="")
+    mode_action = Column(String(20), nullable=False, default="")
+    mode_lang = Column(String(40), nullable=False, default="")
+
+    count = Column(BigInteger, nullable=False, default=0)
+    sketch = Column(LargeBinary, nullable=False)     # DDSketch.to_bytes()
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("hour_start", "model", "mode_action", "mode_lang", name="ux_latency_sketches_key"),
+    )
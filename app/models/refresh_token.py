@@ -1,4 +1,5 @@
-from sqlalchemy import Integer, Boolean, DateTime, func, String
+from datetime import datetime
+from sqlalchemy import Integer, Boolean, DateTime, func, String, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.base import Base
 
@@ -6,9 +7,16 @@ class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(Integer, index=True)   # <-- no FK
+    user_id: Mapped[int] = mapped_column(Integer)   # <-- no FK
 
-    token_hash: Mapped[str] = mapped_column(String(64), index=True)  # SHA256
+    token_hash: Mapped[str] = mapped_column(String(64))  # SHA256
     revoked: Mapped[bool] = mapped_column(Boolean, default=False)
 
     created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)  # NULL on rows from before expiry tracking
+
+    __table_args__ = (
+        # Every lookup is by (user_id, token_hash); user_id alone is served by the prefix.
+        Index("ux_refresh_tokens_user_hash", "user_id", "token_hash", unique=True),
+        Index("ix_refresh_tokens_expires", "expires_at"),  # purge scans
+    )
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class RollupWatermark(Base):
+    """How far a rollup job has aggregated its source table: rows with created_at < value are done."""
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String(40), primary_key=True)
+    value = Column(DateTime, nullable=False)   # naive UTC
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class SchemaTable(Base):
+    """One table (or MongoDB collection) of a user's registered schema, parsed from DDL."""
+    __tablename__ = "schema_tables"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, nullable=False)
+    dialect = Column(String(20), nullable=False)      # one of the desktop QUERY dialects, e.g. "PostgreSQL"
+    table_name = Column(String(128), nullable=False)
+
+    columns = Column(Text, nullable=False)            # JSON: [[name, type, flags], ...]
+    summary = Column(Text, nullable=False)            # compact form used in prompts: users(id INT PK, ...)
+
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "dialect", "table_name", name="ux_schema_tables_user_dialect_table"),
+    )
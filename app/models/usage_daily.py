@@ -0,0 +1,26 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Date, UniqueConstraint
+from app.db.base import Base
+
+class UsageDaily(Base):
+    """Per-day ai_requests totals by user, action, lang and model, maintained by the usage rollup job."""
+    __tablename__ = "usage_daily"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, nullable=False)
+    day = Column(Date, nullable=False)               # UTC day of ai_requests.created_at
+
+    mode_action = Column(String(20), nullable=False, default="")   # "" when the request had none
+    mode_lang = Column(String(40), nullable=False, default="")
+    model = Column(String(60), nullable=False, default="")
+
+    requests = Column(Integer, nullable=False, default=0)
+    errors = Column(Integer, nullable=False, default=0)
+    cache_hits = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(BigInteger, nullable=False, default=0)
+    completion_tokens = Column(BigInteger, nullable=False, default=0)
+    total_tokens = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        # Leading (user_id, day) also serves GET /usage range scans.
+        UniqueConstraint("user_id", "day", "mode_action", "mode_lang", "model", name="ux_usage_daily_key"),
+    )
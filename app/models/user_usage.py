@@ -0,0 +1,17 @@
+from sqlalchemy import Column, BigInteger, Integer, DateTime, UniqueConstraint
+from app.db.base import Base
+
+class UserUsage(Base):
+    """Hourly request/token totals per user, flushed from the in-memory quota counters."""
+    __tablename__ = "user_usage"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, nullable=False)
+    hour_start = Column(DateTime, nullable=False)   # UTC, truncated to the hour
+
+    requests = Column(Integer, nullable=False, default=0)
+    tokens = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "hour_start", name="ux_user_usage_user_hour"),
+    )
@@ -0,0 +1,14 @@
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class SchemaRegisterRequest(BaseModel):
+    dialect: str = Field(min_length=1, max_length=20)
+    ddl: str = Field(min_length=1)  # CREATE TABLE statements; MongoDB: JSON of collection -> fields
+    replace: bool = False  # drop the dialect's other tables first
+
+
+class SchemaTablesResponse(BaseModel):
+    dialect: str
+    tables: List[str]
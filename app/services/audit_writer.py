@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import bindparam, insert, update
+
+from app.core.config import settings
+from app.core.metrics import AUDIT_LAG_SECONDS
+from app.db.session import get_async_sessionmaker
+from app.models.ai_request import AiRequest
+
+log = logging.getLogger(__name__)
+
+ROW_COLUMNS = (
+    "request_uid", "user_id", "mode_action", "mode_lang", "input_text", "output_text", "status",
+    "error_code", "error_message", "openai_request_id", "model", "latency_ms",
+    "est_prompt_tokens", "prompt_tokens", "completion_tokens", "total_tokens", "cache_hit", "prompt_version",
+    "route", "hedge", "server_timing", "created_at",
+)
+FINISH_COLUMNS = (
+    "output_text", "status", "error_code", "error_message", "openai_request_id",
+    "latency_ms", "prompt_tokens", "completion_tokens", "total_tokens", "hedge", "server_timing",
+)
+
+_table = AiRequest.__table__
+# executemany: a list of param dicts becomes a multi-row INSERT / batched UPDATE
+_INSERT_STMT = insert(_table)
+_UPDATE_STMT = update(_table).where(_table.c.request_uid == bindparam("uid"))
+
+_STOP = object()
+
+
+def utcnow() -> datetime:
+    # Naive UTC: accepted by DATETIME columns on every backend we run.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class AuditWriter:
+    """
+    Write-behind logger for ai_requests.
+
+    Handlers enqueue "start" rows and "finish" updates; a background task drains the
+    queue and writes each batch as one multi-row INSERT plus one executemany UPDATE.
+    A start and finish for the same request in one batch collapse into a single INSERT.
+
+    A batch that fails to write is retried with exponential backoff, up to
+    max_retries times. Events are dropped (and counted) only when the retries run
+    out or the queue behind the batch fills up, whichever comes first; until then
+    producers keep enqueueing as usual.
+    """
+
+    def __init__(
+        self,
+        max_queue: int,
+        batch_size: int,
+        flush_interval_s: float,
+        max_retries: int = 5,
+        retry_backoff_s: float = 0.2,
+        retry_backoff_max_s: float = 5.0,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_retries = max_retries
+        self.retry_backoff_s = retry_backoff_s
+        self.retry_backoff_max_s = retry_backoff_max_s
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: asyncio.Task | None = None
+        self.stats: Dict[str, Any] = {
+            "enqueued": 0,
+            "flushed": 0,
+            "batches": 0,
+            "retries": 0,
+            "dropped": 0,
+            "last_lag_ms": 0,
+        }
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="ai_requests_audit_writer")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def _put(self, event: tuple) -> None:
+        self.start()
+        # Blocks the caller when the queue is full: backpressure instead of unbounded memory.
+        await self._queue.put(event)
+        self.stats["enqueued"] += 1
+
+    async def record_start(self, row: Dict[str, Any]) -> None:
+        full = {c: row.get(c) for c in ROW_COLUMNS}
+        full["status"] = full["status"] or "error"  # placeholder until the finish event lands
+        full["cache_hit"] = full["cache_hit"] or 0
+        full["created_at"] = full["created_at"] or utcnow()
+        await self._put(("start", full, time.perf_counter()))
+
+    async def record_finish(self, request_uid: str, fields: Dict[str, Any]) -> None:
+        full = {c: fields.get(c) for c in FINISH_COLUMNS}
+        full["request_uid"] = request_uid
+        await self._put(("finish", full, time.perf_counter()))
+
+    async def record(self, row: Dict[str, Any]) -> None:
+        """Enqueue an already-finished row (cache hits, batch items)."""
+        await self.record_start(row)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = loop.time() + self.flush_interval_s
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    ev = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if ev is _STOP:
+                    stopping = True
+                    break
+                batch.append(ev)
+            await self._flush(batch)
+
+        # Drain whatever is left on shutdown.
+        rest: List[tuple] = []
+        while not self._queue.empty():
+            ev = self._queue.get_nowait()
+            if ev is not _STOP:
+                rest.append(ev)
+        for i in range(0, len(rest), self.batch_size):
+            await self._flush(rest[i:i + self.batch_size])
+
+    async def _flush(self, batch: List[tuple]) -> None:
+        inserts: Dict[str, Dict[str, Any]] = {}
+        updates: List[Dict[str, Any]] = []
+        for kind, data, _ in batch:
+            if kind == "start":
+                inserts[data["request_uid"]] = data
+            elif data["request_uid"] in inserts:
+                inserts[data["request_uid"]].update(data)
+            else:
+                updates.append(data)
+
+        attempt = 0
+        while True:
+            try:
+                await self._write(list(inserts.values()), updates)
+                break
+            except Exception:
+                if attempt >= self.max_retries or self._queue.full():
+                    self.stats["dropped"] += len(batch)
+                    log.exception(
+                        "ai_requests audit flush failed after %d attempts (%d events dropped)", attempt + 1, len(batch)
+                    )
+                    return
+                delay = min(self.retry_backoff_s * 2 ** attempt, self.retry_backoff_max_s)
+                attempt += 1
+                self.stats["retries"] += 1
+                log.warning("ai_requests audit flush failed, retry %d in %.1fs", attempt, delay, exc_info=True)
+                await asyncio.sleep(delay)
+
+        self.stats["flushed"] += len(batch)
+        self.stats["batches"] += 1
+        lag_s = time.perf_counter() - batch[0][2]
+        self.stats["last_lag_ms"] = int(lag_s * 1000)
+        AUDIT_LAG_SECONDS.observe(lag_s)
+
+    async def _write(self, inserts: List[Dict[str, Any]], updates: List[Dict[str, Any]]) -> None:
+        async with get_async_sessionmaker()() as db:
+            if inserts:
+                await db.execute(_INSERT_STMT, inserts)
+            if updates:
+                await db.execute(
+                    _UPDATE_STMT,
+                    [{**{c: u[c] for c in FINISH_COLUMNS}, "uid": u["request_uid"]} for u in updates],
+                )
+            await db.commit()
+
+
+_writer: AuditWriter | None = None
+
+
+def get_audit_writer() -> AuditWriter:
+    global _writer
+    if _writer is None:
+        _writer = AuditWriter(
+            max_queue=settings.AUDIT_QUEUE_MAX,
+            batch_size=settings.AUDIT_BATCH_SIZE,
+            flush_interval_s=settings.AUDIT_FLUSH_INTERVAL_MS / 1000,
+            max_retries=settings.AUDIT_FLUSH_MAX_RETRIES,
+            retry_backoff_s=settings.AUDIT_RETRY_BACKOFF_MS / 1000,
+        )
+    return _writer
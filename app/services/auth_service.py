@@ -1,20 +1,45 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
 from app.models.user import User
 from app.models.refresh_token import RefreshToken
-from app.core.security import hash_password, verify_password, sha256
+from app.core.security import PasswordPoolBusy, hash_password_async, verify_password_async, sha256
 from app.core.tokens import make_access_token, make_refresh_token, make_verify_token, decode_token
 from app.core.config import settings
 from app.services.email_service import send_verification_email
+from app.services.login_throttle import LoginThrottled, get_login_throttle
+from app.services.identity import invalidate_user
 
 def get_user_by_email(db: Session, email: str) -> User | None:
     return db.query(User).filter(User.email == email.lower()).first()
 
-def signup(db: Session, payload) -> dict:
+async def _hash(pw: str) -> str:
+    try:
+        return await hash_password_async(pw)
+    except PasswordPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+async def _verify(pw: str, hashed: str) -> bool:
+    try:
+        return await verify_password_async(pw, hashed)
+    except PasswordPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+# signup and login are async so bcrypt runs in the password pool without holding a
+# request thread; their DB work still runs on the threadpool with the sync session.
+async def signup(db: Session, payload) -> dict:
     email = payload.email.strip().lower()
-    if get_user_by_email(db, email):
+    if await run_in_threadpool(get_user_by_email, db, email):
         raise HTTPException(status_code=409, detail="Email already exists")
 
+    password_hash = await _hash(payload.password)
+    return await run_in_threadpool(_create_user, db, payload, email, password_hash)
+
+def _create_user(db: Session, payload, email: str, password_hash: str) -> dict:
     user = User(
         first_name=payload.first_name.strip(),
         middle_name=(payload.middle_name.strip() if payload.middle_name else None),
@@ -23,13 +48,15 @@ def signup(db: Session, payload) -> dict:
         email=email,
         occupation=payload.occupation.strip(),
         country=payload.country.strip(),
-        password_hash=hash_password(payload.password),
+        password_hash=password_hash,
         subscription=0,
         is_verified=False,
     )
     db.add(user)
     db.commit()
     db.refresh(user)
+    # A lookup before signup may have cached "no such user".
+    invalidate_user(email)
 
     verify_token = make_verify_token(email)
     verify_link = f"{settings.APP_BASE_URL}/api/v1/auth/verify-email?token={verify_token}"
@@ -52,36 +79,104 @@ def verify_email(db: Session, token: str) -> dict:
 
     user.is_verified = True
     db.commit()
+    invalidate_user(email)
     return {"message": "Email verified. You can now login."}
 
+class RefreshTokenCache:
+    """
+    token_hash -> (user_id, valid) for REFRESH_CACHE_TTL_S, so /auth/refresh rarely hits
+    the DB. Revocations are cached too. Another worker's revocation is seen once the
+    entry expires, which bounds the staleness to the TTL; the access tokens it can still
+    mint expire on their own. Sync routes call this from threadpool threads, hence the lock.
+    """
+
+    def __init__(self, ttl_s: float, max_entries: int):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # token_hash -> (user_id, valid, expires_at)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, token_hash: str) -> tuple | None:
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is None or entry[2] <= time.monotonic():
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            return entry[0], entry[1]
+
+    def put(self, token_hash: str, user_id: int, valid: bool) -> None:
+        with self._lock:
+            self._entries[token_hash] = (user_id, valid, time.monotonic() + self.ttl_s)
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+refresh_cache = RefreshTokenCache(settings.REFRESH_CACHE_TTL_S, settings.REFRESH_CACHE_MAX_ENTRIES)
+
+def _get_refresh(db: Session, user_id: int, token_hash: str) -> RefreshToken | None:
+    # Served by ux_refresh_tokens_user_hash.
+    return db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id,
+        RefreshToken.token_hash == token_hash
+    ).first()
+
 def _store_refresh_token(db: Session, user_id: int, refresh_token: str):
-    rec = RefreshToken(user_id=user_id, token_hash=sha256(refresh_token), revoked=False)
+    h = sha256(refresh_token)
+    expires_at = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    rec = RefreshToken(user_id=user_id, token_hash=h, revoked=False, expires_at=expires_at)
     db.add(rec)
     db.commit()
+    refresh_cache.put(h, user_id, True)
 
 def _is_refresh_valid(db: Session, user_id: int, refresh_token: str) -> bool:
     h = sha256(refresh_token)
-    rec = db.query(RefreshToken).filter(
-        RefreshToken.user_id == user_id,
-        RefreshToken.token_hash == h
-    ).first()
-    return bool(rec) and not rec.revoked
+    cached = refresh_cache.get(h)
+    if cached is not None and cached[0] == user_id:
+        return cached[1]
+    rec = _get_refresh(db, user_id, h)
+    # The JWT exp is checked by decode_token; expires_at only matters for rows the purge has not removed yet.
+    valid = bool(rec) and not rec.revoked
+    refresh_cache.put(h, user_id, valid)
+    return valid
 
 def _revoke_refresh(db: Session, user_id: int, refresh_token: str):
     h = sha256(refresh_token)
-    rec = db.query(RefreshToken).filter(
-        RefreshToken.user_id == user_id,
-        RefreshToken.token_hash == h
-    ).first()
-    if rec:
+    refresh_cache.put(h, user_id, False)
+    rec = _get_refresh(db, user_id, h)
+    if rec and not rec.revoked:
         rec.revoked = True
         db.commit()
 
-def login(db: Session, payload) -> dict:
-    user = get_user_by_email(db, payload.email.lower())
-    if not user or not verify_password(payload.password, user.password_hash):
+def _user_id_for(db: Session, refresh_token: str, email: str) -> int | None:
+    cached = refresh_cache.get(sha256(refresh_token))
+    if cached is not None:
+        return cached[0]
+    user = get_user_by_email(db, email)
+    return user.id if user else None
+
+async def login(db: Session, payload, client_ip: str = "unknown") -> dict:
+    email = payload.email.lower()
+    throttle = get_login_throttle() if settings.LOGIN_THROTTLE_ENABLED else None
+    if throttle:
+        try:
+            throttle.check(email, client_ip)
+        except LoginThrottled as e:
+            raise HTTPException(status_code=429, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+    user = await run_in_threadpool(get_user_by_email, db, email)
+    if not user or not await _verify(payload.password, user.password_hash):
+        if throttle:
+            throttle.failure(email)
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if throttle:
+        throttle.success(email)
+
+    return await run_in_threadpool(_login_response, db, user)
 
+def _login_response(db: Session, user: User) -> dict:
     # if not user.is_verified:
     #     raise HTTPException(status_code=403, detail="Email not verified. Please verify before login.")
 
@@ -112,14 +207,15 @@ def refresh_access(db: Session, refresh_token: str) -> dict:
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid/expired refresh token")
 
-    user = get_user_by_email(db, email)
-    if not user:
+    # A cached token answers without touching users or refresh_tokens.
+    user_id = _user_id_for(db, refresh_token, email)
+    if user_id is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if not _is_refresh_valid(db, user.id, refresh_token):
+    if not _is_refresh_valid(db, user_id, refresh_token):
         raise HTTPException(status_code=401, detail="Refresh token revoked or not recognized")
 
-    access = make_access_token(user.email)
+    access = make_access_token(email)
     return {"access_token": access, "token_type": "bearer"}
 
 def logout(db: Session, refresh_token: str) -> dict:
@@ -129,9 +225,9 @@ def logout(db: Session, refresh_token: str) -> dict:
     except Exception:
         return {"message": "Logged out"}
 
-    user = get_user_by_email(db, email)
-    if not user:
+    user_id = _user_id_for(db, refresh_token, email)
+    if user_id is None:
         return {"message": "Logged out"}
 
-    _revoke_refresh(db, user.id, refresh_token)
+    _revoke_refresh(db, user_id, refresh_token)
     return {"message": "Logged out"}
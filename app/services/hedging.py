@@ -0,0 +1,139 @@
+"""
+Hedged upstream calls.
+
+If the first attempt has not answered after the tracked latency percentile for its
+(model, action, lang), a second attempt is started. The first successful answer wins
+and the other attempt is cancelled. Hedges spend from their own RetryBudget, so they
+stay a small fraction of upstream traffic even when the upstream is slow for everyone.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Tuple
+
+from app.core.config import settings
+from app.core.retry import RetryBudget
+
+
+class LatencyTracker:
+    """Recent successful latencies; the percentile is recomputed every few samples."""
+
+    def __init__(self, size: int):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._cached: Dict[float, float] = {}
+        self._since_sort = 0
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, latency_s: float) -> None:
+        self._samples.append(latency_s)
+        self._since_sort += 1
+        if self._since_sort >= 16:
+            self._cached.clear()
+
+    def percentile(self, p: float) -> float:
+        value = self._cached.get(p)
+        if value is None:
+            ordered = sorted(self._samples)
+            value = self._cached[p] = ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+            self._since_sort = 0
+        return value
+
+
+class Hedger:
+    def __init__(self):
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self.budget = RetryBudget(settings.HEDGE_BUDGET_RATIO, settings.HEDGE_BUDGET_MIN_PER_S)
+        self.stats: Dict[str, int] = {"calls": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0}
+
+    def _tracker(self, key: str) -> LatencyTracker:
+        tracker = self._trackers.get(key)
+        if tracker is None:
+            tracker = self._trackers[key] = LatencyTracker(settings.HEDGE_WINDOW)
+        return tracker
+
+    def delay_s(self, key: str) -> float | None:
+        """Seconds to wait before hedging, or None while there is too little history."""
+        tracker = self._tracker(key)
+        if len(tracker) < settings.HEDGE_MIN_SAMPLES:
+            return None
+        return max(tracker.percentile(settings.HEDGE_PERCENTILE), settings.HEDGE_MIN_DELAY_MS / 1000)
+
+    async def call(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, str | None]:
+        """
+        Return (result, attempt_log). attempt_log is None when no hedge was started, else
+        e.g. "primary:cancelled:2011ms,hedge:won:640ms".
+        """
+        self.stats["calls"] += 1
+        self.budget.record_request()
+        tracker = self._tracker(key)
+        delay = self.delay_s(key)
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(fn())
+        attempts: Dict[asyncio.Future, Tuple[str, float]] = {primary: ("primary", started)}
+        ended: Dict[asyncio.Future, Tuple[str, float]] = {}
+        winner = None
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done and not self.budget.try_spend():
+                    self.stats["budget_denied"] += 1
+                    delay = None
+            if delay is None or primary.done():
+                result = await primary
+                tracker.observe(time.perf_counter() - started)
+                return result, None
+
+            self.stats["hedged"] += 1
+            hedge = asyncio.ensure_future(fn())
+            attempts[hedge] = ("hedge", time.perf_counter())
+            pending = set(attempts)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                now = time.perf_counter()
+                for task in done:
+                    if task.exception() is not None:
+                        ended[task] = ("error", now)
+                    elif winner is None:
+                        winner = task
+                        ended[task] = ("won", now)
+                    else:
+                        ended[task] = ("lost", now)
+        finally:
+            # Also runs when the caller is cancelled: no attempt outlives the request.
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+                    ended[task] = ("cancelled", time.perf_counter())
+
+        attempt_log = ",".join(
+            f"{name}:{ended[task][0]}:{int((ended[task][1] - t0) * 1000)}ms"
+            for task, (name, t0) in attempts.items()
+        )
+        if winner is None:
+            raise primary.exception()
+        if winner is hedge:
+            self.stats["hedge_wins"] += 1
+        tracker.observe(ended[winner][1] - attempts[winner][1])
+        return winner.result(), attempt_log
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "delays_ms": {
+                key: round(self.delay_s(key) * 1000)
+                for key in list(self._trackers)
+                if self.delay_s(key) is not None
+            },
+        }
+
+
+_hedger: Hedger | None = None
+
+
+def get_hedger() -> Hedger:
+    global _hedger
+    if _hedger is None:
+        _hedger = Hedger()
+    return _hedger
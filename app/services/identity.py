@@ -0,0 +1,141 @@
+"""
+Caches behind the get_current_user dependency.
+
+- decoded access tokens: bounded LRU keyed by the raw token, each entry dropped at
+  the token's own exp, so a token is verified with python-jose once per worker
+- user identity per email (id, subscription, is_verified): bounded LRU with a TTL,
+  read through the async session; signup and email verification invalidate the
+  email, and the TTL bounds how long a subscription change takes to show. Unknown
+  emails are cached for a few seconds only, since another worker may be signing
+  that user up right now.
+
+Both caches are per worker. Lookups happen on the event loop (async routes), but
+the sync auth routes invalidate from threadpool threads, so the user cache is locked.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.tokens import decode_token
+from app.db.session import get_async_sessionmaker
+from app.models.user import User
+
+
+class InvalidToken(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    id: int
+    email: str
+    subscription: int
+    is_verified: bool
+
+
+class TokenCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # token -> (email, exp)
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+    def email_for(self, token: str) -> str:
+        now = time.time()
+        entry = self._entries.get(token)
+        if entry is not None and entry[1] > now:
+            self._entries.move_to_end(token)
+            self.stats["hits"] += 1
+            return entry[0]
+        self._entries.pop(token, None)
+        self.stats["misses"] += 1
+
+        try:
+            data = decode_token(token)  # signature and exp
+        except Exception:
+            raise InvalidToken("Invalid or expired access token.")
+        email = data.get("sub")
+        if data.get("type") != "access" or not email:
+            raise InvalidToken("Not an access token.")
+
+        self._entries[token] = (email, float(data["exp"]))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return email
+
+
+class UserCache:
+    _MISSING = object()
+    NEGATIVE_TTL_S = 10.0
+
+    def __init__(self, ttl_s: float, max_entries: int):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[object, float]]" = OrderedDict()  # email -> (user | None, expires)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "loads": 0, "invalidations": 0}
+
+    def _get(self, email: str):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[1] <= time.monotonic():
+                return self._MISSING
+            self._entries.move_to_end(email)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def _put(self, email: str, user: CurrentUser | None) -> None:
+        ttl = self.ttl_s if user is not None else min(self.ttl_s, self.NEGATIVE_TTL_S)
+        with self._lock:
+            self._entries[email] = (user, time.monotonic() + ttl)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: str) -> None:
+        with self._lock:
+            self._entries.pop(email.lower(), None)
+            self.stats["invalidations"] += 1
+
+    async def get(self, email: str) -> CurrentUser | None:
+        """The user for email, or None if there is none."""
+        email = email.lower()
+        cached = self._get(email)
+        if cached is not self._MISSING:
+            return cached
+        self.stats["loads"] += 1
+        async with get_async_sessionmaker()() as db:
+            row = (
+                await db.execute(
+                    select(User.id, User.subscription, User.is_verified).where(User.email == email)
+                )
+            ).first()
+        user = CurrentUser(row.id, email, int(row.subscription or 0), bool(row.is_verified)) if row else None
+        self._put(email, user)
+        return user
+
+
+_tokens: TokenCache | None = None
+_users: UserCache | None = None
+
+
+def get_token_cache() -> TokenCache:
+    global _tokens
+    if _tokens is None:
+        _tokens = TokenCache(settings.AUTH_TOKEN_CACHE_MAX_ENTRIES)
+    return _tokens
+
+
+def get_user_cache() -> UserCache:
+    global _users
+    if _users is None:
+        _users = UserCache(settings.AUTH_USER_CACHE_TTL_S, settings.AUTH_USER_CACHE_MAX_ENTRIES)
+    return _users
+
+
+def invalidate_user(email: str) -> None:
+    get_user_cache().invalidate(email)
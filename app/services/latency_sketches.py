@@ -0,0 +1,191 @@
+"""
+Latency percentiles per (model, action, lang, hour) without scanning ai_requests.
+
+Every finished request adds its latency_ms to an in-memory DDSketch for its key and
+the current UTC hour. A background task periodically merges those into
+latency_sketches: the row is read with FOR UPDATE, merged and written back, so
+concurrent workers add up instead of overwriting each other. Queries load the
+hourly rows for a range and merge them; percentiles keep the sketch's relative
+accuracy (LATENCY_SKETCH_ALPHA) however many hours or workers are combined.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.ddsketch import DDSketch
+from app.db.session import get_async_sessionmaker
+from app.models.latency_sketch import LatencySketch
+from app.services.audit_writer import utcnow
+
+log = logging.getLogger(__name__)
+
+Key = Tuple[datetime, str, str, str]  # hour_start, model, action, lang
+
+_GROUP_COLUMNS = {"model": 1, "action": 2, "lang": 3}
+
+
+def _hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+class LatencySketches:
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self._pending: Dict[Key, DDSketch] = {}
+        self._task: asyncio.Task | None = None
+        self.stats: Dict[str, int] = {"recorded": 0, "flushes": 0, "rows_merged": 0}
+
+    def record(self, model: str | None, action: str | None, lang: str | None, latency_ms: int | None) -> None:
+        if latency_ms is None:
+            return
+        key = (_hour(utcnow()), (model or "")[:60], (action or "")[:20], (lang or "")[:40])
+        sketch = self._pending.get(key)
+        if sketch is None:
+            sketch = self._pending[key] = DDSketch(self.alpha)
+        sketch.add(latency_ms)
+        self.stats["recorded"] += 1
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.LATENCY_SKETCH_FLUSH_INTERVAL_S)
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("Latency sketch flush failed")
+
+    async def flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            async with get_async_sessionmaker()() as db:
+                # Sorted keys: workers lock rows in the same order and cannot deadlock.
+                for key in sorted(pending):
+                    await self._merge_row(db, key, pending[key])
+                await db.commit()
+        except Exception:
+            # Merge back so the samples are retried on the next flush.
+            for key, sketch in pending.items():
+                current = self._pending.get(key)
+                self._pending[key] = sketch if current is None else sketch.merge(current)
+            raise
+        self.stats["flushes"] += 1
+        self.stats["rows_merged"] += len(pending)
+
+    async def _merge_row(self, db, key: Key, sketch: DDSketch) -> None:
+        hour, model, action, lang = key
+        where = (
+            LatencySketch.hour_start == hour,
+            LatencySketch.model == model,
+            LatencySketch.mode_action == action,
+            LatencySketch.mode_lang == lang,
+        )
+        for _ in range(2):
+            stored = (
+                await db.execute(select(LatencySketch.id, LatencySketch.sketch).where(*where).with_for_update())
+            ).first()
+            if stored is not None:
+                merged = DDSketch.from_bytes(stored.sketch).merge(sketch)
+                await db.execute(
+                    update(LatencySketch)
+                    .where(LatencySketch.id == stored.id)
+                    .values(count=merged.count, sketch=merged.to_bytes())
+                )
+                return
+            try:
+                async with db.begin_nested():
+                    await db.execute(
+                        insert(LatencySketch).values(
+                            hour_start=hour,
+                            model=model,
+                            mode_action=action,
+                            mode_lang=lang,
+                            count=sketch.count,
+                            sketch=sketch.to_bytes(),
+                        )
+                    )
+                return
+            except IntegrityError:
+                # Another worker inserted the row first; merge into it.
+                continue
+        raise RuntimeError(f"Could not merge latency sketch for {key}")
+
+    async def query(
+        self,
+        start: datetime,
+        end: datetime,
+        quantiles: List[float],
+        group_by: List[str],
+        model: str | None = None,
+        action: str | None = None,
+        lang: str | None = None,
+    ) -> List[Dict[str, Any]]:
+        """Merged percentiles (ms) over hours in [start, end), one entry per group_by combination."""
+        stmt = select(
+            LatencySketch.hour_start,
+            LatencySketch.model,
+            LatencySketch.mode_action,
+            LatencySketch.mode_lang,
+            LatencySketch.sketch,
+        ).where(LatencySketch.hour_start >= _hour(start), LatencySketch.hour_start < end)
+        if model is not None:
+            stmt = stmt.where(LatencySketch.model == model)
+        if action is not None:
+            stmt = stmt.where(LatencySketch.mode_action == action)
+        if lang is not None:
+            stmt = stmt.where(LatencySketch.mode_lang == lang)
+        async with get_async_sessionmaker()() as db:
+            rows = (await db.execute(stmt)).all()
+
+        merged: Dict[Tuple, DDSketch] = {}
+        for row in rows:
+            group = tuple(row[_GROUP_COLUMNS[g]] for g in group_by)
+            sketch = DDSketch.from_bytes(row.sketch)
+            current = merged.get(group)
+            merged[group] = sketch if current is None else current.merge(sketch)
+
+        out = []
+        for group in sorted(merged):
+            sketch = merged[group]
+            out.append(
+                {
+                    **dict(zip(group_by, group)),
+                    "count": sketch.count,
+                    "mean_ms": round(sketch.sum / sketch.count, 1) if sketch.count else None,
+                    "max_ms": sketch.max if sketch.count else None,
+                    "percentiles_ms": {
+                        f"p{q * 100:g}": round(v, 1) if v is not None else None
+                        for q, v in sketch.quantiles(quantiles).items()
+                    },
+                }
+            )
+        return out
+
+
+_sketches: LatencySketches | None = None
+
+
+def get_latency_sketches() -> LatencySketches:
+    global _sketches
+    if _sketches is None:
+        _sketches = LatencySketches(settings.LATENCY_SKETCH_ALPHA)
+    return _sketches
@@ -0,0 +1,76 @@
+"""
+Login throttling, checked before the expensive password verification.
+
+- per client IP: at most LOGIN_IP_MAX_PER_MIN attempts per minute
+- per account: after LOGIN_ACCOUNT_MAX_FAILURES failures within
+  LOGIN_ACCOUNT_WINDOW_S, further attempts are refused until the oldest failure
+  leaves the window; a successful login clears the account's failures
+
+Counters live in memory per worker, like the quota request counters, so the
+effective limits are per worker. Refused attempts never reach bcrypt.
+"""
+import time
+from collections import OrderedDict
+from typing import Dict
+
+from app.core.config import settings
+from app.services.quota import SlidingWindowCounter
+
+
+class LoginThrottled(Exception):
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class LoginThrottle:
+    def __init__(self):
+        self._ips: "OrderedDict[str, SlidingWindowCounter]" = OrderedDict()
+        self._failures: "OrderedDict[str, SlidingWindowCounter]" = OrderedDict()
+        self.stats: Dict[str, int] = {"ip_throttled": 0, "account_throttled": 0}
+
+    @staticmethod
+    def _counter(
+        table: "OrderedDict[str, SlidingWindowCounter]", key: str, window_s: int, bucket_s: int
+    ) -> SlidingWindowCounter:
+        counter = table.get(key)
+        if counter is None:
+            counter = table[key] = SlidingWindowCounter(window_s, bucket_s)
+        table.move_to_end(key)
+        while len(table) > settings.LOGIN_THROTTLE_MAX_KEYS:
+            table.popitem(last=False)
+        return counter
+
+    def check(self, email: str, client_ip: str) -> None:
+        """Count one attempt from client_ip; raise LoginThrottled if the IP or the account is over its limit."""
+        now = time.time()
+        failures = self._failures.get(email)
+        if failures is not None and failures.total(now) >= settings.LOGIN_ACCOUNT_MAX_FAILURES:
+            self.stats["account_throttled"] += 1
+            raise LoginThrottled(
+                "Too many failed logins for this account. Try again later.", failures.retry_after(now)
+            )
+
+        attempts = self._counter(self._ips, client_ip, 60, 1)
+        if attempts.total(now) >= settings.LOGIN_IP_MAX_PER_MIN:
+            self.stats["ip_throttled"] += 1
+            raise LoginThrottled("Too many login attempts. Try again later.", attempts.retry_after(now))
+        attempts.add(1, now)
+
+    def failure(self, email: str) -> None:
+        window = settings.LOGIN_ACCOUNT_WINDOW_S
+        self._counter(self._failures, email, window, max(1, window // 30)).add(1)
+
+    def success(self, email: str) -> None:
+        self._failures.pop(email, None)
+
+
+_throttle: LoginThrottle | None = None
+
+
+def get_login_throttle() -> LoginThrottle:
+    global _throttle
+    if _throttle is None:
+        _throttle = LoginThrottle()
+    return _throttle
@@ -0,0 +1,167 @@
+"""
+Model routing for polish requests.
+
+A route (model chain + generation params) is picked from mode.action, mode.lang and
+the input length. The first model of the chain that is not degraded serves the
+request; a model is degraded while its circuit breaker is open or while its EWMA
+error rate or latency over recent calls is above the configured limits. A degraded
+model is offered traffic again after ROUTING_RECOVERY_S without new samples.
+The decision string is stored on the ai_requests row (route column).
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+from app.core.config import settings
+from app.core.retry import CircuitBreaker, all_retry_policies
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str
+    models: Tuple[str, ...]  # primary first, then fallbacks
+    action: str | None = None  # None matches any
+    langs: FrozenSet[str] | None = None  # lower-cased; None matches any
+    min_chars: int = 0
+    max_chars: int | None = None
+    temperature: float = 0.2
+
+    def matches(self, action: str, lang: str, n_chars: int) -> bool:
+        if self.action is not None and self.action != action:
+            return False
+        if self.langs is not None and lang.lower() not in self.langs:
+            return False
+        if n_chars < self.min_chars:
+            return False
+        return self.max_chars is None or n_chars <= self.max_chars
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    model: str
+    reason: str  # "<route>" or "<route>;skip=<model>:<why>,..."
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+def _chain(*models: str) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(m for m in models if m))
+
+
+def default_routes() -> List[Route]:
+    """Rules are checked in order; the last one matches everything."""
+    base = settings.OPENAI_MODEL
+    return [
+        Route(
+            "short_query",
+            _chain(settings.ROUTING_SMALL_MODEL, base, settings.ROUTING_FALLBACK_MODEL),
+            action="Query",
+            max_chars=settings.ROUTING_SMALL_MAX_CHARS,
+            temperature=0.0,
+        ),
+        Route("query", _chain(base, settings.ROUTING_FALLBACK_MODEL), action="Query", temperature=0.0),
+        Route(
+            "long_program",
+            _chain(settings.ROUTING_LARGE_MODEL, base),
+            action="Program",
+            min_chars=settings.ROUTING_LARGE_MIN_CHARS,
+        ),
+        Route("default", _chain(base, settings.ROUTING_FALLBACK_MODEL)),
+    ]
+
+
+class ModelHealth:
+    __slots__ = ("latency_ms", "error_rate", "samples", "updated_at")
+
+    def __init__(self):
+        self.latency_ms = 0.0
+        self.error_rate = 0.0
+        self.samples = 0
+        self.updated_at = 0.0
+
+    def observe(self, latency_ms: float, ok: bool, alpha: float) -> None:
+        if self.samples == 0:
+            self.latency_ms = latency_ms
+            self.error_rate = 0.0 if ok else 1.0
+        else:
+            if ok:
+                # Failed calls often end early or at a timeout; only successes shape latency.
+                self.latency_ms += alpha * (latency_ms - self.latency_ms)
+            self.error_rate += alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        self.samples += 1
+        self.updated_at = time.monotonic()
+
+
+class ModelRouter:
+    def __init__(self, routes: List[Route]):
+        self.routes = routes
+        self.health: Dict[str, ModelHealth] = {}
+        self.stats: Dict[str, int] = {"routed": 0, "fallbacks": 0}
+
+    def observe(self, model: str, latency_ms: float, ok: bool) -> None:
+        health = self.health.get(model)
+        if health is None:
+            health = self.health[model] = ModelHealth()
+        health.observe(latency_ms, ok, settings.ROUTING_EWMA_ALPHA)
+
+    def degraded(self, model: str) -> str | None:
+        policy = all_retry_policies().get(f"{settings.LLM_PROVIDER}:{model}")
+        if policy is not None and policy.breaker.state == CircuitBreaker.OPEN:
+            return "circuit_open"
+        health = self.health.get(model)
+        if health is None or health.samples < settings.ROUTING_MIN_SAMPLES:
+            return None
+        if time.monotonic() - health.updated_at > settings.ROUTING_RECOVERY_S:
+            return None
+        if health.error_rate > settings.ROUTING_MAX_ERROR_RATE:
+            return "error_rate"
+        if health.latency_ms > settings.ROUTING_MAX_LATENCY_MS:
+            return "latency"
+        return None
+
+    def route(self, action: str, lang: str, n_chars: int) -> RouteDecision:
+        rule = next(r for r in self.routes if r.matches(action, lang, n_chars))
+        skipped = []
+        model = rule.models[0]  # every model degraded: stay on the primary
+        for candidate in rule.models:
+            why = self.degraded(candidate)
+            if why is None:
+                model = candidate
+                break
+            skipped.append(f"{candidate}:{why}")
+
+        self.stats["routed"] += 1
+        reason = rule.name
+        if skipped:
+            self.stats["fallbacks"] += 1
+            reason = f"{rule.name};skip={','.join(skipped)}"
+        return RouteDecision(model, reason[:120], {"temperature": rule.temperature})
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "models": {
+                model: {
+                    "latency_ms": round(h.latency_ms, 1),
+                    "error_rate": round(h.error_rate, 3),
+                    "samples": h.samples,
+                    "degraded": self.degraded(model),
+                }
+                for model, h in self.health.items()
+            },
+        }
+
+
+_router: ModelRouter | None = None
+
+
+def get_model_router() -> ModelRouter:
+    global _router
+    if _router is None:
+        _router = ModelRouter(default_routes())
+    return _router
+
+
+def route_request(action: str, lang: str, n_chars: int) -> RouteDecision:
+    if not settings.ROUTING_ENABLED:
+        return RouteDecision(settings.OPENAI_MODEL, "static", {"temperature": 0.2})
+    return get_model_router().route(action, lang, n_chars)
@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import random
+import struct
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.services.polish_cache import normalize_text, prompt_hash
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+_OVERFLOW = ("*", "*")  # shared index once NEAR_DUP_MAX_INDEXES distinct (action, lang) pairs exist
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def shingles(raw_text: str, k: int) -> set[str]:
+    norm = normalize_text(raw_text).lower()
+    if len(norm) <= k:
+        return {norm}
+    return {norm[i:i + k] for i in range(len(norm) - k + 1)}
+
+
+def _shingle_hash(s: str) -> int:
+    # Stable across processes (unlike hash()), so signatures can be rebuilt anywhere.
+    return struct.unpack("<I", hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest())[0]
+
+
+class MinHasher:
+    def __init__(self, num_perm: int, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, items: set[str]) -> Tuple[int, ...]:
+        hs = [_shingle_hash(s) for s in items]
+        return tuple(min(((a * h + b) % _PRIME) & _MAX_HASH for h in hs) for a, b in self._perms)
+
+
+def estimate_similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+@dataclass
+class _Entry:
+    signature: Tuple[int, ...]
+    output_text: str
+    model: str
+    prompt_hash: str
+
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures, bounded with LRU eviction."""
+
+    def __init__(self, bands: int, rows: int, max_entries: int):
+        self.bands = bands
+        self.rows = rows
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._buckets: List[Dict[Tuple[int, ...], set[str]]] = [{} for _ in range(bands)]
+
+    def _band_keys(self, sig: Tuple[int, ...]):
+        for i in range(self.bands):
+            yield i, sig[i * self.rows:(i + 1) * self.rows]
+
+    def add(self, key: str, entry: _Entry) -> None:
+        if key in self._entries:
+            self.remove(key)
+        self._entries[key] = entry
+        for i, band in self._band_keys(entry.signature):
+            self._buckets[i].setdefault(band, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self.remove(next(iter(self._entries)))
+
+    def remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for i, band in self._band_keys(entry.signature):
+            bucket = self._buckets[i].get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[i][band]
+
+    def query(self, sig: Tuple[int, ...]) -> List[Tuple[str, _Entry]]:
+        keys: set[str] = set()
+        for i, band in self._band_keys(sig):
+            keys |= self._buckets[i].get(band, set())
+        found = []
+        for key in keys:
+            self._entries.move_to_end(key)
+            found.append((key, self._entries[key]))
+        return found
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class NearDupCache:
+    """
+    One LSH index per (action, lang); answers are only reused for the same model and prompt.
+
+    action and lang come from the client, so at most max_indexes pairs get their own
+    index and any further pair shares one overflow index. Entries there are still
+    matched on prompt hash, which includes the mode, so memory stays bounded at
+    (max_indexes + 1) * max_entries without mixing answers across modes.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        num_perm: int,
+        bands: int,
+        shingle_size: int,
+        max_entries: int,
+        max_indexes: int = 32,
+    ):
+        if bands * (num_perm // bands) != num_perm:
+            raise ValueError("NEAR_DUP_NUM_PERM must be divisible by NEAR_DUP_BANDS")
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.max_indexes = max_indexes
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self._indexes: Dict[Tuple[str, str], LSHIndex] = {}
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+    def _index(self, action: str, lang: str) -> LSHIndex:
+        key = (action, lang)
+        idx = self._indexes.get(key)
+        if idx is None:
+            if len(self._indexes) >= self.max_indexes:
+                key = _OVERFLOW
+                idx = self._indexes.get(key)
+            if idx is None:
+                idx = self._indexes[key] = LSHIndex(self.bands, self.rows, self.max_entries)
+        return idx
+
+    def signature(self, raw_text: str) -> Tuple[int, ...]:
+        return self.hasher.signature(shingles(raw_text, self.shingle_size))
+
+    async def _signature(self, raw_text: str) -> Tuple[int, ...]:
+        # Pure-Python MinHash is num_perm passes over every shingle; keep it off the event loop.
+        return await asyncio.to_thread(self.signature, raw_text)
+
+    async def lookup(self, raw_text: str, action: str, lang: str, model: str, system_prompt: str) -> str | None:
+        sig = await self._signature(raw_text)
+        p_hash = prompt_hash(system_prompt)
+        best_score, best_text = 0.0, None
+        for _, entry in self._index(action, lang).query(sig):
+            if entry.model != model or entry.prompt_hash != p_hash:
+                continue
+            score = estimate_similarity(sig, entry.signature)
+            if score > best_score:
+                best_score, best_text = score, entry.output_text
+        if best_text is not None and best_score >= self.threshold:
+            self.stats["hits"] += 1
+            return best_text
+        self.stats["misses"] += 1
+        return None
+
+    async def add(self, raw_text: str, action: str, lang: str, model: str, system_prompt: str, output_text: str) -> None:
+        entry = _Entry(await self._signature(raw_text), output_text, model, prompt_hash(system_prompt))
+        self._index(action, lang).add(normalize_text(raw_text).lower(), entry)
+
+    def clear(self) -> None:
+        self._indexes.clear()
+
+
+_near_dup: NearDupCache | None = None
+
+
+def get_near_dup_cache() -> NearDupCache:
+    global _near_dup
+    if _near_dup is None:
+        _near_dup = NearDupCache(
+            threshold=settings.NEAR_DUP_THRESHOLD,
+            num_perm=settings.NEAR_DUP_NUM_PERM,
+            bands=settings.NEAR_DUP_BANDS,
+            shingle_size=settings.NEAR_DUP_SHINGLE_SIZE,
+            max_entries=settings.NEAR_DUP_MAX_ENTRIES,
+            max_indexes=settings.NEAR_DUP_MAX_INDEXES,
+        )
+    return _near_dup
+
+
+async def rebuild_from_db(
+    db: "AsyncSession",
+    build_prompt: Callable[[Dict[str, Any]], str],
+    limit: int,
+) -> int:
+    """
+    Replace the in-memory indexes with the most recent successful ai_requests rows.
+
+    Entries are keyed with today's build_prompt, so only rows with the current
+    PROMPT_VERSION are used, and Query rows from signed-in users are skipped while
+    the schema registry is on (their prompt may have carried a schema section).
+    """
+    near_dup = get_near_dup_cache()
+    skip_schema = "AND NOT (mode_action = 'Query' AND user_id IS NOT NULL)" if settings.SCHEMA_REGISTRY_ENABLED else ""
+    rows = (
+        await db.execute(
+            text(
+                f"""
+                SELECT input_text, output_text, mode_action, mode_lang, model
+                FROM ai_requests
+                WHERE status='success' AND output_text IS NOT NULL AND output_text <> ''
+                  AND prompt_version = :version {skip_schema}
+                ORDER BY created_at DESC
+                LIMIT :limit
+                """
+            ),
+            {"limit": limit, "version": settings.PROMPT_VERSION},
+        )
+    ).all()
+
+    near_dup.clear()
+    # Oldest first so the newest rows end up most recently used.
+    for row in reversed(rows):
+        if len(row.input_text) > settings.NEAR_DUP_MAX_CHARS:
+            continue
+        mode = {"action": row.mode_action, "lang": row.mode_lang}
+        await near_dup.add(row.input_text, row.mode_action, row.mode_lang, row.model, build_prompt(mode), row.output_text)
+    return len(rows)
@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict
+
+from sqlalchemy import text
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+log = logging.getLogger(__name__)
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(raw: str) -> str:
+    # Whitespace only: case and punctuation can change the meaning of code/SQL.
+    return _WS_RE.sub(" ", raw or "").strip()
+
+
+@lru_cache(maxsize=1024)
+def prompt_hash(system_prompt: str) -> str:
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(raw_text: str, action: str, lang: str, model: str, system_prompt: str) -> str:
+    parts = (normalize_text(raw_text), str(action), str(lang), model, prompt_hash(system_prompt))
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class MemoryTier:
+    """Per-process LRU with a TTL per entry."""
+
+    def __init__(self, max_entries: int, ttl_s: float):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> str | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.time():
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str, expires_at: float | None = None) -> None:
+        self._data[key] = (expires_at or time.time() + self.ttl_s, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DiskTier:
+    """
+    SQLite file shared by every worker process on the host.
+    Calls are blocking; PolishCache runs them off the event loop.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl_s: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS polish_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_polish_cache_exp ON polish_cache (expires_at)")
+
+    def get(self, key: str) -> tuple[str, float] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM polish_cache WHERE key=? AND expires_at>=?",
+                (key, time.time()),
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO polish_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            # Amortized pruning instead of a separate sweeper per worker.
+            if random.random() < 0.01:
+                self._prune()
+
+    def _prune(self) -> None:
+        self._conn.execute("DELETE FROM polish_cache WHERE expires_at<?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM polish_cache WHERE key IN ("
+            " SELECT key FROM polish_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class PolishCache:
+    def __init__(self, memory: MemoryTier, disk: DiskTier | None = None):
+        self.memory = memory
+        self.disk = disk
+        self.stats: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    async def get(self, key: str) -> str | None:
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            return value
+        if self.disk is not None:
+            try:
+                found = await asyncio.to_thread(self.disk.get, key)
+            except sqlite3.Error:
+                log.warning("Polish disk cache read failed", exc_info=True)
+                found = None
+            if found is not None:
+                value, expires_at = found
+                self.memory.set(key, value, expires_at)
+                self.stats["disk_hits"] += 1
+                return value
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        expires_at = time.time() + self.memory.ttl_s
+        self.memory.set(key, value, expires_at)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.set, key, value, expires_at)
+            except sqlite3.Error:
+                log.warning("Polish disk cache write failed", exc_info=True)
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
+
+
+_cache: PolishCache | None = None
+
+
+def get_polish_cache() -> PolishCache:
+    global _cache
+    if _cache is None:
+        memory = MemoryTier(settings.POLISH_CACHE_MAX_ENTRIES, settings.POLISH_CACHE_TTL_S)
+        disk = None
+        if settings.POLISH_CACHE_DISK_PATH:
+            disk = DiskTier(
+                settings.POLISH_CACHE_DISK_PATH,
+                settings.POLISH_CACHE_DISK_MAX_ENTRIES,
+                settings.POLISH_CACHE_TTL_S,
+            )
+        _cache = PolishCache(memory, disk)
+    return _cache
+
+
+async def prewarm_from_db(
+    db: "AsyncSession",
+    build_prompt: Callable[[Dict[str, Any]], str],
+    limit: int,
+) -> int:
+    """
+    Load the most frequent successful (input, mode, model) answers into the cache.
+
+    Keys are rebuilt with today's build_prompt, so only rows written with the current
+    PROMPT_VERSION are loaded, and Query rows from signed-in users are skipped while
+    the schema registry is on: their prompt may have carried a schema section.
+    """
+    cache = get_polish_cache()
+    skip_schema = "AND NOT (mode_action = 'Query' AND user_id IS NOT NULL)" if settings.SCHEMA_REGISTRY_ENABLED else ""
+    rows = (
+        await db.execute(
+            text(
+                f"""
+                SELECT input_text, mode_action, mode_lang, model,
+                       MAX(output_text) AS output_text, COUNT(*) AS hits
+                FROM ai_requests
+                WHERE status='success' AND output_text IS NOT NULL AND output_text <> ''
+                  AND prompt_version = :version {skip_schema}
+                GROUP BY input_text, mode_action, mode_lang, model
+                ORDER BY hits DESC
+                LIMIT :limit
+                """
+            ),
+            {"limit": limit, "version": settings.PROMPT_VERSION},
+        )
+    ).all()
+
+    for row in rows:
+        mode = {"action": row.mode_action, "lang": row.mode_lang}
+        key = cache_key(row.input_text, row.mode_action, row.mode_lang, row.model, build_prompt(mode))
+        await cache.set(key, row.output_text)
+    return len(rows)
@@ -0,0 +1,272 @@
+"""
+Per-user quota enforcement.
+
+Limits depend on the subscription tier (User.subscription: 0 Free, 1 Pro):
+- requests per minute: sliding window in memory (per worker)
+- tokens per 24 h: sliding window of hourly buckets in memory, seeded from the
+  user_usage table so the limit holds across workers and restarts
+
+Counters are charged in memory on the request path and flushed to user_usage in
+the background; checks never touch the database except for the periodic
+tier/usage refresh of a user.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Tuple
+
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.db.session import get_async_sessionmaker
+from app.models.user import User
+from app.models.user_usage import UserUsage
+
+log = logging.getLogger(__name__)
+
+FREE, PRO = 0, 1
+_RELOAD_AFTER_ERROR_S = 30  # retry a failed tier/usage lookup this soon, not after QUOTA_USER_REFRESH_S
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class SlidingWindowCounter:
+    """Sum over the last window_s seconds, kept in bucket_s buckets."""
+
+    def __init__(self, window_s: int, bucket_s: int):
+        self.window_s = window_s
+        self.bucket_s = bucket_s
+        self._buckets: deque = deque()  # (bucket_start, count)
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window_s
+        while self._buckets and self._buckets[0][0] + self.bucket_s <= cutoff:
+            self._buckets.popleft()
+
+    def add(self, amount: int, now: float | None = None) -> None:
+        now = now or time.time()
+        start = now - (now % self.bucket_s)
+        if self._buckets and self._buckets[-1][0] == start:
+            self._buckets[-1] = (start, self._buckets[-1][1] + amount)
+        elif self._buckets and self._buckets[-1][0] > start:
+            # Seeding with an older bucket: keep buckets sorted.
+            items = sorted(list(self._buckets) + [(start, amount)])
+            self._buckets = deque(items)
+        else:
+            self._buckets.append((start, amount))
+
+    def total(self, now: float | None = None) -> int:
+        self._prune(now or time.time())
+        return sum(c for _, c in self._buckets)
+
+    def retry_after(self, now: float | None = None) -> int:
+        """Seconds until the oldest bucket leaves the window."""
+        now = now or time.time()
+        self._prune(now)
+        if not self._buckets:
+            return 1
+        return max(1, int(self._buckets[0][0] + self.bucket_s + self.window_s - now))
+
+
+class _UserState:
+    __slots__ = ("tier", "loaded_at", "requests", "tokens")
+
+    def __init__(self, tier: int):
+        self.tier = tier
+        self.loaded_at = time.monotonic()
+        self.requests = SlidingWindowCounter(60, 1)
+        self.tokens = SlidingWindowCounter(24 * 3600, 3600)
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _hour_start(ts: float) -> datetime:
+    # Naive UTC, like the other DATETIME columns we write.
+    return datetime.fromtimestamp(ts - ts % 3600, timezone.utc).replace(tzinfo=None)
+
+
+def _ts(naive_utc: datetime) -> float:
+    return (naive_utc - _EPOCH).total_seconds()
+
+
+class QuotaManager:
+    def __init__(self):
+        self._users: "OrderedDict[str, _UserState]" = OrderedDict()
+        self._pending: Dict[Tuple[int, datetime], list] = {}  # (user_id, hour) -> [requests, tokens]
+        self._task: asyncio.Task | None = None
+        self.stats: Dict[str, int] = {"allowed": 0, "rejected": 0, "flushes": 0, "load_errors": 0}
+
+    @staticmethod
+    def limits(tier: int) -> Tuple[int, int]:
+        if tier >= PRO:
+            return settings.QUOTA_PRO_REQUESTS_PER_MIN, settings.QUOTA_PRO_TOKENS_PER_DAY
+        return settings.QUOTA_FREE_REQUESTS_PER_MIN, settings.QUOTA_FREE_TOKENS_PER_DAY
+
+    async def _load_user(self, user_id: int) -> _UserState:
+        since = _hour_start(time.time()) - timedelta(hours=24)
+        async with get_async_sessionmaker()() as db:
+            tier = (await db.execute(select(User.subscription).where(User.id == user_id))).scalar()
+            rows = (
+                await db.execute(
+                    select(UserUsage.hour_start, UserUsage.tokens).where(
+                        UserUsage.user_id == user_id, UserUsage.hour_start >= since
+                    )
+                )
+            ).all()
+
+        state = _UserState(int(tier or FREE))
+        for hour_start, tokens in rows:
+            state.tokens.add(int(tokens or 0), _ts(hour_start))
+        # Our own unflushed usage is not in the table yet.
+        for (uid, hour), (_, tokens) in self._pending.items():
+            if uid == user_id:
+                state.tokens.add(tokens, _ts(hour))
+        return state
+
+    def _remember(self, key: str, state: _UserState) -> _UserState:
+        self._users[key] = state
+        self._users.move_to_end(key)
+        # Evicted users are re-seeded from user_usage on their next request.
+        while len(self._users) > settings.QUOTA_MAX_TRACKED_KEYS:
+            self._users.popitem(last=False)
+        return state
+
+    async def _state(self, user_id: int | None, client_key: str) -> Tuple[str, _UserState]:
+        if user_id is None:
+            key = f"ip:{client_key}"
+            state = self._users.get(key) or _UserState(settings.QUOTA_ANON_TIER)
+            return key, self._remember(key, state)
+
+        key = f"user:{user_id}"
+        state = self._users.get(key)
+        if state is None or time.monotonic() - state.loaded_at > settings.QUOTA_USER_REFRESH_S:
+            try:
+                fresh = await self._load_user(user_id)
+            except Exception:
+                # Fail open: keep the last known state, or start the user on Free, rather than a 500.
+                log.warning("quota lookup failed for user %s", user_id, exc_info=True)
+                self.stats["load_errors"] += 1
+                state = state or _UserState(FREE)
+                state.loaded_at = time.monotonic() - settings.QUOTA_USER_REFRESH_S + _RELOAD_AFTER_ERROR_S
+                return key, self._remember(key, state)
+            if state is not None:
+                fresh.requests = state.requests  # keep the short window; only tokens are persisted
+            state = fresh
+        return key, self._remember(key, state)
+
+    async def tier_of(self, user_id: int | None, client_key: str) -> int:
+        _, state = await self._state(user_id, client_key)
+        return state.tier
+
+    async def check(self, user_id: int | None, client_key: str, requests: int = 1, est_tokens: int = 0) -> int:
+        """Raise QuotaExceeded if this call would go over the user's tier limits; otherwise count it and return the tier."""
+        _, state = await self._state(user_id, client_key)
+        req_limit, token_limit = self.limits(state.tier)
+
+        if state.requests.total() + requests > req_limit:
+            self.stats["rejected"] += 1
+            raise QuotaExceeded(
+                f"Rate limit exceeded: {req_limit} requests per minute.", state.requests.retry_after()
+            )
+        if state.tokens.total() + est_tokens > token_limit:
+            self.stats["rejected"] += 1
+            raise QuotaExceeded(
+                f"Daily token quota exceeded: {token_limit} tokens per 24 h.", state.tokens.retry_after()
+            )
+
+        state.requests.add(requests)
+        self.stats["allowed"] += 1
+        self._add_pending(user_id, requests, 0)
+        return state.tier
+
+    async def charge_tokens(self, user_id: int | None, client_key: str, tokens: int) -> None:
+        if not tokens:
+            return
+        _, state = await self._state(user_id, client_key)
+        state.tokens.add(tokens)
+        self._add_pending(user_id, 0, tokens)
+
+    def _add_pending(self, user_id: int | None, requests: int, tokens: int) -> None:
+        if user_id is None:
+            return
+        bucket = self._pending.setdefault((user_id, _hour_start(time.time())), [0, 0])
+        bucket[0] += requests
+        bucket[1] += tokens
+
+    # ---- background flush ----
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="quota_flush")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.QUOTA_FLUSH_INTERVAL_S)
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("Quota usage flush failed")
+
+    async def flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            async with get_async_sessionmaker()() as db:
+                for (user_id, hour), (requests, tokens) in pending.items():
+                    await self._upsert(db, user_id, hour, requests, tokens)
+                await db.commit()
+        except Exception:
+            # Put the deltas back so they are retried on the next flush.
+            for k, (r, t) in pending.items():
+                bucket = self._pending.setdefault(k, [0, 0])
+                bucket[0] += r
+                bucket[1] += t
+            raise
+        self.stats["flushes"] += 1
+
+    @staticmethod
+    async def _upsert(db, user_id: int, hour: datetime, requests: int, tokens: int) -> None:
+        stmt = (
+            update(UserUsage)
+            .where(UserUsage.user_id == user_id, UserUsage.hour_start == hour)
+            .values(requests=UserUsage.requests + requests, tokens=UserUsage.tokens + tokens)
+        )
+        if (await db.execute(stmt)).rowcount:
+            return
+        try:
+            async with db.begin_nested():
+                await db.execute(
+                    insert(UserUsage).values(user_id=user_id, hour_start=hour, requests=requests, tokens=tokens)
+                )
+        except IntegrityError:
+            # Another worker inserted the row first.
+            await db.execute(stmt)
+
+
+_quota: QuotaManager | None = None
+
+
+def get_quota_manager() -> QuotaManager:
+    global _quota
+    if _quota is None:
+        _quota = QuotaManager()
+    return _quota
@@ -0,0 +1,85 @@
+"""
+Background purge of refresh_tokens.
+
+Every login adds a row, so without a purge the table only grows. Revoked rows and
+rows past expires_at are deleted in batches of REFRESH_PURGE_BATCH, to keep each
+DELETE short. Rows written before expires_at existed are treated as expiring
+REFRESH_TOKEN_EXPIRE_DAYS after created_at. A deleted token is rejected the same
+way a revoked one is ("not recognized").
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from sqlalchemy import and_, delete, or_, select
+
+from app.core.config import settings
+from app.db.session import get_async_sessionmaker
+from app.models.refresh_token import RefreshToken
+
+log = logging.getLogger(__name__)
+
+
+class RefreshTokenPurger:
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self.stats: Dict[str, int] = {"runs": 0, "deleted": 0}
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.purge()
+            except Exception:
+                log.exception("Refresh token purge failed")
+            await asyncio.sleep(settings.REFRESH_PURGE_INTERVAL_S)
+
+    async def purge(self) -> int:
+        now = datetime.now(timezone.utc)
+        legacy_cutoff = now - timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        expired = or_(
+            RefreshToken.revoked.is_(True),
+            RefreshToken.expires_at < now,
+            and_(RefreshToken.expires_at.is_(None), RefreshToken.created_at < legacy_cutoff),
+        )
+        total = 0
+        while True:
+            async with get_async_sessionmaker()() as db:
+                ids = (
+                    await db.execute(select(RefreshToken.id).where(expired).limit(settings.REFRESH_PURGE_BATCH))
+                ).scalars().all()
+                if not ids:
+                    break
+                await db.execute(delete(RefreshToken).where(RefreshToken.id.in_(ids)))
+                await db.commit()
+            total += len(ids)
+            if len(ids) < settings.REFRESH_PURGE_BATCH:
+                break
+        self.stats["runs"] += 1
+        self.stats["deleted"] += total
+        if total:
+            log.info("Purged %d refresh tokens", total)
+        return total
+
+
+_purger: RefreshTokenPurger | None = None
+
+
+def get_refresh_token_purger() -> RefreshTokenPurger:
+    global _purger
+    if _purger is None:
+        _purger = RefreshTokenPurger()
+    return _purger
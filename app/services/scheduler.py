@@ -0,0 +1,193 @@
+"""
+Admission scheduler for upstream LLM calls.
+
+At most max_concurrency calls run at once per worker. When saturated, callers wait
+in one FIFO queue per subscription tier; freed slots go to tiers in proportion to
+their weight (stride scheduling), so a burst of Free traffic cannot starve Pro.
+Inside a tier, one user may hold at most per_user_cap slots. A caller that waits
+longer than its max wait is rejected instead of piling up.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict
+
+from app.core.config import settings
+from app.core.metrics import SCHED_WAIT_SECONDS
+
+
+class QueueTimeout(Exception):
+    def __init__(self, tier: int, waited_s: float):
+        super().__init__(f"Upstream queue wait exceeded ({waited_s:.1f}s).")
+        self.tier = tier
+        self.waited_s = waited_s
+
+
+class _Waiter:
+    __slots__ = ("user_key", "future", "enqueued_at")
+
+    def __init__(self, user_key: str, future: asyncio.Future):
+        self.user_key = user_key
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class _TierStats:
+    __slots__ = ("admitted", "rejected", "queued", "wait_ms")
+
+    def __init__(self):
+        self.admitted = 0
+        self.rejected = 0
+        self.queued = 0
+        self.wait_ms: Deque[float] = deque(maxlen=1000)  # recent queue waits
+
+    def snapshot(self) -> Dict[str, float]:
+        waits = sorted(self.wait_ms)
+
+        def pct(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 1) if waits else 0.0
+
+        return {
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queued": self.queued,
+            "wait_p50_ms": pct(0.50),
+            "wait_p99_ms": pct(0.99),
+        }
+
+
+class FairScheduler:
+    def __init__(self, max_concurrency: int, weights: Dict[int, float], per_user_cap: int, max_wait_s: float):
+        self.max_concurrency = max_concurrency
+        self.weights = weights
+        self.per_user_cap = per_user_cap
+        self.max_wait_s = max_wait_s
+        self.running = 0
+        self._user_running: Dict[str, int] = {}
+        self._queues: Dict[int, Deque[_Waiter]] = {tier: deque() for tier in weights}
+        self._pass: Dict[int, float] = {tier: 0.0 for tier in weights}
+        self._stats: Dict[int, _TierStats] = {tier: _TierStats() for tier in weights}
+
+    def _tier(self, tier: int) -> int:
+        return tier if tier in self.weights else min(self.weights)
+
+    def depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _grant(self, user_key: str) -> None:
+        self.running += 1
+        self._user_running[user_key] = self._user_running.get(user_key, 0) + 1
+
+    def release(self, user_key: str) -> None:
+        self.running -= 1
+        left = self._user_running.get(user_key, 1) - 1
+        if left:
+            self._user_running[user_key] = left
+        else:
+            self._user_running.pop(user_key, None)
+        self._dispatch()
+
+    def _user_ok(self, user_key: str) -> bool:
+        return self._user_running.get(user_key, 0) < self.per_user_cap
+
+    def _pop_eligible(self, tier: int) -> _Waiter | None:
+        queue = self._queues[tier]
+        for i, w in enumerate(queue):
+            if self._user_ok(w.user_key):
+                del queue[i]
+                return w
+        return None
+
+    def _dispatch(self) -> None:
+        while self.running < self.max_concurrency:
+            # Stride scheduling: the non-empty tier with the lowest pass goes next.
+            candidates = sorted((self._pass[t], t) for t, q in self._queues.items() if q)
+            waiter = None
+            for _, tier in candidates:
+                waiter = self._pop_eligible(tier)
+                if waiter is not None:
+                    self._pass[tier] += 1.0 / self.weights[tier]
+                    break
+            if waiter is None:
+                return
+            self._grant(waiter.user_key)
+            waiter.future.set_result(None)
+
+    def _activate(self, tier: int) -> None:
+        # A tier that was idle must not bank credit: start it at the current minimum pass.
+        active = [self._pass[t] for t, q in self._queues.items() if q and t != tier]
+        if active and not self._queues[tier]:
+            self._pass[tier] = max(self._pass[tier], min(active))
+
+    async def acquire(self, tier: int, user_key: str, max_wait_s: float | None = None) -> float:
+        """Wait for a slot (max_wait_s overrides the default wait); returns the queue time in ms."""
+        tier = self._tier(tier)
+        stats = self._stats[tier]
+        if self.running < self.max_concurrency and self.depth() == 0 and self._user_ok(user_key):
+            self._grant(user_key)
+            stats.admitted += 1
+            stats.wait_ms.append(0.0)
+            SCHED_WAIT_SECONDS.observe(0.0, tier)
+            return 0.0
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(user_key, loop.create_future())
+        self._activate(tier)
+        self._queues[tier].append(waiter)
+        stats.queued += 1
+        # Slots may be free while the queue only holds users at their cap; admit in fair order now.
+        self._dispatch()
+        timeout = self.max_wait_s if max_wait_s is None else max_wait_s
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=max(timeout, 0.0))
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                self._queues[tier].remove(waiter)
+                stats.rejected += 1
+                raise QueueTimeout(tier, time.perf_counter() - waiter.enqueued_at)
+        except asyncio.CancelledError:
+            if waiter.future.done():
+                self.release(user_key)  # slot was granted but the caller went away
+            else:
+                self._queues[tier].remove(waiter)
+            raise
+
+        waited_ms = (time.perf_counter() - waiter.enqueued_at) * 1000
+        stats.admitted += 1
+        stats.wait_ms.append(waited_ms)
+        SCHED_WAIT_SECONDS.observe(waited_ms / 1000, tier)
+        return waited_ms
+
+    @asynccontextmanager
+    async def slot(self, tier: int, user_key: str, max_wait_s: float | None = None):
+        waited_ms = await self.acquire(tier, user_key, max_wait_s)
+        try:
+            yield waited_ms
+        finally:
+            self.release(user_key)
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "running": self.running,
+            "max_concurrency": self.max_concurrency,
+            "tiers": {
+                str(t): {**self._stats[t].snapshot(), "depth": len(self._queues[t])}
+                for t in self.weights
+            },
+        }
+
+
+_scheduler: FairScheduler | None = None
+
+
+def get_scheduler() -> FairScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = FairScheduler(
+            max_concurrency=settings.SCHED_MAX_CONCURRENCY,
+            weights={0: settings.SCHED_WEIGHT_FREE, 1: settings.SCHED_WEIGHT_PRO},
+            per_user_cap=settings.SCHED_PER_USER_CAP,
+            max_wait_s=settings.SCHED_MAX_QUEUE_WAIT_S,
+        )
+    return _scheduler
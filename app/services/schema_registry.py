@@ -0,0 +1,313 @@
+"""
+Per-user schema registry for Query mode.
+
+Users register DDL (or, for MongoDB, a JSON map of collection -> fields) once per
+dialect. Tables are parsed into a compact one-line summary and stored in
+schema_tables. At query time a BM25 index over table and column names picks the
+top-k tables for the question, and only their summaries go into the prompt.
+
+Indexes are built from the table rows on first use and kept in an LRU, per
+(user_id, dialect); registering or deleting invalidates that entry.
+"""
+import json
+import math
+import re
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from sqlalchemy import delete, insert, select
+
+from app.core.config import settings
+from app.db.session import get_async_sessionmaker
+from app.models.schema_table import SchemaTable
+
+# Same list as the desktop QUERY combo box.
+DIALECTS = (
+    "Mysql", "PostgreSQL", "SQLite", "Oracle", "SQL Server",
+    "MariaDB", "Snowflake", "BigQuery", "Redshift", "MongoDB",
+)
+_DIALECT_BY_KEY = {d.lower(): d for d in DIALECTS}
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def canonical_dialect(lang: str) -> str | None:
+    return _DIALECT_BY_KEY.get(str(lang or "").strip().lower())
+
+
+@dataclass
+class ParsedTable:
+    name: str
+    columns: List[Tuple[str, str, str]] = field(default_factory=list)  # (name, type, flags)
+
+    def summary(self) -> str:
+        cols = ", ".join(" ".join(p for p in col if p) for col in self.columns)
+        return f"{self.name}({cols})"
+
+
+# ---- DDL parsing ----
+_CREATE_TABLE = re.compile(
+    r"CREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:GLOBAL\s+|LOCAL\s+)?(?:TEMPORARY|TEMP|TRANSIENT|EXTERNAL)\s+)?"
+    r"TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?([`\"\[\]\w.$-]+)\s*\(",
+    re.IGNORECASE,
+)
+_CONSTRAINT_START = ("PRIMARY", "FOREIGN", "CONSTRAINT", "UNIQUE", "KEY", "INDEX", "CHECK", "FULLTEXT", "SPATIAL")
+_REFERENCES = re.compile(r"REFERENCES\s+([`\"\[\]\w.$-]+)", re.IGNORECASE)
+_PAREN_LIST = re.compile(r"\(([^)]*)\)")
+
+
+def _unquote(name: str) -> str:
+    return re.sub(r"[`\"\[\]]", "", name)
+
+
+def _split_top_level(body: str) -> List[str]:
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(body):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(body[start:i])
+            start = i + 1
+    parts.append(body[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _table_body(ddl: str, open_paren: int) -> str | None:
+    depth = 0
+    for i in range(open_paren, len(ddl)):
+        if ddl[i] == "(":
+            depth += 1
+        elif ddl[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return ddl[open_paren + 1:i]
+    return None
+
+
+def parse_ddl(ddl: str) -> List[ParsedTable]:
+    tables: List[ParsedTable] = []
+    for match in _CREATE_TABLE.finditer(ddl):
+        body = _table_body(ddl, match.end() - 1)
+        if body is None:
+            continue
+        table = ParsedTable(_unquote(match.group(1)))
+        pk: set = set()
+        fks: Dict[str, str] = {}
+        for item in _split_top_level(body):
+            head = item.split(None, 1)[0].upper()
+            if head in _CONSTRAINT_START:
+                cols = _PAREN_LIST.search(item)
+                names = [_unquote(c.strip()) for c in cols.group(1).split(",")] if cols else []
+                if "PRIMARY KEY" in item.upper():
+                    pk.update(names)
+                ref = _REFERENCES.search(item)
+                if ref and "FOREIGN" in item.upper():
+                    for name in names:
+                        fks[name] = _unquote(ref.group(1))
+                continue
+            tokens = item.split()
+            name = _unquote(tokens[0])
+            col_type = tokens[1] if len(tokens) > 1 else ""
+            if "PRIMARY KEY" in item.upper():
+                pk.add(name)
+            ref = _REFERENCES.search(item)
+            if ref:
+                fks[name] = _unquote(ref.group(1))
+            table.columns.append((name, col_type.upper(), ""))
+        # Table-level PRIMARY KEY / FOREIGN KEY clauses may come after the columns.
+        table.columns = [
+            (name, col_type, " ".join(f for f in ("PK" if name in pk else "", f"-> {fks[name]}" if name in fks else "") if f))
+            for name, col_type, _ in table.columns
+        ]
+        tables.append(table)
+    return tables
+
+
+def parse_mongo(spec: str) -> List[ParsedTable]:
+    """{"orders": ["_id", "customer_id", "total"]} or {"orders": {"total": "double", ...}}"""
+    try:
+        data = json.loads(spec)
+    except ValueError as e:
+        raise SchemaError(f"MongoDB schema must be JSON: {e}")
+    if not isinstance(data, dict):
+        raise SchemaError("MongoDB schema must be a JSON object of collection -> fields.")
+    tables = []
+    for name, fields in data.items():
+        if isinstance(fields, dict):
+            columns = [(str(f), str(t), "") for f, t in fields.items()]
+        elif isinstance(fields, list):
+            columns = [(str(f), "", "") for f in fields]
+        else:
+            raise SchemaError(f"Fields of {name!r} must be a list or an object.")
+        tables.append(ParsedTable(str(name), columns))
+    return tables
+
+
+def parse_schema(dialect: str, text: str) -> List[ParsedTable]:
+    tables = parse_mongo(text) if dialect == "MongoDB" else parse_ddl(text)
+    if not tables:
+        raise SchemaError("No tables found. Paste CREATE TABLE statements.")
+    # A table defined twice (e.g. a drop-and-recreate script): the last definition wins.
+    # Keyed like the unique (user_id, dialect, table_name) row: stored names are cut to 128
+    # characters, and MySQL's default collation compares them case-insensitively.
+    return list({t.name[:128].lower(): t for t in tables}.values())
+
+
+# ---- BM25 ----
+_CAMEL = re.compile(r"([a-z0-9])([A-Z])")
+_WORD = re.compile(r"[a-z]+|[0-9]+")
+
+
+def _stem(term: str) -> str:
+    if len(term) > 4 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+
+def terms(text: str) -> List[str]:
+    return [_stem(t) for t in _WORD.findall(_CAMEL.sub(r"\1 \2", text).lower())]
+
+
+class SchemaIndex:
+    K1, B = 1.2, 0.75
+    NAME_WEIGHT = 3  # a hit on the table name counts like three column hits
+
+    def __init__(self, tables: List[ParsedTable]):
+        self.tables = tables
+        self._docs: List[Counter] = []
+        for table in tables:
+            doc = Counter(terms(table.name) * self.NAME_WEIGHT)
+            for name, _, _ in table.columns:
+                doc.update(terms(name))
+            self._docs.append(doc)
+        self._lengths = [sum(d.values()) for d in self._docs]
+        self._avgdl = (sum(self._lengths) / len(self._lengths)) if self._lengths else 1.0
+        self._df = Counter(term for doc in self._docs for term in doc)
+
+    def search(self, question: str, k: int) -> List[ParsedTable]:
+        query = set(terms(question))
+        n = len(self._docs)
+        scored = []
+        for i, doc in enumerate(self._docs):
+            score = 0.0
+            for term in query:
+                tf = doc.get(term)
+                if not tf:
+                    continue
+                idf = math.log(1 + (n - self._df[term] + 0.5) / (self._df[term] + 0.5))
+                norm = tf + self.K1 * (1 - self.B + self.B * self._lengths[i] / self._avgdl)
+                score += idf * tf * (self.K1 + 1) / norm
+            if score > 0:
+                scored.append((score, i))
+        scored.sort(reverse=True)
+        return [self.tables[i] for _, i in scored[:k]]
+
+
+# ---- registry ----
+class SchemaRegistry:
+    def __init__(self, max_indexes: int):
+        self.max_indexes = max_indexes
+        self._indexes: "OrderedDict[Tuple[int, str], SchemaIndex]" = OrderedDict()
+        self.stats: Dict[str, int] = {"loads": 0, "lookups": 0, "hits": 0}
+
+    def _invalidate(self, user_id: int, dialect: str) -> None:
+        self._indexes.pop((user_id, dialect), None)
+
+    async def register(self, user_id: int, dialect: str, text: str, replace: bool = False) -> List[str]:
+        tables = parse_schema(dialect, text)
+        if len(tables) > settings.SCHEMA_MAX_TABLES_PER_USER:
+            raise SchemaError(f"Too many tables. Max {settings.SCHEMA_MAX_TABLES_PER_USER} per dialect.")
+        names = [t.name for t in tables]
+        async with get_async_sessionmaker()() as db:
+            scope = (SchemaTable.user_id == user_id, SchemaTable.dialect == dialect)
+            if replace:
+                await db.execute(delete(SchemaTable).where(*scope))
+            else:
+                await db.execute(delete(SchemaTable).where(*scope, SchemaTable.table_name.in_(names)))
+            await db.execute(
+                insert(SchemaTable),
+                [
+                    {
+                        "user_id": user_id,
+                        "dialect": dialect,
+                        "table_name": t.name[:128],
+                        "columns": json.dumps(t.columns),
+                        "summary": t.summary(),
+                    }
+                    for t in tables
+                ],
+            )
+            await db.commit()
+        self._invalidate(user_id, dialect)
+        return names
+
+    async def delete(self, user_id: int, dialect: str, table_name: str | None = None) -> int:
+        async with get_async_sessionmaker()() as db:
+            stmt = delete(SchemaTable).where(SchemaTable.user_id == user_id, SchemaTable.dialect == dialect)
+            if table_name:
+                stmt = stmt.where(SchemaTable.table_name == table_name)
+            result = await db.execute(stmt)
+            await db.commit()
+        self._invalidate(user_id, dialect)
+        return result.rowcount or 0
+
+    async def list_tables(self, user_id: int, dialect: str) -> List[str]:
+        index = await self.get_index(user_id, dialect)
+        return [t.name for t in index.tables]
+
+    async def get_index(self, user_id: int, dialect: str) -> SchemaIndex:
+        key = (user_id, dialect)
+        index = self._indexes.get(key)
+        if index is not None:
+            self._indexes.move_to_end(key)
+            return index
+
+        self.stats["loads"] += 1
+        async with get_async_sessionmaker()() as db:
+            rows = (
+                await db.execute(
+                    select(SchemaTable.table_name, SchemaTable.columns)
+                    .where(SchemaTable.user_id == user_id, SchemaTable.dialect == dialect)
+                    .order_by(SchemaTable.table_name)
+                )
+            ).all()
+        # Users without a schema get an empty index, so they cost one query per LRU lifetime.
+        index = SchemaIndex([ParsedTable(name, [tuple(c) for c in json.loads(cols)]) for name, cols in rows])
+        self._indexes[key] = index
+        while len(self._indexes) > self.max_indexes:
+            self._indexes.popitem(last=False)
+        return index
+
+    async def context_for(self, user_id: int, lang: str, question: str) -> str | None:
+        """Prompt section with the top-k tables for question, or None when nothing matches."""
+        dialect = canonical_dialect(lang)
+        if dialect is None:
+            return None
+        self.stats["lookups"] += 1
+        index = await self.get_index(user_id, dialect)
+        if not index.tables:
+            return None
+        tables = index.search(question, settings.SCHEMA_TOP_K)
+        if not tables:
+            return None
+        self.stats["hits"] += 1
+        kind = "COLLECTIONS" if dialect == "MongoDB" else "TABLES"
+        lines = "\n".join(f"- {t.summary()}" for t in tables)
+        return f"USER SCHEMA ({kind} relevant to this request; use these exact names):\n{lines}\n"
+
+
+_registry: SchemaRegistry | None = None
+
+
+def get_schema_registry() -> SchemaRegistry:
+    global _registry
+    if _registry is None:
+        _registry = SchemaRegistry(settings.SCHEMA_CACHE_MAX_INDEXES)
+    return _registry
@@ -0,0 +1,209 @@
+"""
+Incremental daily usage rollups.
+
+A background job folds ai_requests into usage_daily (user, day, action, lang,
+model) one window at a time. The window runs from the watermark to the next UTC
+midnight or to now - USAGE_ROLLUP_SETTLE_S, whichever comes first; the settle lag
+lets write-behind inserts and finish updates land before a row is counted. Each
+window is aggregated, upserted and the watermark advanced in one transaction.
+The watermark is advanced with a compare-and-set, so when several workers run the
+job only one of them applies a given window.
+
+GET /usage reads only usage_daily, so its cost depends on the date range asked for,
+not on the size of ai_requests.
+"""
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.db.session import get_async_sessionmaker
+from app.models.ai_request import AiRequest
+from app.models.rollup_watermark import RollupWatermark
+from app.models.usage_daily import UsageDaily
+from app.services.audit_writer import utcnow
+
+log = logging.getLogger(__name__)
+
+WATERMARK = "usage_daily"
+
+_SUMS = ("requests", "errors", "cache_hits", "prompt_tokens", "completion_tokens", "total_tokens")
+
+_GROUP_COLUMNS = {
+    "day": UsageDaily.day,
+    "action": UsageDaily.mode_action,
+    "lang": UsageDaily.mode_lang,
+    "model": UsageDaily.model,
+}
+
+
+def _day_start(ts: datetime) -> datetime:
+    return datetime(ts.year, ts.month, ts.day)
+
+
+class UsageRollup:
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self.stats: Dict[str, Any] = {"windows": 0, "rows": 0, "conflicts": 0, "watermark": None}
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                caught_up = await self.run_once()
+            except Exception:
+                log.exception("Usage rollup failed")
+                caught_up = True
+            # Backfills continue straight away; the day limit only bounds one transaction batch.
+            await asyncio.sleep(settings.USAGE_ROLLUP_INTERVAL_S if caught_up else 0)
+
+    async def run_once(self) -> bool:
+        """Roll up to USAGE_ROLLUP_MAX_DAYS_PER_RUN windows. Returns True once caught up with the cutoff."""
+        cutoff = utcnow() - timedelta(seconds=settings.USAGE_ROLLUP_SETTLE_S)
+        watermark = await self._watermark(cutoff)
+        for _ in range(settings.USAGE_ROLLUP_MAX_DAYS_PER_RUN):
+            if watermark >= cutoff:
+                return True
+            end = min(_day_start(watermark) + timedelta(days=1), cutoff)
+            if not await self._roll_window(watermark, end):
+                self.stats["conflicts"] += 1
+                return True  # another worker advanced the watermark; pick it up next time
+            watermark = end
+        return watermark >= cutoff
+
+    async def _watermark(self, cutoff: datetime) -> datetime:
+        async with get_async_sessionmaker()() as db:
+            value = (
+                await db.execute(select(RollupWatermark.value).where(RollupWatermark.name == WATERMARK))
+            ).scalar_one_or_none()
+            if value is None:
+                # First run: start at the day of the oldest request, or today on an empty table.
+                oldest = (await db.execute(select(func.min(AiRequest.created_at)))).scalar_one_or_none()
+                value = _day_start(oldest or cutoff)
+                db.add(RollupWatermark(name=WATERMARK, value=value))
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    # Another worker created it first.
+                    await db.rollback()
+                    value = (
+                        await db.execute(select(RollupWatermark.value).where(RollupWatermark.name == WATERMARK))
+                    ).scalar_one()
+        self.stats["watermark"] = value.isoformat()
+        return value
+
+    async def _roll_window(self, start: datetime, end: datetime) -> bool:
+        t = AiRequest
+        keys = (
+            t.user_id,
+            func.coalesce(t.mode_action, ""),
+            func.coalesce(t.mode_lang, ""),
+            func.coalesce(t.model, ""),
+        )
+        stmt = (
+            select(
+                *keys,
+                func.count(),
+                func.sum(case((t.status == "error", 1), else_=0)),
+                func.sum(case((t.cache_hit > 0, 1), else_=0)),
+                func.sum(func.coalesce(t.prompt_tokens, 0)),
+                func.sum(func.coalesce(t.completion_tokens, 0)),
+                func.sum(func.coalesce(t.total_tokens, 0)),
+            )
+            .where(t.created_at >= start, t.created_at < end, t.user_id.is_not(None))
+            .group_by(*keys)
+        )
+        day = start.date()
+        async with get_async_sessionmaker()() as db:
+            # Claim the window first: the row lock serializes workers, the loser sees rowcount 0.
+            claimed = await db.execute(
+                update(RollupWatermark)
+                .where(RollupWatermark.name == WATERMARK, RollupWatermark.value == start)
+                .values(value=end)
+            )
+            if not claimed.rowcount:
+                await db.rollback()
+                return False
+            rows = (await db.execute(stmt)).all()
+            for user_id, action, lang, model, *sums in rows:
+                await self._upsert(db, user_id, day, action, lang, model, dict(zip(_SUMS, (int(v or 0) for v in sums))))
+            await db.commit()
+        self.stats["windows"] += 1
+        self.stats["rows"] += len(rows)
+        self.stats["watermark"] = end.isoformat()
+        return True
+
+    @staticmethod
+    async def _upsert(db, user_id: int, day: date, action: str, lang: str, model: str, sums: Dict[str, int]) -> None:
+        # Only the watermark holder writes usage_daily, so update-then-insert cannot race.
+        key = (
+            UsageDaily.user_id == user_id,
+            UsageDaily.day == day,
+            UsageDaily.mode_action == action,
+            UsageDaily.mode_lang == lang,
+            UsageDaily.model == model,
+        )
+        stmt = update(UsageDaily).where(*key).values({c: getattr(UsageDaily, c) + v for c, v in sums.items()})
+        if (await db.execute(stmt)).rowcount:
+            return
+        await db.execute(
+            insert(UsageDaily).values(user_id=user_id, day=day, mode_action=action, mode_lang=lang, model=model, **sums)
+        )
+
+
+async def get_usage(user_id: int, start: date, end: date, group_by: List[str]) -> Dict[str, Any]:
+    """Totals for user_id over [start, end] (UTC days), plus one entry per group_by combination."""
+    dims = [_GROUP_COLUMNS[g] for g in group_by]
+    sums = [func.sum(getattr(UsageDaily, c)) for c in _SUMS]
+    where = (UsageDaily.user_id == user_id, UsageDaily.day >= start, UsageDaily.day <= end)
+    async with get_async_sessionmaker()() as db:
+        rows = (
+            await db.execute(select(*dims, *sums).where(*where).group_by(*dims).order_by(*dims))
+        ).all() if dims else []
+        totals = (await db.execute(select(*sums).where(*where))).one()
+        watermark = (
+            await db.execute(select(RollupWatermark.value).where(RollupWatermark.name == WATERMARK))
+        ).scalar_one_or_none()
+
+    def counts(values) -> Dict[str, int]:
+        return dict(zip(_SUMS, (int(v or 0) for v in values)))
+
+    return {
+        "user_id": user_id,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        # Requests made after this instant are not counted yet.
+        "as_of": watermark.isoformat() if watermark else None,
+        "totals": counts(totals),
+        "breakdown": [
+            {**{g: (v.isoformat() if isinstance(v, date) else v) for g, v in zip(group_by, row[: len(dims)])},
+             **counts(row[len(dims):])}
+            for row in rows
+        ],
+    }
+
+
+_rollup: UsageRollup | None = None
+
+
+def get_usage_rollup() -> UsageRollup:
+    global _rollup
+    if _rollup is None:
+        _rollup = UsageRollup()
+    return _rollup
@@ -1,3 +1,4 @@
+import json
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -13,4 +14,33 @@ class ApiClient:
     def post(self, url: str, payload: dict, headers=None, timeout=15):
         return self.http.post(url, json=payload, headers=headers or {}, timeout=timeout)
 
+    def post_stream(self, url: str, payload: dict, headers=None, timeout=30):
+        # timeout applies per read, so a long generation is fine as long as chunks keep coming
+        return self.http.post(url, json=payload, headers=headers or {}, timeout=(5, timeout), stream=True)
+
+    def server_timing(self, response) -> str:
+        """Render the Server-Timing header as 'name=ms ...' for logs."""
+        parts = []
+        for metric in (response.headers.get("Server-Timing") or "").split(","):
+            fields = [f.strip() for f in metric.split(";")]
+            dur = next((f[4:] for f in fields[1:] if f.startswith("dur=")), None)
+            if fields[0] and dur is not None:
+                parts.append(f"{fields[0]}={dur}")
+        return " ".join(parts)
+
+    def iter_sse(self, response):
+        """Yield (event, data_dict) pairs from a text/event-stream response."""
+        event, data_lines = "message", []
+        for line in response.iter_lines(decode_unicode=True):
+            if line is None:
+                continue
+            if not line:
+                if data_lines:
+                    yield event, json.loads("\n".join(data_lines))
+                event, data_lines = "message", []
+            elif line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[5:].lstrip())
+
 api = ApiClient()
@@ -1,7 +1,7 @@
 import requests
 from typing import Optional, Tuple
 
-from sai_devion.config import LOGIN_URL, SIGNUP_URL
+from sai_devion.config import LOGIN_URL, REFRESH_URL, SIGNUP_URL
 from sai_devion.session_store import SessionStore, Profile
 
 
@@ -101,6 +101,24 @@ class HttpAuthService:
             return prof
         return None
 
+    def refresh_access(self, store: SessionStore) -> bool:
+        """
+        Get a new access token with the stored refresh token (POST /auth/refresh).
+        Access tokens are kept in memory only, so this runs after every app start.
+        """
+        refresh = store.load_refresh_token()
+        if not refresh:
+            return False
+        try:
+            r = requests.post(REFRESH_URL, json={"refresh_token": refresh}, timeout=10)
+            if r.status_code != 200:
+                return False
+            access_token = r.json().get("access_token") or ""
+        except Exception:
+            return False
+        store.set_access_token(access_token or None)
+        return bool(access_token)
+
     def logout(self, store: SessionStore) -> None:
         # For now: clear local session. Later: call backend revoke endpoint.
         store.clear_all()
@@ -7,6 +7,7 @@ API_BASE = "http://127.0.0.1:8000/api/v1"
 SIGNUP_URL = f"{API_BASE}/auth/signup"
 LOGIN_URL  = f"{API_BASE}/auth/login"
 POLISH_URL  = f"{API_BASE}/polish"
+POLISH_STREAM_URL = f"{API_BASE}/polish/stream"
 
 
 
@@ -16,6 +17,9 @@ POLISH_URL  = f"{API_BASE}/polish"
 # Backend base (when AUTH_MODE="http")
 MAX_WORDS = int(os.getenv("SAI_MAX_WORDS", "500"))
 
+# Paste generated output line by line as it streams in (1) instead of all at once (0)
+STREAM_PASTE = os.getenv("SAI_STREAM_PASTE", "0") == "1"
+
 HOTKEY1 = os.getenv("SAI_HOTKEY1", "ctrl+q")
 HOTKEY2 = os.getenv("SAI_HOTKEY2", "ctrl+w")
 
@@ -8,8 +8,9 @@ import pyperclip
 
 from sai_devion.utils.clipboard import reliable_copy, reliable_paste
 from sai_devion.utils.notifications import show_notification
-from sai_devion.config import APP_NAME, MAX_WORDS, POLISH_URL
+from sai_devion.config import APP_NAME, MAX_WORDS, POLISH_URL, POLISH_STREAM_URL, STREAM_PASTE
 from sai_devion.api_client import api
+from sai_devion.auth_http import HttpAuthService
 from sai_devion.session_store import SessionStore
 
 
@@ -64,6 +65,7 @@ class HotkeyHandler:
         """
         self.store = store
         self.get_modes = get_modes_callable
+        self._auth = HttpAuthService()
 
         # WinAPI hotkey thread + id (Windows only)
         self._hotkey_thread = None
@@ -244,12 +246,32 @@ class HotkeyHandler:
         mode_q, mode_w = self.get_modes()
         mode = mode_q if which == "program" else mode_w
 
+        if STREAM_PASTE:
+            self._process_streaming(txt, mode)
+            return
+
         out = ""
         try:
             payload = {"text": txt, "mode": mode}
-            r = api.post(POLISH_URL, payload, timeout=30)
+            started = time.perf_counter()
+            r = api.post(POLISH_URL, payload, headers=self._auth_headers(), timeout=30)
+            if r.status_code == 401:
+                # Access token expired (30 min): refresh once and retry.
+                r = api.post(POLISH_URL, payload, headers=self._auth_headers(refresh=True), timeout=30)
+            # Client-side view next to the server's own breakdown, correlated by request_uid.
+            logging.info(
+                "POLISH %s status=%s client=%.0fms headers=%.0fms server=[%s]",
+                r.headers.get("X-Request-UID"),
+                r.status_code,
+                (time.perf_counter() - started) * 1000,
+                r.elapsed.total_seconds() * 1000,
+                api.server_timing(r),
+            )
             if r.status_code == 200:
                 out = (r.json().get("text") or "").strip()
+            elif r.status_code == 413:
+                # The server counts tokens, not words; tell the user instead of silently pasting back.
+                show_notification(APP_NAME, r.json().get("detail") or "Input too long.")
         except Exception:
             logging.exception("POLISH request failed")
             out = ""
@@ -262,3 +284,61 @@ class HotkeyHandler:
         pyperclip.copy(out)
         time.sleep(0.05)
         reliable_paste()
+
+    def _auth_headers(self, refresh: bool = False) -> dict:
+        """Bearer header for the backend; fetches a fresh access token when asked or when there is none."""
+        token = self.store.get_access_token()
+        if (refresh or not token) and self._auth.refresh_access(self.store):
+            token = self.store.get_access_token()
+        return {"Authorization": f"Bearer {token}"} if token else {}
+
+    def _paste_text(self, out: str):
+        pyperclip.copy(out)
+        time.sleep(0.05)
+        reliable_paste()
+
+    def _process_streaming(self, txt: str, mode: dict):
+        """
+        Consume POST /polish/stream and paste each completed line as soon as it arrives.
+        The first paste replaces the selection; later pastes continue at the cursor.
+        """
+        pending = ""
+        pasted_any = False
+        try:
+            payload = {"text": txt, "mode": mode}
+            r = api.post_stream(POLISH_STREAM_URL, payload, headers=self._auth_headers(), timeout=30)
+            if r.status_code == 401:
+                r.close()
+                r = api.post_stream(POLISH_STREAM_URL, payload, headers=self._auth_headers(refresh=True), timeout=30)
+            with r:
+                if r.status_code != 200:
+                    raise RuntimeError(f"POLISH stream HTTP {r.status_code}")
+
+                for event, data in api.iter_sse(r):
+                    if event == "delta":
+                        pending += data.get("text") or ""
+                        cut = pending.rfind("\n")
+                        if cut >= 0:
+                            chunk, pending = pending[:cut + 1], pending[cut + 1:]
+                            if not pasted_any:
+                                chunk = chunk.lstrip()
+                            if chunk:
+                                self._paste_text(chunk)
+                                pasted_any = True
+                    elif event == "done":
+                        break
+                    elif event == "error":
+                        logging.error("POLISH stream error: %s", data.get("detail"))
+                        break
+        except Exception:
+            logging.exception("POLISH stream request failed")
+
+        # Flush the trailing partial line (server output is stripped, so no final newline)
+        rest = pending.strip() if not pasted_any else pending.rstrip()
+        if rest:
+            self._paste_text(rest)
+            pasted_any = True
+
+        # Nothing came back: fall back to original text, like the non-streaming path
+        if not pasted_any:
+            self._paste_text(txt.strip())
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from app.core.ddsketch import DDSketch
+
+ALPHA = 0.01
+
+
+def _exact(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def _latencies(n: int, seed: int):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(6.5, 0.8) for _ in range(n)]  # ms, median around 650
+
+
+@pytest.mark.parametrize("q", [0.5, 0.9, 0.95, 0.99])
+def test_quantiles_within_relative_accuracy(q):
+    values = _latencies(20_000, seed=1)
+    sketch = DDSketch(ALPHA)
+    for v in values:
+        sketch.add(v)
+    exact = _exact(values, q)
+    assert abs(sketch.quantile(q) - exact) <= ALPHA * exact * 1.01
+
+
+def test_merge_matches_single_sketch():
+    values = _latencies(10_000, seed=2)
+    parts = [DDSketch(ALPHA) for _ in range(4)]
+    whole = DDSketch(ALPHA)
+    for i, v in enumerate(values):
+        parts[i % 4].add(v)
+        whole.add(v)
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+
+    assert merged.count == whole.count
+    assert merged.bins == whole.bins
+    assert merged.min == whole.min and merged.max == whole.max
+    for q in (0.5, 0.99):
+        assert merged.quantile(q) == whole.quantile(q)
+
+
+def test_merge_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        DDSketch(0.01).merge(DDSketch(0.02))
+
+
+def test_round_trip():
+    sketch = DDSketch(ALPHA)
+    for v in _latencies(5_000, seed=3) + [0.0, 0.0]:
+        sketch.add(v)
+    restored = DDSketch.from_bytes(sketch.to_bytes())
+
+    assert restored.bins == sketch.bins
+    assert restored.zero_count == sketch.zero_count == 2
+    assert (restored.count, restored.min, restored.max) == (sketch.count, sketch.min, sketch.max)
+    assert restored.sum == pytest.approx(sketch.sum)
+    assert restored.quantiles([0.5, 0.99]) == sketch.quantiles([0.5, 0.99])
+
+
+def test_empty_and_bounds():
+    sketch = DDSketch(ALPHA)
+    assert sketch.quantile(0.5) is None
+    for v in (5.0, 10.0, 20.0):
+        sketch.add(v)
+    assert sketch.quantile(0) == 5.0
+    assert sketch.quantile(1) == 20.0
+    assert 5.0 <= sketch.quantile(0.5) <= 20.0
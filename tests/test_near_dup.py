@@ -0,0 +1,37 @@
+import asyncio
+
+from app.services.near_dup import NearDupCache
+
+QUERY = "select customer_id, sum(total) from orders where created_at >= '2026-01-01' group by customer_id"
+
+
+def _cache(**kw) -> NearDupCache:
+    params = dict(threshold=0.8, num_perm=64, bands=16, shingle_size=4, max_entries=100)
+    params.update(kw)
+    return NearDupCache(**params)
+
+
+def test_near_duplicate_hits_only_for_same_model_and_prompt():
+    async def run():
+        cache = _cache()
+        await cache.add(QUERY, "Query", "MySQL", "m1", "prompt", "answer")
+        similar = QUERY.replace("2026-01-01", "2026-01-02")
+        assert await cache.lookup(similar, "Query", "MySQL", "m1", "prompt") == "answer"
+        assert await cache.lookup(similar, "Query", "MySQL", "m2", "prompt") is None
+        assert await cache.lookup(similar, "Query", "MySQL", "m1", "other prompt") is None
+        assert await cache.lookup("delete from users", "Query", "MySQL", "m1", "prompt") is None
+
+    asyncio.run(run())
+
+
+def test_index_count_is_bounded():
+    async def run():
+        cache = _cache(max_indexes=2)
+        for i in range(10):
+            await cache.add(f"{QUERY} -- {i}", "Query", f"lang{i}", "m1", f"prompt{i}", f"answer{i}")
+        assert len(cache._indexes) == 3  # two own indexes plus the shared overflow
+        # Overflow entries are still told apart by prompt.
+        assert await cache.lookup(f"{QUERY} -- 7", "Query", "lang7", "m1", "prompt7") == "answer7"
+        assert await cache.lookup(f"{QUERY} -- 7", "Query", "lang7", "m1", "unused prompt") is None
+
+    asyncio.run(run())
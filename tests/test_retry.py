@@ -0,0 +1,145 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Deadline,
+    DeadlineExceeded,
+    RetryBudget,
+    RetryPolicy,
+    classify,
+)
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int, headers: dict | None = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = httpx.Response(status_code, headers=headers or {})
+
+
+def _policy(max_retries: int = 2, budget: RetryBudget | None = None) -> RetryPolicy:
+    return RetryPolicy(
+        CircuitBreaker("test", failure_threshold=5, cooldown_s=30),
+        budget or RetryBudget(ratio=0.2, min_per_s=10),
+        max_retries=max_retries,
+        base_delay_s=0.001,
+        max_delay_s=0.01,
+    )
+
+
+@pytest.mark.parametrize("status, retryable", [(429, True), (503, True), (500, True), (400, False), (401, False)])
+def test_classify_by_status(status, retryable):
+    assert classify(_StatusError(status)) == (retryable, None)
+
+
+def test_classify_reads_retry_after():
+    assert classify(_StatusError(429, {"retry-after": "2"})) == (True, 2.0)
+    assert classify(_StatusError(429, {"retry-after-ms": "250"})) == (True, 0.25)
+    # HTTP-date form falls back to our own backoff.
+    assert classify(_StatusError(503, {"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT"})) == (True, None)
+
+
+def test_classify_transport_and_terminal_errors():
+    assert classify(httpx.ConnectError("refused")) == (True, None)
+    assert classify(asyncio.TimeoutError()) == (True, None)
+    assert classify(DeadlineExceeded()) == (False, None)
+    assert classify(CircuitOpenError("x", 1.0)) == (False, None)
+    assert classify(ValueError("bad input")) == (False, None)
+
+
+def test_budget_allows_floor_plus_ratio():
+    budget = RetryBudget(ratio=0.5, min_per_s=0.1, window_s=10)  # floor: 1 retry per window
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    for _ in range(4):
+        budget.record_request()
+    # 1 + 0.5 * 4 = 3 retries in the window, one already spent.
+    assert budget.try_spend()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+
+def test_breaker_opens_after_threshold_and_probes_once():
+    breaker = CircuitBreaker("test", failure_threshold=2, cooldown_s=0)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    breaker.before_call()  # cooldown over: this caller is the probe
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_call_retries_retryable_errors():
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _StatusError(503)
+        return "ok"
+
+    policy = _policy(max_retries=2)
+    assert asyncio.run(policy.call(flaky, Deadline(5))) == "ok"
+    assert policy.stats["retries"] == 2
+
+
+def test_call_does_not_retry_client_errors():
+    attempts = []
+
+    async def bad_request():
+        attempts.append(1)
+        raise _StatusError(400)
+
+    with pytest.raises(_StatusError):
+        asyncio.run(_policy().call(bad_request, Deadline(5)))
+    assert len(attempts) == 1
+
+
+def test_call_stops_when_budget_is_spent():
+    async def down():
+        raise _StatusError(503)
+
+    policy = _policy(max_retries=5, budget=RetryBudget(ratio=0, min_per_s=0))
+    with pytest.raises(_StatusError):
+        asyncio.run(policy.call(down, Deadline(5)))
+    assert policy.stats["budget_exhausted"] == 1
+    assert policy.stats["retries"] == 0
+
+
+def test_stream_first_item_is_bounded_by_deadline():
+    closed = []
+
+    async def stalled():
+        try:
+            await asyncio.sleep(5)
+            yield "never"
+        finally:
+            closed.append(True)
+
+    async def run():
+        async for _ in _policy().stream(stalled, Deadline(0.05)):
+            pass
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run())
+    assert closed
+
+
+def test_stream_is_not_cut_once_output_started():
+    async def slow_tail():
+        yield "a"
+        await asyncio.sleep(0.1)
+        yield "b"
+
+    async def run():
+        return [item async for item in _policy().stream(slow_tail, Deadline(0.05))]
+
+    assert asyncio.run(run()) == ["a", "b"]
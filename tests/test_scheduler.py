@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from app.services.scheduler import FairScheduler, QueueTimeout
+
+
+def _scheduler(max_concurrency: int = 4, per_user_cap: int = 1) -> FairScheduler:
+    return FairScheduler(max_concurrency, {0: 1.0, 1: 4.0}, per_user_cap, max_wait_s=0.2)
+
+
+def test_admits_immediately_when_idle():
+    async def run():
+        sched = _scheduler()
+        assert await sched.acquire(0, "a") == 0.0
+        assert sched.running == 1
+
+    asyncio.run(run())
+
+
+def test_free_slot_is_granted_while_another_user_waits_on_its_cap():
+    async def run():
+        sched = _scheduler()
+        await sched.acquire(0, "free-user")
+        # At its per-user cap: queues although slots are free.
+        blocked = asyncio.create_task(sched.acquire(0, "free-user"))
+        await asyncio.sleep(0)
+        assert sched.depth() == 1
+
+        # A different user must take one of the free slots, not wait behind it.
+        waited_ms = await sched.acquire(1, "pro-user")
+        assert waited_ms < 100
+        assert sched.running == 2
+        assert sched.depth() == 1
+
+        with pytest.raises(QueueTimeout):
+            await blocked
+
+    asyncio.run(run())
+
+
+def test_queued_caller_is_admitted_on_release():
+    async def run():
+        sched = _scheduler(max_concurrency=1, per_user_cap=2)
+        await sched.acquire(0, "a")
+        waiter = asyncio.create_task(sched.acquire(1, "b"))
+        await asyncio.sleep(0)
+        sched.release("a")
+        await waiter
+        assert sched.running == 1
+        assert sched.depth() == 0
+
+    asyncio.run(run())
@@ -0,0 +1,76 @@
+import sys
+import types
+
+import pytest
+
+from app.core import token_estimator
+from app.core.token_estimator import TokenEstimator, heuristic_count, load_encodings
+
+
+@pytest.fixture(autouse=True)
+def _reset_encodings(monkeypatch):
+    monkeypatch.setattr(token_estimator, "_encodings", {})
+    monkeypatch.setattr(token_estimator, "_load_failed", False)
+
+
+def _fake_tiktoken(monkeypatch, encoding_for_model):
+    module = types.ModuleType("tiktoken")
+    module.encoding_for_model = encoding_for_model
+    module.get_encoding = encoding_for_model
+    monkeypatch.setitem(sys.modules, "tiktoken", module)
+
+
+class _CharEncoding:
+    def encode(self, text, disallowed_special=()):
+        return list(text)
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+def test_heuristic_count():
+    assert heuristic_count("") == 0
+    assert heuristic_count("select") == 2  # six letters: 1 + 5 // 5
+    assert heuristic_count("a, b") == 3
+    assert heuristic_count("12345") == 2
+
+
+def test_request_path_never_loads_the_encoding(monkeypatch):
+    def fail(model):
+        raise AssertionError("encoding loaded on the request path")
+
+    _fake_tiktoken(monkeypatch, fail)
+    estimator = TokenEstimator(use_tokenizer=True)
+    assert estimator.count("select * from t", "gpt-4.1") == heuristic_count("select * from t")
+    assert not estimator.exact("gpt-4.1")
+
+
+def test_failed_download_falls_back_to_heuristic_once(monkeypatch):
+    calls = []
+
+    def offline(model):
+        calls.append(model)
+        raise OSError("network unreachable")
+
+    _fake_tiktoken(monkeypatch, offline)
+    assert load_encodings(["gpt-4.1", "gpt-4.1-nano"]) == 0
+    assert load_encodings(["gpt-4.1"]) == 0
+    assert calls == ["gpt-4.1"]  # no retry per model or per call
+
+    estimator = TokenEstimator(use_tokenizer=True)
+    assert estimator.estimate_prompt("Fix the SQL.", "select 1", "gpt-4.1") > 0
+    assert not estimator.exact("gpt-4.1")
+
+
+def test_missing_tiktoken(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tiktoken", None)  # import raises ImportError
+    assert load_encodings(["gpt-4.1"]) == 0
+
+
+def test_loaded_encoding_is_used(monkeypatch):
+    _fake_tiktoken(monkeypatch, lambda model: _CharEncoding())
+    assert load_encodings(["gpt-4.1"]) == 1
+    estimator = TokenEstimator(use_tokenizer=True)
+    assert estimator.exact("gpt-4.1")
+    assert estimator.count("abc", "gpt-4.1") == 3
+    assert estimator.trim("abcdef", 4, "gpt-4.1") == "abcd"
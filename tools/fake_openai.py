@@ -0,0 +1,220 @@
+"""
+Local stand-in for the OpenAI Responses API, for load tests without real tokens.
+
+Serves POST /v1/responses (plain and stream=true) and GET /v1/models/{model}.
+The output is canned per polish mode, detected from the instructions. Latency and
+failures are injected per request.
+
+    python tools/fake_openai.py --port 8900 --latency lognormal:1500,0.4 \
+        --tail-rate 0.02 --tail-latency fixed:12000 --rate-429 0.01 --hang-rate 0.005
+
+Point the backend at it:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=fake uvicorn app.main:app
+
+Latency specs: fixed:MS | uniform:LO_MS,HI_MS | lognormal:MEDIAN_MS,SIGMA
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CANNED = {
+    "program": "# Prints the numbers 1 to 10\nfor i in range(1, 11):\n    print(i)",
+    "mongodb": '{"find": "collection", "filter": {"status": "active"}, "limit": 10}',
+    "sql": "-- Active users\nSELECT id, email FROM users WHERE status = 'active' ORDER BY id LIMIT 10;",
+    "unknown": "Invalid mode. Only Program or Query is supported.",
+}
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Return a sampler of seconds for a latency spec."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        lo, hi = values
+        return lambda: random.uniform(lo, hi) / 1000
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: random.lognormvariate(math.log(median), sigma) / 1000
+    raise argparse.ArgumentTypeError(f"Unknown latency spec: {spec}")
+
+
+def canned_output(instructions: str) -> str:
+    if "PROGRAM MODE" in instructions:
+        return CANNED["program"]
+    if "QUERY MODE (MongoDB)" in instructions:
+        return CANNED["mongodb"]
+    if "QUERY MODE" in instructions:
+        return CANNED["sql"]
+    return CANNED["unknown"]
+
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def _response(model: str, text: str, instructions: str, user_input: str) -> Dict[str, Any]:
+    input_tokens = _tokens(instructions) + _tokens(user_input)
+    output_tokens = _tokens(text)
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": model,
+        "output": [
+            {
+                "type": "message",
+                "id": f"msg_{uuid.uuid4().hex}",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+def _error(status: int, message: str, kind: str, headers: Dict[str, str] | None = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": message, "type": kind, "param": None, "code": None}},
+        headers=headers,
+    )
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="fake-openai")
+    latency = parse_latency(args.latency)
+    tail_latency = parse_latency(args.tail_latency)
+    stats: Dict[str, int] = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0, "hung": 0, "tail": 0}
+
+    def sample_latency() -> float:
+        if random.random() < args.tail_rate:
+            stats["tail"] += 1
+            return tail_latency()
+        return latency()
+
+    async def inject_failure() -> JSONResponse | None:
+        roll = random.random()
+        if roll < args.rate_429:
+            stats["rate_limited"] += 1
+            return _error(
+                429, "Rate limit reached (injected).", "rate_limit_exceeded", {"retry-after-ms": str(args.retry_after_ms)}
+            )
+        roll -= args.rate_429
+        if roll < args.rate_500:
+            stats["errors"] += 1
+            return _error(500, "Internal error (injected).", "server_error")
+        roll -= args.rate_500
+        if roll < args.hang_rate:
+            # Never answers within any sane client timeout.
+            stats["hung"] += 1
+            await asyncio.sleep(args.hang_s)
+            return _error(504, "Hung request released (injected).", "timeout")
+        return None
+
+    @app.get("/v1/models/{model}")
+    async def retrieve_model(model: str):
+        return {"id": model, "object": "model", "created": 0, "owned_by": "fake-openai"}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/v1/responses")
+    async def create_response(request: Request):
+        stats["requests"] += 1
+        body = await request.json()
+        model = body.get("model", "fake-model")
+        instructions = body.get("instructions") or ""
+        user_input = body.get("input") or ""
+        if not isinstance(user_input, str):
+            user_input = json.dumps(user_input)
+
+        failure = await inject_failure()
+        if failure is not None:
+            return failure
+
+        text = canned_output(instructions)
+        response = _response(model, text, instructions, user_input)
+        delay = sample_latency()
+        stats["ok"] += 1
+
+        if not body.get("stream"):
+            await asyncio.sleep(delay)
+            return response
+
+        async def events() -> AsyncIterator[str]:
+            seq = 0
+
+            def sse(data: Dict[str, Any]) -> str:
+                nonlocal seq
+                seq += 1
+                return f"event: {data['type']}\ndata: {json.dumps({**data, 'sequence_number': seq})}\n\n"
+
+            in_progress = {**response, "status": "in_progress", "output": [], "usage": None}
+            yield sse({"type": "response.created", "response": in_progress})
+            chunks = [text[i:i + args.chunk_chars] for i in range(0, len(text), args.chunk_chars)] or [""]
+            # Time to first token takes the first share; the rest is spread over the chunks.
+            await asyncio.sleep(delay * args.ttft_share)
+            per_chunk = delay * (1 - args.ttft_share) / len(chunks)
+            item_id = response["output"][0]["id"]
+            for chunk in chunks:
+                yield sse(
+                    {
+                        "type": "response.output_text.delta",
+                        "item_id": item_id,
+                        "output_index": 0,
+                        "content_index": 0,
+                        "delta": chunk,
+                    }
+                )
+                await asyncio.sleep(per_chunk)
+            yield sse({"type": "response.completed", "response": response})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake OpenAI Responses API with latency/error injection.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default="lognormal:1500,0.35", help="latency spec for normal requests")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="fraction of requests using --tail-latency")
+    parser.add_argument("--tail-latency", default="fixed:10000")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction answered with 429")
+    parser.add_argument("--retry-after-ms", type=int, default=500)
+    parser.add_argument("--rate-500", type=float, default=0.0, help="fraction answered with 500")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="fraction that hang for --hang-s (timeouts)")
+    parser.add_argument("--hang-s", type=float, default=120.0)
+    parser.add_argument("--chunk-chars", type=int, default=16, help="stream delta size")
+    parser.add_argument("--ttft-share", type=float, default=0.3, help="share of latency before the first delta")
+    args = parser.parse_args()
+    for spec in (args.latency, args.tail_latency):
+        parse_latency(spec)
+
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Open-loop load generator for the backend.
+
+Requests are started at a fixed target rate, whatever the response times. A slow
+server therefore shows up as latency and errors instead of quietly lowering the load.
+The mix is weighted between /api/v1/polish, /api/v1/auth/login and /api/v1/feedback.
+
+    python tools/loadtest.py --base-url http://127.0.0.1:8000 --rps 50 --duration 60 \
+        --mix polish=8,login=1,feedback=1 --email load@test.local --password secret123
+
+Reports per endpoint: requests, throughput, error rate (by status), p50/p95/p99.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import httpx
+
+POLISH_SAMPLES: List[Tuple[Dict[str, str], str]] = [
+    ({"action": "Query", "lang": "MySQL"}, "users who signed up last week and never logged in"),
+    ({"action": "Query", "lang": "PostgreSQL"}, "top 5 products by revenue per month in 2024"),
+    ({"action": "Query", "lang": "MongoDB"}, "orders over 100 dollars from customers in India"),
+    ({"action": "Program", "lang": "Python"}, "read a csv file and print the average of the price column"),
+    ({"action": "Program", "lang": "JavaScript"}, "debounce a function with a 300 ms delay"),
+]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+class Results:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.dropped = 0
+
+    def record(self, name: str, status: str, latency_s: float) -> None:
+        self.latencies[name].append(latency_s)
+        self.statuses[name][status] += 1
+
+    def summary(self, elapsed_s: float) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"elapsed_s": round(elapsed_s, 1), "dropped": self.dropped, "endpoints": {}}
+        for name, values in sorted(self.latencies.items()):
+            values.sort()
+            statuses = self.statuses[name]
+            ok = sum(c for s, c in statuses.items() if s.startswith("2"))
+            out["endpoints"][name] = {
+                "requests": len(values),
+                "throughput_rps": round(ok / elapsed_s, 2) if elapsed_s else 0.0,
+                "error_rate": round(1 - ok / len(values), 4) if values else 0.0,
+                "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+                "statuses": dict(statuses),
+            }
+        return out
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+
+def make_scenarios(args: argparse.Namespace) -> Dict[str, Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]]:
+    async def polish(client: httpx.AsyncClient) -> httpx.Response:
+        mode, text = random.choice(POLISH_SAMPLES)
+        if args.unique_texts:
+            text = f"{text} #{random.getrandbits(32)}"  # defeat the response cache
+        payload: Dict[str, Any] = {"text": text, "mode": mode}
+        if args.user_id is not None:
+            payload["user_id"] = args.user_id
+        return await client.post("/api/v1/polish", json=payload)
+
+    async def login(client: httpx.AsyncClient) -> httpx.Response:
+        return await client.post("/api/v1/auth/login", json={"email": args.email, "password": args.password})
+
+    async def feedback(client: httpx.AsyncClient) -> httpx.Response:
+        return await client.post(
+            "/api/v1/feedback",
+            json={
+                "message": "load test feedback",
+                "rating": random.randint(1, 5),
+                "category": "other",
+                "app_version": "loadtest",
+                "platform": "linux",
+                "user_email": args.email,
+            },
+        )
+
+    return {"polish": polish, "login": login, "feedback": feedback}
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    scenarios = make_scenarios(args)
+    mix = parse_mix(args.mix)
+    for name, _ in mix:
+        if name not in scenarios:
+            raise SystemExit(f"Unknown scenario in --mix: {name}")
+    names = [n for n, _ in mix]
+    weights = [w for _, w in mix]
+
+    results = Results()
+    limits = httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight)
+    timeout = httpx.Timeout(args.timeout)
+    inflight: set = set()
+
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout) as client:
+
+        async def one(name: str) -> None:
+            started = time.perf_counter()
+            try:
+                resp = await scenarios[name](client)
+                status = str(resp.status_code)
+            except httpx.TimeoutException:
+                status = "timeout"
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            results.record(name, status, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        total = int(args.rps * args.duration)
+        for i in range(total):
+            # Constant or Poisson arrivals, scheduled from the start time (no drift).
+            if args.poisson:
+                await asyncio.sleep(random.expovariate(args.rps))
+            else:
+                await asyncio.sleep(max(0.0, started + i / args.rps - time.perf_counter()))
+            if len(inflight) >= args.max_inflight:
+                results.dropped += 1  # the client is saturated; count it instead of queueing
+                continue
+            task = asyncio.create_task(one(random.choices(names, weights)[0]))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+
+        if inflight:
+            await asyncio.wait(set(inflight))
+        elapsed = time.perf_counter() - started
+
+    return results.summary(elapsed)
+
+
+def print_report(summary: Dict[str, Any]) -> None:
+    print(f"elapsed {summary['elapsed_s']} s, dropped by client {summary['dropped']}")
+    header = f"{'endpoint':<10}{'reqs':>8}{'ok rps':>9}{'err %':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  statuses"
+    print(header)
+    print("-" * len(header))
+    for name, s in summary["endpoints"].items():
+        print(
+            f"{name:<10}{s['requests']:>8}{s['throughput_rps']:>9}{s['error_rate'] * 100:>8.2f}"
+            f"{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}  {s['statuses']}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Open-loop load test for the SAI Devion backend.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, default=20.0, help="target request rate")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--mix", default="polish=1", help="weighted scenarios, e.g. polish=8,login=1,feedback=1")
+    parser.add_argument("--poisson", action="store_true", help="exponential inter-arrival times")
+    parser.add_argument("--max-inflight", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout, like the desktop client")
+    parser.add_argument("--user-id", type=int, default=None, help="user_id sent with polish requests")
+    parser.add_argument("--unique-texts", action="store_true", help="make every polish text unique")
+    parser.add_argument("--email", default="loadtest@example.com")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_report(summary)
+
+
+if __name__ == "__main__":
+    main()